@@ -0,0 +1,90 @@
+"""Benchmark the memory footprint of parsed ASTs and tree-walking evaluation time.
+
+Parses the Project Euler programs in tests/project_euler_codes.py and reports the bytes per
+AST node, next to what the same nodes cost as ordinary objects with a `__dict__`. Then times
+`execute` on the ones that finish quickly (output suppressed).
+
+Usage: python benchmarks/ast_memory_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+import tracemalloc
+from dataclasses import fields
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+from evaluator import execute
+from parser import parse
+from resolver import children
+from scope import SymbolTable
+
+# loop-heavy programs that run to completion in a second or so
+TIMED = ("code1", "code2", "code_3", "code_5", "code_6", "code_11")
+
+
+def load_programs():
+    with open(os.path.join(ROOT, "tests", "project_euler_codes.py")) as f:
+        source = f.read()
+    return dict(re.findall(r'^(code_?\d+)\s*=\s*"""(.*?)"""', source, re.S | re.M))
+
+
+def walk(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(children(node))
+
+
+class Plain:
+    pass
+
+
+def dict_footprint(node):
+    """Size of `node` rebuilt as a plain object holding the same attributes in a `__dict__`."""
+    plain = Plain()
+    for f in fields(node):
+        setattr(plain, f.name, getattr(node, f.name))
+    return sys.getsizeof(plain) + sys.getsizeof(plain.__dict__)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    programs = load_programs()
+
+    trees = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for name, prog in programs.items():
+        try:
+            trees.append(parse(prog, SymbolTable())[0])
+        except Exception:
+            pass  # a few of the scratch programs do not parse
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    nodes = [node for tree in trees for node in walk(tree)]
+    slotted = sum(sys.getsizeof(node) for node in nodes)
+    with_dict = sum(dict_footprint(node) for node in nodes)
+    print(f"{len(trees)} programs, {len(nodes)} AST nodes")
+    print(f"  node objects:  {slotted / len(nodes):6.1f} bytes/node (slotted)")
+    print(f"                 {with_dict / len(nodes):6.1f} bytes/node (with __dict__)")
+    print(f"  parse allocated {allocated / 1024:.1f} KiB ({allocated / len(nodes):.1f} bytes/node incl. lists and scopes)")
+
+    print(f"evaluation, best of {repeat}:")
+    for name in TIMED:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                execute(programs[name])
+            best = min(best, time.perf_counter() - start)
+        print(f"  {name:<8} {best * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Benchmark entering blocks and functions in the evaluator.
+
+First times `SymbolTable.instantiate` on scopes declaring 0, 3 and 8 names (one of them a
+function) against seeding every entry on each entry, as it was done before frame templates.
+Then runs loops whose bodies enter an empty `if`, an `if` declaring a local, and a small
+function, and reports the best time per iteration of each (output suppressed).
+
+Usage: python benchmarks/block_entry_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from scope import SymbolTable, SymbolCategory
+from evaluator import execute
+
+ENTRIES = 100_000
+ITERATIONS = 5000
+
+PROGRAMS = {
+    "empty if": """
+var total = 0;
+for (var i = 0; i < %d; i += 1) {
+    if i %% 3 == 0 then { total += 1; } end;
+};
+displayl total;
+""",
+    "if with local": """
+var total = 0;
+for (var i = 0; i < %d; i += 1) {
+    if i %% 3 == 0 then { var step = 2; total += step; } end;
+};
+displayl total;
+""",
+    "call": """
+fn twice(x) { x * 2; };
+var total = 0;
+for (var i = 0; i < %d; i += 1) {
+    total += twice(i);
+};
+displayl total;
+""",
+}
+
+
+def seed_each_time(scope, parent):
+    fresh = SymbolTable(parent, scope.layout)
+    for slot, category in enumerate(scope.categories):
+        if category == SymbolCategory.VARIABLE:
+            fresh.categories[slot] = category
+        elif category == SymbolCategory.FUNCTION:
+            fresh.values[slot], fresh.categories[slot] = scope.values[slot], category
+    return fresh
+
+
+def scope_with(names):
+    scope = SymbolTable(SymbolTable())
+    for i in range(names):
+        scope.define(f"v{i}", None, SymbolCategory.FUNCTION if i == 0 else SymbolCategory.VARIABLE)
+    return scope
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"best of {repeat}, {ENTRIES} scope entries:")
+    for names in (0, 3, 8):
+        scope = scope_with(names)
+        parent = scope.parent
+        seeded = best_time(lambda: [seed_each_time(scope, parent) for _ in range(ENTRIES)], repeat)
+        templated = best_time(lambda: [scope.instantiate(parent) for _ in range(ENTRIES)], repeat)
+        print(f"  {names} names      {seeded / ENTRIES * 1e9:8.0f} ns -> {templated / ENTRIES * 1e9:8.0f} ns per entry")
+    print(f"best of {repeat}, {ITERATIONS} iterations:")
+    for name, program in PROGRAMS.items():
+        per_iteration = best_time(lambda: execute(program % ITERATIONS), repeat) / ITERATIONS
+        print(f"  {name:<14} {per_iteration * 1e6:8.2f} us per iteration")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark the closure-compiling backend (`closure_eval`) against the tree walk of `e`.
+
+Runs a loop-heavy program (arithmetic, comparisons, a recursive function and array indexing)
+with `execute` as it is and with `compiled=True`, and reports the best time of each (output
+suppressed). Both include parsing and compiling; the program is parsed anew each run.
+
+Usage: python benchmarks/closure_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from evaluator import execute
+
+PROGRAM = """
+fn fib(n) {
+    if n < 2 then n else fib(n - 1) + fib(n - 2) end;
+};
+var array primes = [2];
+var total = 0;
+for (var i = 3; i < 3000; i += 2) {
+    var is_prime = True;
+    var k = 0;
+    while (k < primes.Length and primes[k] * primes[k] <= i) {
+        if i % primes[k] == 0 then { is_prime = False; breakout; } end;
+        k += 1;
+    };
+    if is_prime then { primes.PushBack(i); total = total + i; } end;
+};
+displayl total;
+displayl fib(18);
+"""
+
+
+def best_time(compiled, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            execute(PROGRAM, compiled=compiled)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tree_walk = best_time(False, repeat)
+    compiled = best_time(True, repeat)
+    print(f"best of {repeat}:")
+    print(f"  e()        {tree_walk * 1000:8.1f} ms")
+    print(f"  closures   {compiled * 1000:8.1f} ms ({tree_walk / compiled:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark common-subexpression elimination of collection reads, in both engines.
+
+Runs a loop that reads `m[i][j]`-style elements and `.Length` several times per iteration,
+with `optimizer.share_accesses` enabled and disabled, and reports the best time of each engine
+(output suppressed).
+
+Usage: python benchmarks/cse_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import optimizer
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+PROGRAM = """
+var size = 60;
+var m = [];
+for (var i = 0; i < size; i += 1) {
+    var row = [];
+    for (var j = 0; j < size; j += 1) { row.PushBack((i * j) % 10); };
+    m.PushBack(row);
+};
+var best = 0;
+for (var i = 0; i < m.Length; i += 1) {
+    for (var j = 0; j < size; j += 1) {
+        var score = m[i][j] * m[i][j] + m[i][j] + m.Length;
+        if score > best then { best = score; } end;
+    };
+};
+displayl best;
+"""
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(PROGRAM)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    share_accesses = optimizer.share_accesses
+    print(f"best of {repeat}:")
+    for name, run in (("evaluator", execute), ("vm", run_program)):
+        optimizer.share_accesses = lambda root, tS: root
+        without = best_time(run, repeat)
+        optimizer.share_accesses = share_accesses
+        shared = best_time(run, repeat)
+        print(f"  {name:<10} {without * 1000:8.1f} ms -> {shared * 1000:8.1f} ms shared")
+
+
+if __name__ == "__main__":
+    main()
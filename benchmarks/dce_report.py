@@ -0,0 +1,51 @@
+"""Report how much bytecode dead-code elimination removes from each program.
+
+Compiles the Project Euler programs in tests/project_euler_codes.py (or the given .nx files)
+and prints the instruction count before and after `eliminate_dead_code`, by kind of removal.
+
+Usage: python benchmarks/dce_report.py [file.nx ...]
+"""
+import os
+import re
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+from bytecode_gen_new import codegen, parse, optimize
+from bytecode_opt import eliminate_dead_code
+from scope import SymbolTable
+
+
+def load_programs(paths):
+    if paths:
+        programs = {}
+        for path in paths:
+            with open(path) as f:
+                programs[os.path.basename(path)] = f.read()
+        return programs
+    with open(os.path.join(ROOT, "tests", "project_euler_codes.py")) as f:
+        source = f.read()
+    return dict(re.findall(r'^(code_?\d+)\s*=\s*"""(.*?)"""', source, re.S | re.M))
+
+
+def main():
+    total_before = total_after = 0
+    print(f"{'program':<12} {'before':>7} {'after':>7}  removed")
+    for name, program in load_programs(sys.argv[1:]).items():
+        try:
+            code = codegen(optimize(*parse(program, SymbolTable()))[0])
+        except Exception as err:
+            print(f"{name:<12} does not compile: {type(err).__name__}")
+            continue
+        before = len(code.insns)
+        eliminate_dead_code(code)
+        after = len(code.insns)
+        total_before += before
+        total_after += after
+        kinds = ", ".join(f"{kind} {count}" for kind, count in code.eliminated.items() if count)
+        print(f"{name:<12} {before:>7} {after:>7}  {kinds or '-'}")
+    print(f"{'total':<12} {total_before:>7} {total_after:>7}")
+
+
+if __name__ == "__main__":
+    main()
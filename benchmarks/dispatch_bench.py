@@ -0,0 +1,73 @@
+"""Benchmark the VM's dispatch modes on the Project Euler programs of tests/euler_test.py.
+
+Each program is compiled once; then the best time of running it is reported for each mode
+(output suppressed):
+- objects:  `execute_instruction`, a `match` on the instruction classes;
+- opcodes:  `run_flat`, a `match` on the opcodes of the assembled code (bytecode_asm);
+- threaded: `run_threaded`, one pre-bound handler per instruction (`thread_code`).
+
+Usage: python benchmarks/dispatch_bench.py [repeat_count] [--skip-objects] [program ...]
+(programs by test name, e.g. euler_test_9; the slowest, 7 and 10, take minutes per mode)
+"""
+import ast
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from bytecode_gen_new import compile_program
+from bytecode_asm import assemble
+from bytecode_eval_new import BytecodeVM
+
+EULER_TESTS = os.path.join(os.path.dirname(__file__), "..", "tests", "euler_test.py")
+
+
+def euler_programs():
+    """(test name, program) of each test of euler_test.py, from its `prog = \"\"\"...\"\"\"`."""
+    with open(EULER_TESTS) as file:
+        module = ast.parse(file.read())
+    for test in module.body:
+        if isinstance(test, ast.FunctionDef):
+            for node in ast.walk(test):
+                if (isinstance(node, ast.Assign) and [getattr(t, "id", None) for t in node.targets] == ["prog"]
+                        and isinstance(node.value, ast.Constant)):
+                    yield test.name.removeprefix("test_"), node.value.value
+                    break
+
+
+def best_time(make_vm, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        vm = make_vm()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            vm.run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    repeat = int(args.pop(0)) if args and args[0].isdigit() else 3
+    modes = ["opcodes", "threaded"] if "--skip-objects" in sys.argv else ["objects", "opcodes", "threaded"]
+    print(f"best of {repeat}, ms:")
+    print(f"  {'program':<16}" + "".join(f"{mode:>11}" for mode in modes))
+    totals = dict.fromkeys(modes, 0.0)
+    for name, program in euler_programs():
+        if args and name not in args:
+            continue
+        code, _ = compile_program(program)
+        flat = assemble(code)
+        vms = {"objects": lambda: BytecodeVM(code), "opcodes": lambda: BytecodeVM(flat, threaded=False),
+               "threaded": lambda: BytecodeVM(flat)}
+        times = {mode: best_time(vms[mode], repeat) for mode in modes}
+        for mode in modes:
+            totals[mode] += times[mode]
+        print(f"  {name:<16}" + "".join(f"{times[mode] * 1000:11.1f}" for mode in modes))
+    print(f"  {'total':<16}" + "".join(f"{totals[mode] * 1000:11.1f}" for mode in modes))
+
+
+if __name__ == "__main__":
+    main()
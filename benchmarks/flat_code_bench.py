@@ -0,0 +1,86 @@
+"""Benchmark the assembled bytecode (`bytecode_asm.FlatCode`) against the object form it is made from.
+
+Compiles a loop-heavy program once, then reports the memory each form of its instructions
+takes (the instruction list with its objects and labels, against the opcode bytes, the
+operand array and the constant pool) and the best time the VM takes to run each
+(output suppressed).
+
+Usage: python benchmarks/flat_code_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from bytecode_gen_new import compile_program
+from bytecode_asm import assemble
+from bytecode_eval_new import BytecodeVM
+
+PROGRAM = """
+fn collatz(n) {
+    var steps = 0;
+    while (n != 1) {
+        if n % 2 == 0 then { n = n / 2; } else { n = 3 * n + 1; } end;
+        steps += 1;
+    };
+    steps;
+};
+var array lengths = [];
+var best = 0;
+for (var i = 1; i < 1000; i += 1) {
+    var chain = collatz(i);
+    lengths.PushBack(chain);
+    if chain > best then { best = chain; } end;
+};
+displayl best;
+displayl lengths.Length;
+"""
+
+
+def deep_size(obj, seen=None):
+    """Bytes of `obj` and everything it references (each object once)."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, type):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def best_time(code, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            BytecodeVM(code).run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    code, _ = compile_program(PROGRAM)
+    flat = assemble(code)
+    objects = deep_size(code.insns)
+    assembled = deep_size(flat.ops) + deep_size(flat.args) + deep_size(flat.consts)
+    print(f"{len(code.insns)} instructions:")
+    print(f"  objects   {objects:8} bytes")
+    print(f"  flat      {assembled:8} bytes ({objects / assembled:.1f}x smaller)")
+
+    by_objects = best_time(code, repeat)
+    by_opcodes = best_time(flat, repeat)
+    print(f"best of {repeat}:")
+    print(f"  objects   {by_objects * 1000:8.1f} ms")
+    print(f"  flat      {by_opcodes * 1000:8.1f} ms ({by_objects / by_opcodes:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark function inlining on a call-heavy program, in both engines.
+
+Runs a loop that calls small helper functions (index arithmetic in the style of
+algolib/matrix/*.nx) with `optimizer.inline` enabled and disabled, and reports the best time
+of each engine (output suppressed).
+
+Usage: python benchmarks/inline_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import optimizer
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+PROGRAM = """
+fn index(row, col, cols) { row * cols + col; };
+fn valueAt(matrix, row, col, cols) { matrix[index(row, col, cols)]; };
+fn square(x) { x * x; };
+var cols = 30;
+var matrix = [];
+for (var i = 0; i < cols * cols; i += 1) { matrix.PushBack(i % 7); };
+var total = 0;
+for (var row = 0; row < cols; row += 1) {
+    for (var col = 0; col < cols; col += 1) {
+        total += square(valueAt(matrix, row, col, cols));
+    };
+};
+displayl total;
+"""
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(PROGRAM)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    inline = optimizer.inline
+    print(f"best of {repeat}:")
+    for name, run in (("evaluator", execute), ("vm", run_program)):
+        optimizer.inline = lambda root: root
+        without = best_time(run, repeat)
+        optimizer.inline = inline
+        with_inlining = best_time(run, repeat)
+        print(f"  {name:<10} {without * 1000:8.1f} ms -> {with_inlining * 1000:8.1f} ms inlined")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark the table-driven `lex` against the original character-wise lexer.
+
+Usage: python benchmarks/lexer_bench.py [size_in_MB]
+"""
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+from lexer import lex, lex_charwise
+
+
+def build_source(megabytes):
+    """Concatenate the algolib/examples programs until the source reaches `megabytes`."""
+    files = sorted(glob.glob(os.path.join(ROOT, "algolib", "**", "*.nx"), recursive=True))
+    files += sorted(glob.glob(os.path.join(ROOT, "examples", "*.nx")))
+    corpus = "\n".join(open(path).read() for path in files)
+    target = int(megabytes * 1024 * 1024)
+    return (corpus * (target // len(corpus) + 1))[:target].rsplit("\n", 1)[0]
+
+
+def time_lexer(lexer, source, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = list(lexer(source))
+        best = min(best, time.perf_counter() - start)
+    return best, tokens
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    source = build_source(megabytes)
+    old_time, old_tokens = time_lexer(lex_charwise, source)
+    new_time, new_tokens = time_lexer(lex, source)
+    assert old_tokens == new_tokens, "token streams differ"
+    print(f"source size      : {len(source) / 1024 / 1024:.2f} MB, {len(new_tokens)} tokens")
+    print(f"lex_charwise     : {old_time:.3f} s ({len(source) / old_time / 1e6:.2f} MB/s)")
+    print(f"lex (table)      : {new_time:.3f} s ({len(source) / new_time / 1e6:.2f} MB/s)")
+    print(f"speed-up         : {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark loop-invariant code motion on nested loops, in both engines.
+
+Runs a matrix traversal in the style of algolib/matrix/*.nx, whose loops re-read
+`matrix.Length` and recompute `rows * cols` on every iteration, with `optimizer.hoist`
+enabled and disabled, and reports the best time of each engine (output suppressed).
+
+Usage: python benchmarks/licm_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import optimizer
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+PROGRAM = """
+var rows = 40;
+var cols = 40;
+var matrix = [];
+while (matrix.Length < rows * cols) { matrix.PushBack(matrix.Length % 9); };
+var total = 0;
+for (var i = 0; i < rows; i += 1) {
+    for (var j = 0; j < cols; j += 1) {
+        total += matrix[(i * cols + j) % matrix.Length] * (rows * cols - 1);
+    };
+};
+displayl total;
+"""
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(PROGRAM)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    hoist = optimizer.hoist
+    print(f"best of {repeat}:")
+    for name, run in (("evaluator", execute), ("vm", run_program)):
+        optimizer.hoist = lambda root, tS: root
+        without = best_time(run, repeat)
+        optimizer.hoist = hoist
+        hoisted = best_time(run, repeat)
+        print(f"  {name:<10} {without * 1000:8.1f} ms -> {hoisted * 1000:8.1f} ms hoisted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Report the VM's dynamic opcode frequencies, and what each superinstruction saves.
+
+Runs the Project Euler programs of tests/euler_test.py (output suppressed) as threaded code and
+counts every instruction dispatched:
+- without superinstructions: the frequency of each opcode and of the commonest sequences;
+- with each fusion of `bytecode_opt.fuse_superinstructions` alone: the dispatches it saves;
+- with the fusions enabled by default (`bytecode_opt.FUSIONS`).
+The fusions enabled by default are those saving over 1% of the dispatches. Each program runs
+once per configuration, so the whole report takes several minutes (mostly euler_test_7 and 10).
+
+Usage: python benchmarks/opcode_report.py [program ...]  (test names, e.g. euler_test_9)
+"""
+import contextlib
+import io
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from bytecode_gen_new import codegen, parse, optimize
+from bytecode_opt import eliminate_dead_code, peephole, fuse_superinstructions, FUSIONS, ALL_FUSIONS
+from bytecode_asm import assemble
+from bytecode_eval_new import BytecodeVM, thread_code
+from dispatch_bench import euler_programs
+from scope import SymbolTable
+
+
+def compile_fused(program, fusions):
+    code = peephole(eliminate_dead_code(codegen(optimize(*parse(program, SymbolTable()))[0])))
+    return fuse_superinstructions(code, fusions)
+
+
+def dispatch_counts(code):
+    """The number of times each instruction of `code` is dispatched when running it."""
+    handlers = thread_code(BytecodeVM(assemble(code)))
+    counts = [0] * len(handlers)
+    ip, end = 0, len(handlers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        while ip < end:
+            counts[ip] += 1
+            ip = handlers[ip](ip)
+    return counts
+
+
+def main():
+    names = sys.argv[1:]
+    opcodes, sequences = Counter(), Counter()
+    saved, sites = Counter(), Counter()
+    total = enabled_total = 0
+    for name, program in euler_programs():
+        if names and name not in names:
+            continue
+        print(f"running {name}", file=sys.stderr)
+        code = compile_fused(program, ())
+        counts = dispatch_counts(code)
+        kinds = [type(insn).__name__ for insn in code.insns]
+        for i, count in enumerate(counts):
+            opcodes[kinds[i]] += count
+            for length in (2, 4):
+                if i + length <= len(kinds):
+                    sequences[" ".join(kinds[i:i + length])] += count
+        total += sum(counts)
+        for fusion in ALL_FUSIONS:
+            fused = compile_fused(program, (fusion,))
+            saved[fusion] += sum(counts) - sum(dispatch_counts(fused))
+            sites[fusion] += fused.fused[fusion]
+        enabled_total += sum(dispatch_counts(compile_fused(program, FUSIONS)))
+
+    print(f"\n{total} instructions dispatched without superinstructions\n")
+    print(f"  {'opcode':<32} {'count':>12} {'share':>7}")
+    for kind, count in opcodes.most_common(15):
+        print(f"  {kind:<32} {count:12} {count / total:7.1%}")
+    for length in (2, 4):
+        print(f"\n  {'sequence of ' + str(length):<32} {'count':>12} {'share':>7}")
+        common = [(seq, count) for seq, count in sequences.most_common() if seq.count(" ") == length - 1]
+        for seq, count in common[:8]:
+            print(f"  {seq:<32} {count:12} {count / total:7.1%}")
+
+    print(f"\n  {'fusion':<16} {'sites':>6} {'dispatches saved':>17} {'share':>7}  enabled")
+    for fusion in ALL_FUSIONS:
+        mark = "yes" if fusion in FUSIONS else "no"
+        print(f"  {fusion:<16} {sites[fusion]:6} {saved[fusion]:17} {saved[fusion] / total:7.1%}  {mark}")
+    print(f"\n{enabled_total} instructions dispatched with {', '.join(FUSIONS)} "
+          f"({1 - enabled_total / total:.1%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
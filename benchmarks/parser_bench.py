@@ -0,0 +1,48 @@
+"""Benchmark `parse` throughput and the number of Python calls it makes per token.
+
+Usage: python benchmarks/parser_bench.py [repeat_count]
+"""
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+from lexer import tokenize
+from parser import parse
+from scope import SymbolTable
+
+STATEMENTS = (
+    "x = x + arr[1] * 2 - (x % 7); if x > 100 then x = x / 2; end; "
+    "for (var i = 0; i < 3; i += 1) { arr[i] = arr[i] + i; };\n"
+)
+
+
+def build_program(count):
+    return "var x = 0; var arr = [1, 2, 3];\n" + STATEMENTS * count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    program = build_program(count)
+    best = float("inf")
+    for _ in range(3):
+        tokens = tokenize(program)
+        start = time.perf_counter()
+        parse(tokens, SymbolTable())
+        best = min(best, time.perf_counter() - start)
+
+    profiler = cProfile.Profile()
+    tokens = tokenize(program)
+    profiler.runcall(parse, tokens, SymbolTable())
+    calls = pstats.Stats(profiler).total_calls
+
+    print(f"tokens           : {len(tokens)}")
+    print(f"parse            : {best:.3f} s ({best / len(tokens) * 1e6:.2f} us/token)")
+    print(f"python calls     : {calls} ({calls / len(tokens):.1f} per token)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Report what the peephole pass does to each program's bytecode.
+
+Compiles the Project Euler programs in tests/project_euler_codes.py (or the given .nx files)
+through dead-code elimination, then prints the instruction count before and after `peephole`,
+with the instructions each rule removed and the rewrites of the others, program by program and
+in total.
+
+Usage: python benchmarks/peephole_report.py [file.nx ...]
+"""
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from bytecode_gen_new import codegen, parse, optimize
+from bytecode_opt import eliminate_dead_code, peephole
+from dce_report import load_programs
+from scope import SymbolTable
+
+
+def main():
+    total_before = total_after = 0
+    removed, rewritten = Counter(), Counter()
+    print(f"{'program':<12} {'before':>7} {'after':>7}  removed; rewritten")
+    for name, program in load_programs(sys.argv[1:]).items():
+        try:
+            code = eliminate_dead_code(codegen(optimize(*parse(program, SymbolTable()))[0]))
+        except Exception as err:
+            print(f"{name:<12} does not compile: {type(err).__name__}")
+            continue
+        before = len(code.insns)
+        peephole(code)
+        after = len(code.insns)
+        total_before += before
+        total_after += after
+        removed.update(code.peephole["removed"])
+        rewritten.update(code.peephole["rewritten"])
+        print(f"{name:<12} {before:>7} {after:>7}  {describe(code.peephole['removed'])}; "
+              f"{describe(code.peephole['rewritten'])}")
+    print(f"{'total':<12} {total_before:>7} {total_after:>7}  {describe(removed)}; {describe(rewritten)}")
+
+
+def describe(counts):
+    return ", ".join(f"{rule} {count}" for rule, count in counts.items() if count) or "-"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark the specialized property operations (`parser.property_access`), in both engines.
+
+Runs a queue-and-lookup loop over `.Length`, `.PushBack`, `.PopFront`, `.Slice` and `.Contains`
+on an array, a string and a hash, with `parser.SPECIALIZED` enabled and emptied (every access
+generic), and reports the best time of each engine (output suppressed).
+
+Usage: python benchmarks/property_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import parser
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+PROGRAM = """
+var queue = [0];
+var text = "specialization";
+var seen = {0: True};
+var total = 0;
+for (var i = 1; i < 3000; i += 1) {
+    queue.PushBack(i);
+    if queue.Length > 8 then {
+        total += queue.PopFront;
+    } end;
+    if seen.Contains(i % 50) then {
+        var part = text.Slice(i % 7, 10);
+        total += part.Length + text.Length;
+    } else {
+        seen[i % 50] = True;
+    } end;
+};
+displayl total;
+"""
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(PROGRAM)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    specialized = dict(parser.SPECIALIZED)
+    print(f"best of {repeat}:")
+    for name, run in (("evaluator", execute), ("vm", run_program)):
+        parser.SPECIALIZED.clear()
+        generic = best_time(run, repeat)
+        parser.SPECIALIZED.update(specialized)
+        fast = best_time(run, repeat)
+        print(f"  {name:<10} {generic * 1000:8.1f} ms -> {fast * 1000:8.1f} ms specialized")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark the register VM (register_vm) head to head with the stack VM.
+
+Each Project Euler program of tests/euler_test.py is compiled once for each VM; then the best
+time of running it is reported for both (output suppressed): the stack VM as `run_program`
+runs it (superinstructions, threaded code) and `RegisterVM` on the code of
+`compile_registers`. The instruction counts are those of the compiled code, all functions
+included.
+
+Usage: python benchmarks/register_vm_bench.py [repeat_count] [program ...]
+(programs by test name, e.g. euler_test_9; the slowest, 7 and 10, take seconds per run)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from bytecode_gen_new import compile_program
+from bytecode_asm import assemble
+from bytecode_eval_new import BytecodeVM
+from register_vm import compile_registers, RegisterVM
+from dispatch_bench import euler_programs, best_time
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = int(args.pop(0)) if args and args[0].isdigit() else 3
+    print(f"best of {repeat}, ms (instructions):")
+    print(f"  {'program':<16} {'stack':>17} {'registers':>17} {'speedup':>8}")
+    totals = [0.0, 0.0]
+    for name, program in euler_programs():
+        if args and name not in args:
+            continue
+        flat = assemble(compile_program(program)[0])
+        code = compile_registers(program)[0]
+        stack = best_time(lambda: BytecodeVM(flat), repeat)
+        registers = best_time(lambda: RegisterVM(code), repeat)
+        totals[0] += stack
+        totals[1] += registers
+        size = sum(len(proto.code) for proto in code.protos)
+        print(f"  {name:<16} {stack * 1000:10.1f} ({len(flat):4}) {registers * 1000:10.1f} ({size:4}) "
+              f"{stack / registers:7.2f}x")
+    print(f"  {'total':<16} {totals[0] * 1000:17.1f} {totals[1] * 1000:17.1f} {totals[0] / totals[1]:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
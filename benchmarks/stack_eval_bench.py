@@ -0,0 +1,61 @@
+"""Benchmark the explicit-stack evaluator (`stack_eval`): memory per Nexus call, and speed.
+
+Runs a non-tail recursive function (`sum(n) = n + sum(n - 1)`) at two depths and reports the
+peak memory traced (tracemalloc) per level of recursion, which `stack_eval.HEAP_BUDGET` is
+spent on; then the best time of a shallower call with `e` and with `explicit_stack=True`.
+
+Usage: python benchmarks/stack_eval_bench.py [depth] [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from evaluator import execute
+
+PROGRAM = """
+fn sum(n) {
+    if n == 0 then 0 else n + sum(n - 1) end;
+};
+displayl sum(%d);
+"""
+
+
+def peak_bytes(depth):
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        execute(PROGRAM % depth, explicit_stack=True)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def best_time(depth, repeat, **engine):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            execute(PROGRAM % depth, **engine)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    per_call = (peak_bytes(2 * depth) - peak_bytes(depth)) / depth
+    print(f"memory per level of recursion: {per_call:.0f} bytes (depths {depth} and {2 * depth})")
+
+    shallow = 2000  # within reach of `e` and the Python stack
+    tree_walk = best_time(shallow, repeat)
+    explicit = best_time(shallow, repeat, explicit_stack=True)
+    print(f"best of {repeat}, sum({shallow}):")
+    print(f"  e()              {tree_walk * 1000:8.1f} ms")
+    print(f"  explicit stack   {explicit * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Benchmark strength reduction on integer arithmetic, in both engines.
+
+Runs an Euler-style loop over `integer`-declared variables that uses `floor(a / b)` (with a
+dividend bounded by the fixed `limit`, as the rewrite needs) and `x ** 2`, with `optimizer.reduce_strength` enabled and disabled, and reports the best time of
+each engine (output suppressed).
+
+Usage: python benchmarks/strength_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import optimizer
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+PROGRAM = """
+fixed var integer limit = 3000;
+var integer total = 0;
+for (var integer i = 1; i < limit; i += 1) {
+    var integer half = floor((i % limit) / 2);
+    total += half ** 2 + floor(limit / i);
+};
+displayl total;
+"""
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(PROGRAM)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    reduce_strength = optimizer.reduce_strength
+    print(f"best of {repeat}:")
+    for name, run in (("evaluator", execute), ("vm", run_program)):
+        optimizer.reduce_strength = lambda root: root
+        without = best_time(run, repeat)
+        optimizer.reduce_strength = reduce_strength
+        reduced = best_time(run, repeat)
+        print(f"  {name:<10} {without * 1000:8.1f} ms -> {reduced * 1000:8.1f} ms reduced")
+
+
+if __name__ == "__main__":
+    main()
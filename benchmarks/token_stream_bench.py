@@ -0,0 +1,60 @@
+"""Compare memory and parse time of the array-backed TokenStream against a list of token objects.
+
+Usage: python benchmarks/token_stream_bench.py [size_in_MB]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+from more_itertools import peekable
+from lexer import lex_charwise, tokenize
+from parser import parse
+from scope import SymbolTable
+from lexer_bench import build_source
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    tokens = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, tokens
+
+
+def time_parse(make_cursor, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        cursor = make_cursor()
+        start = time.perf_counter()
+        parse(cursor, SymbolTable())
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    source = build_source(megabytes)
+    list_bytes, token_list = measure_memory(lambda: list(lex_charwise(source)))
+    stream_bytes, stream = measure_memory(lambda: tokenize(source))
+    print(f"source size      : {len(source) / 1024 / 1024:.2f} MB, {len(stream)} tokens")
+    print(f"token objects    : {list_bytes / 1024 / 1024:.2f} MB ({list_bytes / len(token_list):.1f} B/token)")
+    print(f"TokenStream      : {stream_bytes / 1024 / 1024:.2f} MB ({stream_bytes / len(stream):.1f} B/token)")
+    print(f"memory reduction : {list_bytes / stream_bytes:.2f}x")
+
+    # Parsing needs a whole program (the cut corpus redeclares functions), so use a generated one.
+    program = "var x = 0; var arr = [1, 2, 3];\n" + (
+        "x = x + arr[1] * 2 - (x % 7); if x > 100 then x = x / 2; end; "
+        "for (var i = 0; i < 3; i += 1) { arr[i] = arr[i] + i; };\n"
+    ) * 2000
+    program_tokens = list(lex_charwise(program))
+    list_time = time_parse(lambda: peekable(program_tokens))
+    stream_time = time_parse(lambda: tokenize(program))
+    print(f"parse (list)     : {list_time:.3f} s")
+    print(f"parse (stream)   : {stream_time:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
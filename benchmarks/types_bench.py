@@ -0,0 +1,60 @@
+"""Benchmark type annotation of bindings with declared dtypes, in both engines.
+
+Runs a loop of `integer`, `decimal` and `string` bindings and compound assignments, with
+`optimizer.annotate_types` enabled and disabled, and reports the best time of each engine
+(output suppressed).
+
+Usage: python benchmarks/types_bench.py [repeat_count]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+import optimizer
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+PROGRAM = """
+var integer total = 0;
+var decimal scale = 0.5;
+var string trail = "";
+for (var integer i = 0; i < 3000; i += 1) {
+    var integer square = i * i;
+    var decimal part = scale * i;
+    var string digit = char(48 + i % 10);
+    total += square % 7;
+    scale *= 1.0001;
+    trail = trail + digit;
+};
+displayl total;
+displayl trail.Length;
+"""
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(PROGRAM)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    annotate_types = optimizer.annotate_types
+    print(f"best of {repeat}:")
+    for name, run in (("evaluator", execute), ("vm", run_program)):
+        optimizer.annotate_types = lambda root: root
+        without = best_time(run, repeat)
+        optimizer.annotate_types = annotate_types
+        typed = best_time(run, repeat)
+        print(f"  {name:<10} {without * 1000:8.1f} ms -> {typed * 1000:8.1f} ms typed")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,16 @@ from tqdm import tqdm
 from pprint import pprint
 from bytecode_eval_new import *
 
-def run_nexus_file(file_path,display_ast=False):
-    """Runs the given Nexus file and tracks execution time."""
+def run_nexus_file(file_path,display_ast=False,use_cache=True,engine="stack",optimize=True):
+    """Runs the given Nexus file and tracks execution time.
+
+    The compiled bytecode is cached in `__nxcache__/` next to the file and reused until the
+    file or the compiler changes; `use_cache=False` always recompiles. `engine` names what runs
+    it, as `run_program` does: "stack" (the default) for the stack VM, "registers" for the
+    register VM; or the tree-walk evaluator instead of a VM, on the tree compiled into
+    closures with "closures", or on an explicit stack, for recursion deeper than Python's,
+    with "explicit_stack". `optimize=False` skips the optimizer's passes.
+    """
     start_time = time.time()
     try:
         with open(file_path, 'r') as file:
@@ -21,7 +29,14 @@ def run_nexus_file(file_path,display_ast=False):
             print('\n')
         print(f"Running {file_path}...\n")
         start_time = time.perf_counter_ns()
-        run_program(code)
+        if engine == "closures":
+            execute(code, source_path=file_path if use_cache else None, compiled=True, optimize=optimize)
+        elif engine == "explicit_stack":
+            execute(code, source_path=file_path if use_cache else None, explicit_stack=True, optimize=optimize)
+        elif engine == "registers":
+            run_program(code, source_path=file_path if use_cache else None, engine="registers", optimize=optimize)
+        else:
+            run_program(code, source_path=file_path if use_cache else None, optimize=optimize)
         end_time = time.perf_counter_ns()
         execution_time_us = (end_time - start_time) / 1000  # Convert nanoseconds to microseconds
         print(f"\nProgram execution completed in {execution_time_us:.2f} microseconds.")
@@ -31,8 +46,9 @@ def run_nexus_file(file_path,display_ast=False):
         print(f"Error while executing the code: {e}")
    
 def main():
-    if len(sys.argv) < 2 or len(sys.argv) > 3:
-        print("Usage: nexus <file.nx> [--ast]")
+    flags = sys.argv[2:]
+    if len(sys.argv) < 2 or any(flag not in ("--ast", "--no-cache", "--no-opt", "--closures", "--explicit-stack", "--registers") for flag in flags):
+        print("Usage: nexus <file.nx> [--ast] [--no-cache] [--no-opt] [--closures | --explicit-stack | --registers]")
         return
 
     file_path = sys.argv[1]
@@ -40,8 +56,11 @@ def main():
         print("Error: File extension must be .nx")
         return
 
-    display_ast = len(sys.argv) == 3 and sys.argv[2] == "--ast"
-    run_nexus_file(file_path, display_ast)
+    display_ast = "--ast" in flags
+    run_nexus_file(file_path, display_ast, use_cache="--no-cache" not in flags,
+                   engine="closures" if "--closures" in flags else "explicit_stack" if "--explicit-stack" in flags
+                   else "registers" if "--registers" in flags else "stack",
+                   optimize="--no-opt" not in flags)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Assembly of generated bytecode into the flat form the VM runs.
+
+`codegen` and `bytecode_opt` work on a `ByteCode`: a list of instruction objects (one class
+of `I` per kind), whose jumps go through `Label`s. `assemble` lowers a finished `ByteCode`
+into a `FlatCode`:
+
+- `ops`: one opcode per instruction, `Op.<name of the instruction class>`, as bytes;
+- `args`: the instruction's operand, in a parallel array of integers: a jump target resolved
+  to an absolute index, a frame slot (STORE), a size or argument count, or else the index
+  of its operand in `consts` (0 when it has none);
+- `consts`: the constant pool, each value once: PUSH values, the `(name, slot)` of LOAD and
+  CALL, the `(slot, entry)` of PUSHFN, PROPERTY_ACCESS operations and TYPECAST types, and the
+  operands of each superinstruction as a tuple (its jump target included, its constant as the
+  index of that constant in the pool).
+
+`BytecodeVM.run` executes a `FlatCode` directly; see benchmarks/flat_code_bench.py for its
+memory and dispatch cost against the object form.
+"""
+import math
+from array import array
+from bytecode_gen_new import I
+
+OPCODES = [cls for cls in vars(I).values() if isinstance(cls, type)]  # opcode -> instruction class
+OPCODE = {cls: opcode for opcode, cls in enumerate(OPCODES)}
+
+
+class Op:
+    """The opcode of each instruction class of `I`, under its name: `Op.PUSH`, `Op.JMP`, ..."""
+
+
+for _opcode, _cls in enumerate(OPCODES):
+    setattr(Op, _cls.__name__, _opcode)
+
+
+class FlatCode:
+    __slots__ = ("ops", "args", "consts", "layouts")
+
+    def __init__(self, ops, args, consts, layouts):
+        self.ops = ops  # bytes: the opcode of each instruction
+        self.args = args  # array of int: the operand of each instruction
+        self.consts = consts  # constant pool
+        self.layouts = layouts  # {entry: {name: slot}} of each function, as in ByteCode
+
+    def __len__(self):
+        return len(self.ops)
+
+    def print_bytecode(self):
+        for i, (opcode, arg) in enumerate(zip(self.ops, self.args)):
+            name = OPCODES[opcode].__name__
+            if opcode in _POOLED:
+                print(f"{i:=4} {name:<15} {arg} ({self.consts[arg]!r})")
+            else:
+                print(f"{i:=4} {name:<15} {arg}")
+
+
+# instructions whose operand is an index into the constant pool
+_POOLED = {Op.PUSH, Op.LOAD, Op.CALL, Op.TAIL_CALL, Op.PUSHFN, Op.PROPERTY_ACCESS, Op.TYPECAST,
+           Op.INC_VAR, Op.STORE_CONST, Op.CMP_JUMP, Op.CMP_CONST_JUMP, Op.LOAD_INDEX2}
+
+
+def assemble(code):
+    """The `FlatCode` of the `ByteCode` `code`; labels must all be placed."""
+    consts, pooled = [], {}
+
+    def const(value):
+        # keeps 1, 1.0 and True apart, and 0.0 and -0.0
+        key = (type(value), value, math.copysign(1.0, value) if isinstance(value, float) else None)
+        index = pooled.get(key)
+        if index is None:
+            index = pooled[key] = len(consts)
+            consts.append(value)
+        return index
+
+    ops, args = bytearray(), array("l")
+    for insn in code.insns:
+        ops.append(OPCODE[type(insn)])
+        args.append(_operand(insn, const))
+    return FlatCode(bytes(ops), args, consts, code.layouts)
+
+
+def _operand(insn, const):
+    match insn:
+        case I.PUSH():
+            return const(insn.value)
+        case I.JMP() | I.JMP_IF_TRUE() | I.JMP_IF_FALSE():
+            return insn.label.target
+        case I.LOAD() | I.CALL():  # and TAIL_CALL
+            return const((insn.name, insn.slot))
+        case I.STORE():
+            return insn.slot
+        case I.PUSHFN():
+            return const((insn.slot, insn.label.target))
+        case I.MAKE_ARRAY() | I.MAKE_HASH():
+            return insn.size
+        case I.STR_SLICE():
+            return insn.argc
+        case I.PROPERTY_ACCESS():
+            return const(insn.operation)
+        case I.TYPECAST():
+            return const(insn.dtype)
+        case I.INC_VAR():
+            return const((insn.name, insn.slot, const(insn.value)))
+        case I.STORE_CONST():
+            return const((insn.slot, const(insn.value)))
+        case I.CMP_JUMP():
+            return const((insn.op, insn.name, insn.slot, insn.other, insn.other_slot, insn.label.target))
+        case I.CMP_CONST_JUMP():
+            return const((insn.op, insn.name, insn.slot, const(insn.value), insn.label.target))
+        case I.LOAD_INDEX2():
+            return const((insn.name, insn.slot, insn.index, insn.index_slot, insn.index2, insn.index2_slot))
+    return 0
@@ -1,95 +1,150 @@
 from bytecode_gen_new import *
+from bytecode_asm import assemble, FlatCode, Op, OPCODES
+from compile_cache import load_or_compile
+import linecache
 import math
+import operator
+import re
+import traceback
 from evaluator import execute
 
+UNSET = object()  # marks a frame slot whose variable has not been stored yet
+
+SUPERINSTRUCTIONS = {Op.INC_VAR, Op.STORE_CONST, Op.CMP_JUMP, Op.CMP_CONST_JUMP, Op.LOAD_INDEX2}
+
+# comparison of CMP_JUMP and CMP_CONST_JUMP, by the name of its instruction
+COMPARE = {"EQ": operator.eq, "NE": operator.ne, "LT": operator.lt, "GT": operator.gt,
+           "LE": operator.le, "GE": operator.ge}
+
+# Built-in functions, by name: (function, number of arguments)
+BUILTINS = {
+    # Existing built-ins
+    'char': (chr, 1),
+    'ascii': (ord, 1),
+    'length': (len, 1),
+    'string': (str, 1),
+    'integer': (int, 1),
+    'decimal': (float, 1),
+    'boolean': (bool, 1),
+    
+    # Array operations - modified to return the array
+    'array_insert': (lambda arr, idx, val: (arr.insert(idx, val), arr)[1], 3),
+    'array_append': (lambda arr, val: (arr.append(val), arr)[1], 2),
+    'array_remove': (lambda arr, idx: (arr.pop(idx), arr), 2),
+    'array_popfront': (lambda arr: (arr.pop(0), arr), 1),
+    'array_popback': (lambda arr: (arr.pop(), arr), 1),
+    'array_clear': (lambda arr: (arr.clear(), arr), 1),
+    'array_sort': (lambda arr: sorted(arr), 1),
+    'array_sort_with_comparator': (lambda arr, comp: sorted(arr, key=comp), 2),
+    # String operations
+    'string_index': (lambda s, idx: s[idx], 2),
+    'string_pushfront': (lambda s, val: val + s, 2),
+    'string_pushback': (lambda s, val: s + val, 2),
+    'string_popfront': (lambda s: s[1:], 1),
+    'string_popback': (lambda s: s[:-1], 1),
+    'string_set': (lambda s, idx, val: s[:idx] + val + s[idx + 1:], 3),
+    'string_insert': (lambda s, idx, val: s[:idx] + val + s[idx:], 3),
+    'string_remove_at': (lambda s, idx: s[:idx] + s[idx + 1:], 2),
+    
+    # Hash operations
+    'hash_remove': (lambda hash_map, key: hash_map.pop(key, None), 2),
+    
+    # Type checking and generic operations
+    'type_check': (lambda obj: type(obj) is list, 1),
+    'obj_slice': (lambda obj, start, end, step: obj[start:end:step], 4),
+    'typeof': (lambda val: next((t for t, ty in [
+        ('integer', int), ('decimal', float), ('string', str), 
+        ('array', list), ('Hash', dict), ('boolean', bool)
+    ] if isinstance(val, ty)), 'unknown'), 1),
+
+    # Format string operations
+    'format_string_1': (lambda template, var1: template.replace('{1}', str(var1)), 2),
+    'format_string_2': (lambda template, var1, var2: template.replace('{1}', str(var1)).replace('{2}', str(var2)), 3),
+    
+    # Math operations
+    'math_abs': (lambda x: math.fabs(x), 1),
+    'math_min': (lambda arr: min(arr), 1),
+    'math_max': (lambda arr: max(arr), 1),
+    'math_round': (lambda x, digits=0: round(x, digits), 2),
+    'math_ceil': (lambda x: math.ceil(x), 1),
+    'math_floor': (lambda x: math.floor(x), 1),
+    'math_truncate': (lambda x: math.trunc(x), 1),
+    'math_sqrt': (lambda x: math.sqrt(x), 1),
+    'math_cbrt': (lambda x: x ** (1/3), 1),
+    'math_pow': (lambda x, y: math.pow(x,y), 2),
+    'math_exp': (lambda x: math.exp(x), 1),
+    'math_log': (lambda x: math.log(x), 1),
+    'math_log10': (lambda x: math.log10(x), 1),
+    'math_log2': (lambda x: math.log2(x), 1),
+    'math_sin': (lambda x: math.sin(x), 1),
+    'math_cos': (lambda x: math.cos(x), 1),
+    'math_tan': (lambda x: math.tan(x), 1),
+    'math_asin': (lambda x: math.asin(x), 1),
+    'math_acos': (lambda x: math.acos(x), 1),
+    'math_atan': (lambda x: math.atan(x), 1),
+    'math_atan2': (lambda y, x: math.atan2(y, x), 2),
+    'math_sinh': (lambda x: math.sinh(x), 1),
+    'math_cosh': (lambda x: math.cosh(x), 1),
+    'math_tanh': (lambda x: math.tanh(x), 1),
+    'math_asinh': (lambda x: math.asinh(x), 1),
+    'math_acosh': (lambda x: math.acosh(x), 1),
+    'math_atanh': (lambda x: math.atanh(x), 1),
+    'math_pi': (lambda: math.pi, 0),
+    'math_e': (lambda: math.e, 0),
+    'math_sum': (lambda arr: sum(arr), 1),
+    'math_avg': (lambda arr: sum(arr) / len(arr), 1),
+}
+
 class BytecodeVM:
-    def __init__(self, bytecode):
+    def __init__(self, bytecode, threaded=True):
         self.bytecode = bytecode
+        self.threaded = threaded   # run assembled bytecode as threaded code (see `thread_code`)
         self.ip = 0                # Instruction pointer
         self.stack = []            # Operand stack
-        self.frames = [{}]         # Call frames for variable storage
+        main_layout = bytecode.layouts[0]
+        self.frames = [[UNSET] * len(main_layout)]  # Call frames: one slot per variable of the function
+        self.frame_layouts = [main_layout]          # {name: slot} of each frame
+        self.return_addrs = [None]                  # Return address of each frame
         self.frame_index = 0       # Current frame index
-        self.builtins = {  # Built-in functions
-        # Existing built-ins
-        'char': (chr, 1),
-        'ascii': (ord, 1),
-        'length': (len, 1),
-        'string': (str, 1),
-        'integer': (int, 1),
-        'decimal': (float, 1),
-        'boolean': (bool, 1),
-        
-        # Array operations - modified to return the array
-        'array_insert': (lambda arr, idx, val: (arr.insert(idx, val), arr)[1], 3),
-        'array_append': (lambda arr, val: (arr.append(val), arr)[1], 2),
-        'array_remove': (lambda arr, idx: (arr.pop(idx), arr), 2),
-        'array_popfront': (lambda arr: (arr.pop(0), arr), 1),
-        'array_popback': (lambda arr: (arr.pop(), arr), 1),
-        'array_clear': (lambda arr: (arr.clear(), arr), 1),
-        'array_sort': (lambda arr: sorted(arr), 1),
-        'array_sort_with_comparator': (lambda arr, comp: sorted(arr, key=comp), 2),
-        # String operations
-        'string_index': (lambda s, idx: s[idx], 2),
-        'string_pushfront': (lambda s, val: val + s, 2),
-        'string_pushback': (lambda s, val: s + val, 2),
-        'string_popfront': (lambda s: s[1:], 1),
-        'string_popback': (lambda s: s[:-1], 1),
-        'string_set': (lambda s, idx, val: s[:idx] + val + s[idx + 1:], 3),
-        'string_insert': (lambda s, idx, val: s[:idx] + val + s[idx:], 3),
-        'string_remove_at': (lambda s, idx: s[:idx] + s[idx + 1:], 2),
-        
-        # Hash operations
-        'hash_remove': (lambda hash_map, key: hash_map.pop(key, None), 2),
-        
-        # Type checking and generic operations
-        'type_check': (lambda obj: type(obj) is list, 1),
-        'obj_slice': (lambda obj, start, end, step: obj[start:end:step], 4),
-        'typeof': (lambda val: next((t for t, ty in [
-            ('integer', int), ('decimal', float), ('string', str), 
-            ('array', list), ('Hash', dict), ('boolean', bool)
-        ] if isinstance(val, ty)), 'unknown'), 1),
-
-        # Format string operations
-        'format_string_1': (lambda template, var1: template.replace('{1}', str(var1)), 2),
-        'format_string_2': (lambda template, var1, var2: template.replace('{1}', str(var1)).replace('{2}', str(var2)), 3),
-        
-        # Math operations
-        'math_abs': (lambda x: math.fabs(x), 1),
-        'math_min': (lambda arr: min(arr), 1),
-        'math_max': (lambda arr: max(arr), 1),
-        'math_round': (lambda x, digits=0: round(x, digits), 2),
-        'math_ceil': (lambda x: math.ceil(x), 1),
-        'math_floor': (lambda x: math.floor(x), 1),
-        'math_truncate': (lambda x: math.trunc(x), 1),
-        'math_sqrt': (lambda x: math.sqrt(x), 1),
-        'math_cbrt': (lambda x: x ** (1/3), 1),
-        'math_pow': (lambda x, y: math.pow(x,y), 2),
-        'math_exp': (lambda x: math.exp(x), 1),
-        'math_log': (lambda x: math.log(x), 1),
-        'math_log10': (lambda x: math.log10(x), 1),
-        'math_log2': (lambda x: math.log2(x), 1),
-        'math_sin': (lambda x: math.sin(x), 1),
-        'math_cos': (lambda x: math.cos(x), 1),
-        'math_tan': (lambda x: math.tan(x), 1),
-        'math_asin': (lambda x: math.asin(x), 1),
-        'math_acos': (lambda x: math.acos(x), 1),
-        'math_atan': (lambda x: math.atan(x), 1),
-        'math_atan2': (lambda y, x: math.atan2(y, x), 2),
-        'math_sinh': (lambda x: math.sinh(x), 1),
-        'math_cosh': (lambda x: math.cosh(x), 1),
-        'math_tanh': (lambda x: math.tanh(x), 1),
-        'math_asinh': (lambda x: math.asinh(x), 1),
-        'math_acosh': (lambda x: math.acosh(x), 1),
-        'math_atanh': (lambda x: math.atanh(x), 1),
-        'math_pi': (lambda: math.pi, 0),
-        'math_e': (lambda: math.e, 0),
-        'math_sum': (lambda arr: sum(arr), 1),
-        'math_avg': (lambda arr: sum(arr) / len(arr), 1),
-        }
+        self.builtins = BUILTINS   # Built-in functions
     
     def current_frame(self):
         """Get the current variable frame"""
         return self.frames[self.frame_index]
+
+    def push_frame(self, layout, return_addr):
+        self.frames.append([UNSET] * len(layout))
+        self.frame_layouts.append(layout)
+        self.return_addrs.append(return_addr)
+        self.frame_index += 1
+
+    def pop_frame(self):
+        self.frames.pop()
+        self.frame_layouts.pop()
+        self.frame_index -= 1
+        return self.return_addrs.pop()
+
+    def find(self, name, slot):
+        """
+        Value of `name`, or UNSET. Its own slot in the current frame is tried first; if the
+        function has not stored it yet, the enclosing frames are searched, innermost first.
+        """
+        value = self.frames[self.frame_index][slot]
+        if value is UNSET:
+            for i in range(self.frame_index - 1, -1, -1):
+                outer_slot = self.frame_layouts[i].get(name)
+                if outer_slot is not None and self.frames[i][outer_slot] is not UNSET:
+                    return self.frames[i][outer_slot]
+        return value
+
+    def load(self, name, slot):
+        """The value LOAD `name` pushes: a built-in, or else the variable."""
+        if name in self.builtins:
+            return self.builtins[name]
+        value = self.find(name, slot)
+        if value is UNSET:
+            raise RuntimeError(f"Variable '{name}' not defined")
+        return value
     
     def push(self, value):
         """Push value onto the stack"""
@@ -103,6 +158,14 @@ class BytecodeVM:
     
     def run(self):
         """Execute the bytecode"""
+        if isinstance(self.bytecode, FlatCode):
+            try:
+                return self.run_threaded() if self.threaded else self.run_flat()
+            except IndexError as error:
+                # the handlers take operands straight off the stack, without the check of `pop`
+                if _stack_underflow(error):
+                    raise RuntimeError("Stack underflow") from None
+                raise
         while self.ip < len(self.bytecode.insns):
             instruction = self.bytecode.insns[self.ip]
             self.execute_instruction(instruction)
@@ -110,7 +173,265 @@ class BytecodeVM:
             
         # Return the top of the stack (if any) as the program result
         return self.stack[0] if self.stack else None
+
+    def run_threaded(self):
+        """Execute assembled bytecode as threaded code: one bound handler per instruction."""
+        handlers = thread_code(self)
+        ip, end = self.ip, len(handlers)
+        while ip < end:
+            ip = handlers[ip](ip)
+        self.ip = ip
+        return self.stack[0] if self.stack else None
+
+    def run_flat(self):
+        """
+        Execute assembled bytecode (see bytecode_asm): the cases of `execute_instruction`, on
+        the opcode and operand of each instruction instead of its object.
+        """
+        code = self.bytecode
+        ops, args, consts = code.ops, code.args, code.consts
+        stack, builtins = self.stack, self.builtins
+        push, pop = stack.append, stack.pop
+        ip, end = self.ip, len(ops)
+        while ip < end:
+            arg = args[ip]
+            match ops[ip]:
+                case Op.PUSH:
+                    push(consts[arg])
+                case Op.LOAD:
+                    name, slot = consts[arg]
+                    if name in builtins:
+                        push(builtins[name])
+                    else:
+                        value = self.find(name, slot)
+                        if value is UNSET:
+                            raise RuntimeError(f"Variable '{name}' not defined")
+                        push(value)
+                case Op.STORE:
+                    self.frames[self.frame_index][arg] = pop()
+                case Op.JMP:
+                    ip = arg
+                    continue
+                case Op.JMP_IF_FALSE:
+                    if not pop():
+                        ip = arg
+                        continue
+                case Op.JMP_IF_TRUE:
+                    if pop():
+                        ip = arg
+                        continue
+                case Op.ADD:
+                    right = pop()
+                    stack[-1] = stack[-1] + right
+                case Op.SUB:
+                    right = pop()
+                    stack[-1] = stack[-1] - right
+                case Op.MUL:
+                    right = pop()
+                    stack[-1] = stack[-1] * right
+                case Op.DIV:
+                    right = pop()
+                    stack[-1] = stack[-1] / right
+                case Op.FLOORDIV:
+                    right = pop()
+                    stack[-1] = stack[-1] // right
+                case Op.MODULO:
+                    right = pop()
+                    stack[-1] = stack[-1] % right
+                case Op.POW:
+                    right = pop()
+                    stack[-1] = stack[-1] ** right
+                case Op.EQ:
+                    right = pop()
+                    stack[-1] = stack[-1] == right
+                case Op.NE:
+                    right = pop()
+                    stack[-1] = stack[-1] != right
+                case Op.LT:
+                    right = pop()
+                    stack[-1] = stack[-1] < right
+                case Op.GT:
+                    right = pop()
+                    stack[-1] = stack[-1] > right
+                case Op.LE:
+                    right = pop()
+                    stack[-1] = stack[-1] <= right
+                case Op.GE:
+                    right = pop()
+                    stack[-1] = stack[-1] >= right
+                case Op.AND:
+                    right = pop()
+                    stack[-1] = stack[-1] and right
+                case Op.OR:
+                    right = pop()
+                    stack[-1] = stack[-1] or right
+                case Op.BITAND:
+                    right = pop()
+                    stack[-1] = stack[-1] & right
+                case Op.BITOR:
+                    right = pop()
+                    stack[-1] = stack[-1] | right
+                case Op.BITXOR:
+                    right = pop()
+                    stack[-1] = stack[-1] ^ right
+                case Op.LSHIFT:
+                    right = pop()
+                    stack[-1] = stack[-1] << right
+                case Op.RSHIFT:
+                    right = pop()
+                    stack[-1] = stack[-1] >> right
+                case Op.UPLUS:
+                    stack[-1] = +stack[-1]
+                case Op.UMINUS:
+                    stack[-1] = -stack[-1]
+                case Op.NOT:
+                    stack[-1] = not stack[-1]
+                case Op.BITNOT:
+                    stack[-1] = ~stack[-1]
+                case Op.POP:
+                    pop()
+                case Op.DUP:
+                    push(stack[-1])
+                case Op.CALL | Op.TAIL_CALL:
+                    name, slot = consts[arg]
+                    if name in builtins:
+                        fn, num_args = builtins[name]
+                        # arguments in push order
+                        call_args = stack[len(stack) - num_args:] if num_args else []
+                        del stack[len(stack) - num_args:]
+                        result = fn(*call_args)
+                        if result is not None:  # Don't push None results
+                            if isinstance(result, tuple) and len(result) == 2:
+                                push(result[0])
+                                push(result[1])
+                            else:
+                                push(result)
+                    else:
+                        target = self.find(name, slot)
+                        if target is UNSET or target is None:
+                            raise RuntimeError(f"Function '{name}' not defined")
+                        # as in execute_instruction: a function calling itself in tail position
+                        # keeps its frame
+                        layout = code.layouts[target]
+                        if ops[ip] != Op.TAIL_CALL or layout is not self.frame_layouts[self.frame_index]:
+                            self.push_frame(layout, ip + 1)
+                        ip = target
+                        continue
+                case Op.RETURN:
+                    ip = self.pop_frame()
+                    continue
+                case Op.PUSHFN:
+                    slot, entry = consts[arg]
+                    self.frames[self.frame_index][slot] = entry
+                case Op.MAKE_ARRAY:
+                    elements = stack[len(stack) - arg:] if arg else []
+                    del stack[len(stack) - arg:]
+                    push(elements)
+                case Op.MAKE_HASH:
+                    items = stack[len(stack) - 2 * arg:] if arg else []
+                    del stack[len(stack) - 2 * arg:]
+                    push({items[i]: items[i + 1] for i in range(0, len(items), 2)})
+                case Op.ARRAY_LEN | Op.STR_LEN | Op.HASH_LEN:
+                    if type(stack[-1]) in (list, str, dict):
+                        stack[-1] = len(stack[-1])
+                    else:
+                        self.property_access("Length")
+                case Op.ARRAY_APPEND:
+                    if type(stack[-2]) is list:
+                        value = pop()
+                        stack[-1].append(value)
+                    else:
+                        self.property_access("PushBack")
+                case Op.ARRAY_POP_BACK | Op.ARRAY_POP_FRONT:
+                    obj = stack[-1]
+                    if type(obj) is list and obj:
+                        stack[-1] = obj.pop() if ops[ip] == Op.ARRAY_POP_BACK else obj.pop(0)
+                        push(obj)
+                    else:
+                        self.property_access(OPCODES[ops[ip]].operation)
+                case Op.STR_SLICE:
+                    if type(stack[-1 - arg]) is str:
+                        start, end_, step = [pop() for _ in range(arg)] + [None] * (3 - arg)
+                        stack[-1] = stack[-1][start:end_:step]
+                    else:
+                        self.property_access("Slice")
+                case Op.HASH_CONTAINS:
+                    if type(stack[-2]) is dict:
+                        key = pop()
+                        stack[-1] = key in stack[-1]
+                    else:
+                        self.property_access("Contains")
+                case Op.PROPERTY_ACCESS:
+                    self.property_access(consts[arg])
+                case Op.ARRAY_GET | Op.HASH_GET:
+                    index = pop()
+                    stack[-1] = stack[-1][index]
+                case Op.ARRAY_SET:
+                    value = pop()
+                    index = pop()
+                    array = stack[-1]
+                    if type(array) == str:
+                        stack[-1] = array[:index] + value + array[index + 1:]
+                    else:
+                        array[index] = value
+                        ip += 1  # as in execute_instruction, the next instruction is skipped
+                case Op.HASH_SET:
+                    value = pop()
+                    key = pop()
+                    stack[-1][key] = value
+                case Op.PRINT:
+                    print(stack[-1], end="")
+                    stack[-1] = None
+                case Op.PRINTLN:
+                    print(stack[-1])
+                    stack[-1] = None
+                case Op.INPUT:
+                    stack[-1] = input(stack[-1])
+                case Op.TYPECAST:
+                    stack[-1] = self.perform_typecast(stack[-1], consts[arg])
+                case Op.HALT:
+                    ip = end
+                    continue
+                case Op.PUSH_SCOPE:
+                    self.push_frame(self.frame_layouts[self.frame_index], None)
+                case Op.POP_SCOPE:
+                    self.pop_frame()
+                case Op.INC_VAR | Op.STORE_CONST | Op.CMP_JUMP | Op.CMP_CONST_JUMP | Op.LOAD_INDEX2:
+                    ip = self.run_superinstruction(ops[ip], arg, ip)
+                    continue
+                case opcode:
+                    raise RuntimeError(f"Unknown instruction: {OPCODES[opcode].__name__}")
+            ip += 1
+        self.ip = ip
+        return stack[0] if stack else None
     
+    def run_superinstruction(self, opcode, arg, ip):
+        """
+        Execute the superinstruction (see bytecode_opt.fuse_superinstructions) at `ip` of
+        assembled bytecode, of operand `arg`; returns the index of the next instruction.
+        """
+        consts = self.bytecode.consts
+        frame = self.frames[self.frame_index]
+        match opcode:
+            case Op.INC_VAR:
+                name, slot, value = consts[arg]
+                frame[slot] = self.load(name, slot) + consts[value]
+            case Op.STORE_CONST:
+                slot, value = consts[arg]
+                frame[slot] = consts[value]
+            case Op.CMP_JUMP:
+                op, name, slot, other, other_slot, target = consts[arg]
+                if not COMPARE[op](self.load(name, slot), self.load(other, other_slot)):
+                    return target
+            case Op.CMP_CONST_JUMP:
+                op, name, slot, value, target = consts[arg]
+                if not COMPARE[op](self.load(name, slot), consts[value]):
+                    return target
+            case Op.LOAD_INDEX2:
+                name, slot, index, index_slot, index2, index2_slot = consts[arg]
+                self.push(self.load(name, slot)[self.load(index, index_slot)][self.load(index2, index2_slot)])
+        return ip + 1
+
     def perform_typecast(self, value, dtype):
         """Cast value to the specified type"""
         try:
@@ -141,6 +462,171 @@ class BytecodeVM:
         except (ValueError, TypeError) as err:
             raise ValueError(f"Typecasting error to type '{dtype}': {err}")
     
+    def property_access(self, operation):
+        """`obj.operation(args)` for any type of `obj`; the arguments are on the stack above it."""
+        if operation == "Length":
+            obj=self.pop()
+            if isinstance(obj, list) or isinstance(obj, str):
+                self.push(len(obj))
+            elif isinstance(obj, dict):
+                self.push(len(obj.keys()))
+            else:
+                raise TypeError(f"Operation 'Length' not supported for type {type(obj)}")
+        
+        elif operation == "PushBack":
+            value = self.pop()
+            obj = self.pop()  # Get the array from stack
+            if isinstance(obj, list):
+                obj.append(value)
+                self.push(obj)  # Return modified array
+            elif isinstance(obj, str):
+                self.push(obj + str(value))  # Return new string
+            else:
+                raise TypeError("PushBack requires an array")
+        elif operation == "PushFront":
+            value = self.pop()
+            obj = self.pop()  # Get the array from stack
+            if isinstance(obj, list):
+                obj.insert(0, value)
+                self.push(obj)  # Return modified array
+            elif isinstance(obj, str):
+                self.push(str(value) + obj)  # Return new string
+            else:
+                raise TypeError("PushFront requires an array")
+        elif operation == "PopBack":
+            obj = self.pop()  # Get the array from stack
+            if isinstance(obj, list):
+                if len(obj) == 0:
+                    raise IndexError("Cannot PopBack from empty array")
+                value = obj.pop()  # Pop last element
+                self.push(value)   # Push the POPPED VALUE
+                self.push(obj)  # Push the modified array back
+            elif isinstance(obj, str):
+                if len(obj) == 0:
+                    raise IndexError("Cannot PopBack from empty string")
+                last_char = obj[-1]
+                self.push(last_char)
+                self.push(obj[:-1])
+            else:
+                raise TypeError("PopBack requires an array")
+        elif operation == "PopFront":
+            obj = self.pop()  # Get the array from stack
+            if isinstance(obj, list):
+                if len(obj) == 0:
+                    raise IndexError("Cannot PopFront from empty array")
+                value = obj.pop(0)  # Pop first element
+                self.push(value)    # Push the POPPED VALUE
+                self.push(obj)  # Push the modified array back
+            elif isinstance(obj, str):
+                if len(obj) == 0:
+                    raise IndexError("Cannot PopBack from empty string")
+                first_char = obj[0]
+                self.push(first_char)
+                self.push(obj[1:])
+            else:
+                raise TypeError("PopFront requires an array")
+        elif operation == "Insert":
+            index = self.pop()
+            value = self.pop()
+            obj = self.pop()  # Get the array from stack
+            if isinstance(obj, list):
+                if index < 0:
+                    index = 0
+                elif index > len(obj):
+                    index = len(obj)
+                obj.insert(index, value)
+                self.push(obj)  # Return modified array
+            elif isinstance(obj, str):
+                if index < 0:
+                    index = 0
+                elif index > len(obj):
+                    index = len(obj)
+                self.push(obj[:index] + str(value) + obj[index:])
+            else:
+                raise TypeError("Insert requires an array")
+        elif operation == "Remove":
+            index = self.pop()
+            obj = self.pop()  # Get the array from stack
+            if isinstance(obj, list):
+                if 0 <= index < len(obj):
+                    obj.pop(index)
+                self.push(obj)  # Return modified array
+            elif isinstance(obj, str):
+                if 0 <= index < len(obj):
+                    self.push(obj[:index] + obj[index+1:])
+                else:
+                    self.push(obj)
+            else:
+                raise TypeError("Remove requires an array")
+        elif operation == "Clear":
+            obj = self.pop()  # Get the array from stack
+            if isinstance(obj, list):
+                obj.clear()
+                self.push(obj)  # Return modified array
+            elif isinstance(obj, str):
+                self.push("")
+            else:
+                raise TypeError("Clear requires an array")
+        elif operation == "Slice":
+            # assumed atleast three items on stack
+            start = self.pop()
+            end = self.pop()
+            n3 = self.pop()
+
+            if type(n3)==int:
+                step = n3
+                obj = self.pop()
+            else:
+                step = None
+                obj = n3
+            if isinstance(obj, list) or isinstance(obj, str):
+                # Handle optional step parameter if present
+                if step:
+                    self.push(obj[start:end:step])
+                else:
+                    self.push(obj[start:end])
+            else:
+                raise TypeError("Slice requires an array or string")
+
+        # Dictionary Operations
+        elif operation == "Keys":
+            obj = self.pop()  # Get the dictionary from stack
+            if isinstance(obj, dict):
+                self.push(list(obj.keys()))
+            else:
+                raise TypeError("Keys requires a dictionary")
+        elif operation == "Values":
+            obj = self.pop()  # Get the dictionary from stack
+            if isinstance(obj, dict):
+                self.push(list(obj.values()))
+            else:
+                raise TypeError("Values requires a dictionary")
+        elif operation == "Contains":
+            key = self.pop()
+            obj = self.pop()  # Get the dictionary from stack
+            if isinstance(obj, dict):
+                self.push(key in obj)
+            else:
+                raise TypeError("Contains requires a dictionary")
+        elif operation == "Add":
+            value = self.pop()
+            key = self.pop()
+            obj = self.pop()  # Get the dictionary from stack
+            if isinstance(obj, dict):
+                obj[key] = value
+                self.push(obj)  # Return modified dict
+            else:
+                raise TypeError("Add requires a dictionary")
+        elif operation == "Remove":
+            key = self.pop()
+            obj = self.pop()  # Get the dictionary from stack
+            if isinstance(obj, dict):
+                if key in obj:
+                    del obj[key]
+                self.push(obj)  # Return modified dict
+            else:
+                raise TypeError("Remove requires a dictionary")
+
     def execute_instruction(self, instruction):
         """Execute a single instruction"""
         match instruction:
@@ -194,6 +680,12 @@ class BytecodeVM:
                 self.push(left / right)
                 self.ip += 1
                 
+            case I.FLOORDIV():
+                right = self.pop()
+                left = self.pop()
+                self.push(left // right)
+                self.ip += 1
+                
             case I.MODULO():
                 right = self.pop()
                 left = self.pop()
@@ -338,21 +830,17 @@ class BytecodeVM:
                 if name in self.builtins:
                     self.push(self.builtins[name])
                 else:
-                    # Look for variable in all frames, starting from innermost
-                    for i in range(self.frame_index, -1, -1):
-                        if name in self.frames[i]:
-                            self.push(self.frames[i][name])
-                            break
-                    else:
+                    value = self.find(name, instruction.slot)
+                    if value is UNSET:
                         raise RuntimeError(f"Variable '{name}' not defined")
+                    self.push(value)
                 self.ip += 1
 
                 
             case I.STORE():
                 # Store top value in variable
-                name = instruction.name
                 value = self.pop()
-                self.current_frame()[name] = value
+                self.current_frame()[instruction.slot] = value
                 # If the variable is already in the current scope, update it
                 # if name in self.current_frame():
                 #     self.current_frame()[name] = value
@@ -397,33 +885,25 @@ class BytecodeVM:
                     self.ip += 1
                 else:
                    # Look for the function in all frames, starting from the current one
-                    target = None
-                    for frame_idx in range(self.frame_index, -1, -1):
-                        if name in self.frames[frame_idx]:
-                            target = self.frames[frame_idx][name]
-                            break
-                            
-                    if target is None:
+                    target = self.find(name, instruction.slot)
+                    if target is UNSET or target is None:
                         raise RuntimeError(f"Function '{name}' not defined")
                     
-                    # Create a new frame
-                    self.frames.append({})
-                    self.frame_index += 1
-                    
-                    # Save return address
-                    self.current_frame()['__return_addr__'] = self.ip + 1
+                    # Create a new frame laid out for the callee, saving the return address;
+                    # a function calling itself in tail position keeps its frame instead, so the
+                    # call returns where the current one would have. Values left in the frame
+                    # are the ones a new frame would find in the caller's anyway
+                    layout = self.bytecode.layouts[target]
+                    if type(instruction) is not I.TAIL_CALL or layout is not self.frame_layouts[self.frame_index]:
+                        self.push_frame(layout, self.ip + 1)
                     
                     # Jump to function
                     self.ip = target
 
                 
             case I.RETURN():
-                # Get return address
-                return_addr = self.current_frame().get('__return_addr__')
-                
                 # Restore previous frame
-                self.frames.pop()
-                self.frame_index -= 1
+                return_addr = self.pop_frame()
                 
                 # Jump to return address
                 self.ip = return_addr
@@ -431,7 +911,7 @@ class BytecodeVM:
             case I.PUSHFN():
                 # Store function entry point in current frame
                 name = instruction.name
-                self.current_frame()[name] = instruction.label.target
+                self.current_frame()[instruction.slot] = instruction.label.target
                 # print(f"Pushed function '{name}' at {self.ip}")
                 self.ip += 1
             # Collection operations
@@ -596,172 +1076,51 @@ class BytecodeVM:
                 
                 # self.ip += 1
 
-            case I.PROPERTY_ACCESS():
-                operation = instruction.operation
-
-                if operation == "Length":
-                    obj=self.pop()
-                    if isinstance(obj, list) or isinstance(obj, str):
-                        self.push(len(obj))
-                    elif isinstance(obj, dict):
-                        self.push(len(obj.keys()))
-                
-                elif operation == "PushBack":
-                    value = self.pop()
-                    obj = self.pop()  # Get the array from stack
-                    if isinstance(obj, list):
-                        obj.append(value)
-                        self.push(obj)  # Return modified array
-                    elif isinstance(obj, str):
-                        self.push(obj + str(value))  # Return new string
-                    else:
-                        raise TypeError("PushBack requires an array")
-                elif operation == "PushFront":
-                    value = self.pop()
-                    obj = self.pop()  # Get the array from stack
-                    if isinstance(obj, list):
-                        obj.insert(0, value)
-                        self.push(obj)  # Return modified array
-                    elif isinstance(obj, str):
-                        self.push(str(value) + obj)  # Return new string
-                    else:
-                        raise TypeError("PushFront requires an array")
-                elif operation == "PopBack":
-                    obj = self.pop()  # Get the array from stack
-                    if isinstance(obj, list):
-                        if len(obj) == 0:
-                            raise IndexError("Cannot PopBack from empty array")
-                        value = obj.pop()  # Pop last element
-                        self.push(value)   # Push the POPPED VALUE
-                        self.push(obj)  # Push the modified array back
-                    elif isinstance(obj, str):
-                        if len(obj) == 0:
-                            raise IndexError("Cannot PopBack from empty string")
-                        last_char = obj[-1]
-                        self.push(last_char)
-                        self.push(obj[:-1])
-                    else:
-                        raise TypeError("PopBack requires an array")
-                elif operation == "PopFront":
-                    obj = self.pop()  # Get the array from stack
-                    if isinstance(obj, list):
-                        if len(obj) == 0:
-                            raise IndexError("Cannot PopFront from empty array")
-                        value = obj.pop(0)  # Pop first element
-                        self.push(value)    # Push the POPPED VALUE
-                        self.push(obj)  # Push the modified array back
-                    elif isinstance(obj, str):
-                        if len(obj) == 0:
-                            raise IndexError("Cannot PopBack from empty string")
-                        first_char = obj[0]
-                        self.push(first_char)
-                        self.push(obj[1:])
-                    else:
-                        raise TypeError("PopFront requires an array")
-                elif operation == "Insert":
-                    index = self.pop()
-                    value = self.pop()
-                    obj = self.pop()  # Get the array from stack
-                    if isinstance(obj, list):
-                        if index < 0:
-                            index = 0
-                        elif index > len(obj):
-                            index = len(obj)
-                        obj.insert(index, value)
-                        self.push(obj)  # Return modified array
-                    elif isinstance(obj, str):
-                        if index < 0:
-                            index = 0
-                        elif index > len(obj):
-                            index = len(obj)
-                        self.push(obj[:index] + str(value) + obj[index:])
-                    else:
-                        raise TypeError("Insert requires an array")
-                elif operation == "Remove":
-                    index = self.pop()
-                    obj = self.pop()  # Get the array from stack
-                    if isinstance(obj, list):
-                        if 0 <= index < len(obj):
-                            obj.pop(index)
-                        self.push(obj)  # Return modified array
-                    elif isinstance(obj, str):
-                        if 0 <= index < len(obj):
-                            self.push(obj[:index] + obj[index+1:])
-                        else:
-                            self.push(obj)
-                    else:
-                        raise TypeError("Remove requires an array")
-                elif operation == "Clear":
-                    obj = self.pop()  # Get the array from stack
-                    if isinstance(obj, list):
-                        obj.clear()
-                        self.push(obj)  # Return modified array
-                    elif isinstance(obj, str):
-                        self.push("")
-                    else:
-                        raise TypeError("Clear requires an array")
-                elif operation == "Slice":
-                    # assumed atleast three items on stack
-                    start = self.pop()
-                    end = self.pop()
-                    n3 = self.pop()
-
-                    if type(n3)==int:
-                        step = n3
-                        obj = self.pop()
-                    else:
-                        step = None
-                        obj = n3
-                    if isinstance(obj, list) or isinstance(obj, str):
-                        # Handle optional step parameter if present
-                        if step:
-                            self.push(obj[start:end:step])
-                        else:
-                            self.push(obj[start:end])
-                    else:
-                        raise TypeError("Slice requires an array or string")
+            # PROPERTY_ACCESS on a receiver of known type: the generic operation unless it has that type
+            case I.ARRAY_LEN() | I.STR_LEN() | I.HASH_LEN():
+                if type(self.stack[-1]) in (list, str, dict):
+                    self.push(len(self.pop()))
+                else:
+                    self.property_access(instruction.operation)
+                self.ip += 1
 
-                # Dictionary Operations
-                elif operation == "Keys":
-                    obj = self.pop()  # Get the dictionary from stack
-                    if isinstance(obj, dict):
-                        self.push(list(obj.keys()))
-                    else:
-                        raise TypeError("Keys requires a dictionary")
-                elif operation == "Values":
-                    obj = self.pop()  # Get the dictionary from stack
-                    if isinstance(obj, dict):
-                        self.push(list(obj.values()))
-                    else:
-                        raise TypeError("Values requires a dictionary")
-                elif operation == "Contains":
-                    key = self.pop()
-                    obj = self.pop()  # Get the dictionary from stack
-                    if isinstance(obj, dict):
-                        self.push(key in obj)
-                    else:
-                        raise TypeError("Contains requires a dictionary")
-                elif operation == "Add":
+            case I.ARRAY_APPEND():
+                if type(self.stack[-2]) is list:
                     value = self.pop()
-                    key = self.pop()
-                    obj = self.pop()  # Get the dictionary from stack
-                    if isinstance(obj, dict):
-                        obj[key] = value
-                        self.push(obj)  # Return modified dict
-                    else:
-                        raise TypeError("Add requires a dictionary")
-                elif operation == "Remove":
-                    key = self.pop()
-                    obj = self.pop()  # Get the dictionary from stack
-                    if isinstance(obj, dict):
-                        if key in obj:
-                            del obj[key]
-                        self.push(obj)  # Return modified dict
-                    else:
-                        raise TypeError("Remove requires a dictionary")
+                    self.stack[-1].append(value)
+                else:
+                    self.property_access(instruction.operation)
+                self.ip += 1
+
+            case I.ARRAY_POP_BACK() | I.ARRAY_POP_FRONT():
+                obj = self.stack[-1]
+                if type(obj) is list and obj:
+                    self.stack[-1] = obj.pop() if type(instruction) is I.ARRAY_POP_BACK else obj.pop(0)
+                    self.push(obj)
+                else:
+                    self.property_access(instruction.operation)
+                self.ip += 1
+
+            case I.STR_SLICE():
+                argc = instruction.argc
+                if type(self.stack[-1 - argc]) is str:
+                    start, end, step = [self.pop() for _ in range(argc)] + [None] * (3 - argc)
+                    self.push(self.pop()[start:end:step])
+                else:
+                    self.property_access(instruction.operation)
+                self.ip += 1
 
+            case I.HASH_CONTAINS():
+                if type(self.stack[-2]) is dict:
+                    key = self.pop()
+                    self.push(key in self.pop())
+                else:
+                    self.property_access(instruction.operation)
                 self.ip += 1
 
+            case I.PROPERTY_ACCESS():
+                self.property_access(instruction.operation)
+                self.ip += 1
 
             case I.ARRAY_GET():
                 # Get element from array
@@ -831,13 +1190,36 @@ class BytecodeVM:
             # In the execute_instruction method of BytecodeVM
             case I.PUSH_SCOPE():
                 # Create a new frame for the scope
-                self.frames.append({})
-                self.frame_index += 1
+                self.push_frame(self.frame_layouts[self.frame_index], None)
                 self.ip += 1
             case I.POP_SCOPE():
                 # Remove the scope frame and restore parent scope
-                self.frames.pop()
-                self.frame_index -= 1
+                self.pop_frame()
+                self.ip += 1
+
+            # Superinstructions (see bytecode_opt.fuse_superinstructions)
+            case I.INC_VAR():
+                value = self.load(instruction.name, instruction.slot) + instruction.value
+                self.current_frame()[instruction.slot] = value
+                self.ip += 1
+            case I.STORE_CONST():
+                self.current_frame()[instruction.slot] = instruction.value
+                self.ip += 1
+            case I.CMP_JUMP() | I.CMP_CONST_JUMP():
+                left = self.load(instruction.name, instruction.slot)
+                if isinstance(instruction, I.CMP_JUMP):
+                    right = self.load(instruction.other, instruction.other_slot)
+                else:
+                    right = instruction.value
+                if not COMPARE[instruction.op](left, right):
+                    self.ip = instruction.label.target
+                else:
+                    self.ip += 1
+            case I.LOAD_INDEX2():
+                array = self.load(instruction.name, instruction.slot)
+                index = self.load(instruction.index, instruction.index_slot)
+                index2 = self.load(instruction.index2, instruction.index2_slot)
+                self.push(array[index][index2])
                 self.ip += 1
 
             case _:
@@ -845,15 +1227,366 @@ class BytecodeVM:
                 raise RuntimeError(f"Unknown instruction: {instruction.__class__.__name__}")
 
 
-def execute_bytecode(bytecode):
-    """Execute bytecode and return the final stack"""
-    vm = BytecodeVM(bytecode)
+# how the handlers take an operand off the stack: `stack[-2]`, `pop()`, ...
+_STACK_ACCESS = re.compile(r"(self\.)?stack\[[^\[\]]*\]|((self\.)?stack\.)?pop\(\)")
+
+
+def _stack_underflow(error):
+    """
+    Whether the IndexError `error` was raised taking an operand off the empty stack in a
+    handler here, rather than by indexing an array or string of the program.
+    """
+    frame = traceback.extract_tb(error.__traceback__)[-1]
+    if frame.filename != __file__ or frame.colno is None:
+        return False
+    expression = linecache.getline(frame.filename, frame.lineno)[frame.colno:frame.end_colno]
+    return _STACK_ACCESS.fullmatch(expression) is not None
+
+
+
+def thread_code(vm):
+    """
+    The handler of each instruction of `vm.bytecode` (a FlatCode), for `BytecodeVM.run_threaded`.
+
+    A handler runs its instruction and returns the index of the next one. Its opcode is
+    dispatched on and its operand decoded (constant fetched, built-in looked up) once, here,
+    rather than each time it runs; the VM's stack and frames are bound in as locals. The
+    semantics are those of `BytecodeVM.run_flat`.
+    """
+    code = vm.bytecode
+    consts, layouts = code.consts, code.layouts
+    stack, frames, frame_layouts, builtins = vm.stack, vm.frames, vm.frame_layouts, vm.builtins
+    push, pop = stack.append, stack.pop
+    end = len(code.ops)
+
+    def binary(fn):
+        def binary(ip):
+            right = pop()
+            stack[-1] = fn(stack[-1], right)
+            return ip + 1
+        return binary
+
+    def unary(fn):
+        def unary(ip):
+            stack[-1] = fn(stack[-1])
+            return ip + 1
+        return unary
+
+    def generic(operation):
+        # PROPERTY_ACCESS, and the specialized instructions on a receiver of another type
+        def generic(ip):
+            vm.property_access(operation)
+            return ip + 1
+        return generic
+
+    def handler(opcode, arg):
+        match opcode:
+            case Op.PUSH:
+                value = consts[arg]
+                def push_const(ip):
+                    push(value)
+                    return ip + 1
+                return push_const
+            case Op.LOAD:
+                name, slot = consts[arg]
+                if name in builtins:
+                    builtin = builtins[name]
+                    def load_builtin(ip):
+                        push(builtin)
+                        return ip + 1
+                    return load_builtin
+                def load(ip):
+                    value = frames[-1][slot]
+                    if value is UNSET:
+                        value = vm.find(name, slot)
+                        if value is UNSET:
+                            raise RuntimeError(f"Variable '{name}' not defined")
+                    push(value)
+                    return ip + 1
+                return load
+            case Op.STORE:
+                def store(ip):
+                    frames[-1][arg] = pop()
+                    return ip + 1
+                return store
+            case Op.JMP:
+                return lambda ip: arg
+            case Op.JMP_IF_FALSE:
+                return lambda ip: ip + 1 if pop() else arg
+            case Op.JMP_IF_TRUE:
+                return lambda ip: arg if pop() else ip + 1
+            case Op.ADD: return binary(operator.add)
+            case Op.SUB: return binary(operator.sub)
+            case Op.MUL: return binary(operator.mul)
+            case Op.DIV: return binary(operator.truediv)
+            case Op.FLOORDIV: return binary(operator.floordiv)
+            case Op.MODULO: return binary(operator.mod)
+            case Op.POW: return binary(operator.pow)
+            case Op.EQ: return binary(operator.eq)
+            case Op.NE: return binary(operator.ne)
+            case Op.LT: return binary(operator.lt)
+            case Op.GT: return binary(operator.gt)
+            case Op.LE: return binary(operator.le)
+            case Op.GE: return binary(operator.ge)
+            case Op.AND: return binary(lambda left, right: left and right)
+            case Op.OR: return binary(lambda left, right: left or right)
+            case Op.BITAND: return binary(operator.and_)
+            case Op.BITOR: return binary(operator.or_)
+            case Op.BITXOR: return binary(operator.xor)
+            case Op.LSHIFT: return binary(operator.lshift)
+            case Op.RSHIFT: return binary(operator.rshift)
+            case Op.UPLUS: return unary(operator.pos)
+            case Op.UMINUS: return unary(operator.neg)
+            case Op.NOT: return unary(operator.not_)
+            case Op.BITNOT: return unary(operator.invert)
+            case Op.POP:
+                def pop_value(ip):
+                    pop()
+                    return ip + 1
+                return pop_value
+            case Op.DUP:
+                def dup(ip):
+                    push(stack[-1])
+                    return ip + 1
+                return dup
+            case Op.CALL | Op.TAIL_CALL:
+                name, slot = consts[arg]
+                if name in builtins:
+                    fn, num_args = builtins[name]
+                    def call_builtin(ip):
+                        call_args = stack[len(stack) - num_args:] if num_args else []
+                        del stack[len(stack) - num_args:]
+                        result = fn(*call_args)
+                        if result is not None:  # Don't push None results
+                            if isinstance(result, tuple) and len(result) == 2:
+                                push(result[0])
+                                push(result[1])
+                            else:
+                                push(result)
+                        return ip + 1
+                    return call_builtin
+                tail = opcode == Op.TAIL_CALL
+                def call(ip):
+                    target = vm.find(name, slot)
+                    if target is UNSET or target is None:
+                        raise RuntimeError(f"Function '{name}' not defined")
+                    layout = layouts[target]
+                    if not tail or layout is not frame_layouts[-1]:
+                        vm.push_frame(layout, ip + 1)
+                    return target
+                return call
+            case Op.RETURN:
+                return lambda ip: vm.pop_frame()
+            case Op.PUSHFN:
+                slot, entry = consts[arg]
+                def pushfn(ip):
+                    frames[-1][slot] = entry
+                    return ip + 1
+                return pushfn
+            case Op.MAKE_ARRAY:
+                def make_array(ip):
+                    elements = stack[len(stack) - arg:] if arg else []
+                    del stack[len(stack) - arg:]
+                    push(elements)
+                    return ip + 1
+                return make_array
+            case Op.MAKE_HASH:
+                def make_hash(ip):
+                    items = stack[len(stack) - 2 * arg:] if arg else []
+                    del stack[len(stack) - 2 * arg:]
+                    push({items[i]: items[i + 1] for i in range(0, len(items), 2)})
+                    return ip + 1
+                return make_hash
+            case Op.ARRAY_LEN | Op.STR_LEN | Op.HASH_LEN:
+                fallback = generic("Length")
+                def length(ip):
+                    if type(stack[-1]) not in (list, str, dict):
+                        return fallback(ip)
+                    stack[-1] = len(stack[-1])
+                    return ip + 1
+                return length
+            case Op.ARRAY_APPEND:
+                fallback = generic("PushBack")
+                def array_append(ip):
+                    if type(stack[-2]) is not list:
+                        return fallback(ip)
+                    value = pop()
+                    stack[-1].append(value)
+                    return ip + 1
+                return array_append
+            case Op.ARRAY_POP_BACK | Op.ARRAY_POP_FRONT:
+                fallback = generic(OPCODES[opcode].operation)
+                index = -1 if opcode == Op.ARRAY_POP_BACK else 0
+                def array_pop(ip):
+                    obj = stack[-1]
+                    if type(obj) is not list or not obj:
+                        return fallback(ip)
+                    stack[-1] = obj.pop(index)
+                    push(obj)
+                    return ip + 1
+                return array_pop
+            case Op.STR_SLICE:
+                fallback = generic("Slice")
+                def str_slice(ip):
+                    if type(stack[-1 - arg]) is not str:
+                        return fallback(ip)
+                    start, end_, step = [pop() for _ in range(arg)] + [None] * (3 - arg)
+                    stack[-1] = stack[-1][start:end_:step]
+                    return ip + 1
+                return str_slice
+            case Op.HASH_CONTAINS:
+                fallback = generic("Contains")
+                def hash_contains(ip):
+                    if type(stack[-2]) is not dict:
+                        return fallback(ip)
+                    key = pop()
+                    stack[-1] = key in stack[-1]
+                    return ip + 1
+                return hash_contains
+            case Op.PROPERTY_ACCESS:
+                return generic(consts[arg])
+            case Op.ARRAY_GET | Op.HASH_GET:
+                return binary(operator.getitem)
+            case Op.ARRAY_SET:
+                def array_set(ip):
+                    value = pop()
+                    index = pop()
+                    array = stack[-1]
+                    if type(array) == str:
+                        stack[-1] = array[:index] + value + array[index + 1:]
+                        return ip + 1
+                    array[index] = value
+                    return ip + 2  # as in execute_instruction, the next instruction is skipped
+                return array_set
+            case Op.HASH_SET:
+                def hash_set(ip):
+                    value = pop()
+                    key = pop()
+                    stack[-1][key] = value
+                    return ip + 1
+                return hash_set
+            case Op.PRINT:
+                def print_value(ip):
+                    print(stack[-1], end="")
+                    stack[-1] = None
+                    return ip + 1
+                return print_value
+            case Op.PRINTLN:
+                def print_line(ip):
+                    print(stack[-1])
+                    stack[-1] = None
+                    return ip + 1
+                return print_line
+            case Op.INPUT:
+                return unary(input)
+            case Op.TYPECAST:
+                dtype = consts[arg]
+                return unary(lambda value: vm.perform_typecast(value, dtype))
+            case Op.HALT:
+                return lambda ip: end
+            case Op.PUSH_SCOPE:
+                def push_scope(ip):
+                    vm.push_frame(frame_layouts[-1], None)
+                    return ip + 1
+                return push_scope
+            case Op.POP_SCOPE:
+                def pop_scope(ip):
+                    vm.pop_frame()
+                    return ip + 1
+                return pop_scope
+        # superinstructions: variables are read from the current frame directly, falling back
+        # to `vm.load` for one it has not stored; one reading the name of a built-in (which
+        # LOAD resolves before any variable) runs through `vm.run_superinstruction` instead
+        operands = consts[arg] if opcode in SUPERINSTRUCTIONS else ()
+        if any(name in builtins for name in operands if type(name) is str):
+            return lambda ip: vm.run_superinstruction(opcode, arg, ip)
+        match opcode:
+            case Op.INC_VAR:
+                name, slot, value = operands
+                value = consts[value]
+                def inc_var(ip):
+                    frame = frames[-1]
+                    current = frame[slot]
+                    if current is UNSET:
+                        current = vm.load(name, slot)
+                    frame[slot] = current + value
+                    return ip + 1
+                return inc_var
+            case Op.STORE_CONST:
+                slot, value = operands
+                value = consts[value]
+                def store_const(ip):
+                    frames[-1][slot] = value
+                    return ip + 1
+                return store_const
+            case Op.CMP_JUMP:
+                op, name, slot, other, other_slot, target = operands
+                compare = COMPARE[op]
+                def cmp_jump(ip):
+                    frame = frames[-1]
+                    left, right = frame[slot], frame[other_slot]
+                    if left is UNSET:
+                        left = vm.load(name, slot)
+                    if right is UNSET:
+                        right = vm.load(other, other_slot)
+                    return ip + 1 if compare(left, right) else target
+                return cmp_jump
+            case Op.CMP_CONST_JUMP:
+                op, name, slot, value, target = operands
+                compare, value = COMPARE[op], consts[value]
+                def cmp_const_jump(ip):
+                    left = frames[-1][slot]
+                    if left is UNSET:
+                        left = vm.load(name, slot)
+                    return ip + 1 if compare(left, value) else target
+                return cmp_const_jump
+            case Op.LOAD_INDEX2:
+                name, slot, index, index_slot, index2, index2_slot = operands
+                def load_index2(ip):
+                    frame = frames[-1]
+                    array, i, j = frame[slot], frame[index_slot], frame[index2_slot]
+                    if array is UNSET:
+                        array = vm.load(name, slot)
+                    if i is UNSET:
+                        i = vm.load(index, index_slot)
+                    if j is UNSET:
+                        j = vm.load(index2, index2_slot)
+                    push(array[i][j])
+                    return ip + 1
+                return load_index2
+        def unknown(ip):
+            raise RuntimeError(f"Unknown instruction: {OPCODES[opcode].__name__}")
+        return unknown
+
+    return [handler(opcode, arg) for opcode, arg in zip(code.ops, code.args)]
+
+
+def execute_bytecode(bytecode, flat=True, threaded=True):
+    """
+    Execute bytecode and return the final stack; `flat` runs it assembled (see bytecode_asm),
+    as threaded code unless `threaded` is False.
+    """
+    vm = BytecodeVM(assemble(bytecode) if flat else bytecode, threaded)
     result = vm.run()
     return result
 
-def run_program(program,display_bytecode=False):
-    """Compile and execute a program."""
-    bytecode, symbols = compile_program(program)
+def run_program(program,display_bytecode=False, source_path=None, cache_dir=None, engine="stack", optimize=True):
+    """
+    Compile and execute a program. Pass `source_path`/`cache_dir` to reuse a cached `.nxc` compile.
+    `engine="registers"` runs it on the register VM (see register_vm) instead of the stack VM;
+    `optimize=False` compiles it without the optimizer's passes.
+    """
+    if engine == "registers":
+        from register_vm import compile_registers, RegisterVM  # imports this module
+        code, symbols = load_or_compile("registers", program, lambda: compile_registers(program, optimize),
+                                        source_path, cache_dir, optimize)
+        if display_bytecode:
+            code.print_bytecode()
+        return RegisterVM(code).run()
+    if engine != "stack":
+        raise ValueError(f"Unknown engine: {engine}")
+    bytecode, symbols = load_or_compile("bytecode", program, lambda: compile_program(program, optimize),
+                                       source_path, cache_dir, optimize)
     if display_bytecode:
         bytecode.print_bytecode()
     return execute_bytecode(bytecode)
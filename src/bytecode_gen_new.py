@@ -1,4 +1,6 @@
 from parser import *
+from optimizer import optimize
+import optimizer
 from dataclasses import dataclass
 
 class Label:
@@ -31,6 +33,9 @@ class I:
     class DIV:
         pass
     
+    class FLOORDIV:
+        pass
+    
     class MODULO:
         pass
     
@@ -110,26 +115,35 @@ class I:
     class POP_SCOPE:
         pass
     # Variable operations
+    # `slot` is the name's index in the frame of the enclosing function (set by ByteCode.emit)
     class LOAD:
-        def __init__(self, name):
+        def __init__(self, name, slot=None):
             self.name = name
+            self.slot = slot
     
     class STORE:
-        def __init__(self, name):
+        def __init__(self, name, slot=None):
             self.name = name
+            self.slot = slot
     
     # Function operations
     class CALL:
-        def __init__(self, name):
+        def __init__(self, name, slot=None):
             self.name = name
+            self.slot = slot
     
+    class TAIL_CALL(CALL):
+        # a call in tail position (FuncCall.tail): a function calling itself reuses its frame
+        pass
+
     class RETURN:
         pass
     
     class PUSHFN:
-        def __init__(self, label, name):
+        def __init__(self, label, name, slot=None):
             self.label = label
             self.name = name
+            self.slot = slot
     
     # String
     class STRING_INDEX_ASSIGN:
@@ -160,6 +174,34 @@ class I:
         def __init__(self, operation):
             self.operation = operation
 
+    # PROPERTY_ACCESS on a receiver whose type the parser knew (see parser.property_access);
+    # a receiver of another type at run time gets the generic `operation` instead
+    class ARRAY_LEN:
+        operation = "Length"
+
+    class ARRAY_APPEND:
+        operation = "PushBack"
+
+    class ARRAY_POP_BACK:
+        operation = "PopBack"
+
+    class ARRAY_POP_FRONT:
+        operation = "PopFront"
+
+    class STR_LEN:
+        operation = "Length"
+
+    class STR_SLICE:
+        operation = "Slice"
+        def __init__(self, argc):
+            self.argc = argc
+
+    class HASH_LEN:
+        operation = "Length"
+
+    class HASH_CONTAINS:
+        operation = "Contains"
+
     # I/O operations
     class PRINT:
         pass
@@ -178,17 +220,76 @@ class I:
     class HALT:
         pass
 
+    # Superinstructions: a common sequence of the instructions above as one instruction, made
+    # by bytecode_opt.fuse_superinstructions
+    class INC_VAR:
+        # LOAD name; PUSH value; ADD; STORE name
+        def __init__(self, name, slot, value):
+            self.name = name
+            self.slot = slot
+            self.value = value
+
+    class STORE_CONST:
+        # PUSH value; STORE name
+        def __init__(self, name, slot, value):
+            self.name = name
+            self.slot = slot
+            self.value = value
+
+    class CMP_JUMP:
+        # LOAD name; LOAD other; <op>; JMP_IF_FALSE label, `op` one of EQ, NE, LT, GT, LE, GE
+        def __init__(self, op, label, name, slot, other, other_slot):
+            self.op = op
+            self.label = label
+            self.name = name
+            self.slot = slot
+            self.other = other
+            self.other_slot = other_slot
+
+    class CMP_CONST_JUMP:
+        # LOAD name; PUSH value; <op>; JMP_IF_FALSE label
+        def __init__(self, op, label, name, slot, value):
+            self.op = op
+            self.label = label
+            self.name = name
+            self.slot = slot
+            self.value = value
+
+    class LOAD_INDEX2:
+        # LOAD name; LOAD index; ARRAY_GET; LOAD index2; ARRAY_GET: name[index][index2]
+        def __init__(self, name, slot, index, index_slot, index2, index2_slot):
+            self.name = name
+            self.slot = slot
+            self.index = index
+            self.index_slot = index_slot
+            self.index2 = index2
+            self.index2_slot = index2_slot
+
 class ByteCode:
     def __init__(self):
         self.insns = []
+        # frame layout ({name: slot}) of each function, keyed by its entry point; 0 is the main program
+        self.layouts = {0: {}}
+        self._functions = [self.layouts[0]]  # layouts of the functions being generated, innermost last
     
     def label(self):
         return Label()
     
     def emit(self, instruction):
+        if isinstance(instruction, (I.LOAD, I.STORE, I.CALL, I.PUSHFN)):
+            layout = self._functions[-1]
+            instruction.slot = layout.setdefault(instruction.name, len(layout))
         self.insns.append(instruction)
         return instruction
     
+    def begin_function(self, entry_label):
+        """Give the function starting at `entry_label` (already emitted) its own frame layout."""
+        self.layouts[entry_label.target] = {}
+        self._functions.append(self.layouts[entry_label.target])
+    
+    def end_function(self):
+        self._functions.pop()
+    
     def emit_label(self, label):
         label.target = len(self.insns)
     
@@ -203,26 +304,43 @@ class ByteCode:
                 case I.JMP_IF_FALSE():
                     print(f"{i:=4} {'JMP_IF_FALSE':<15} target = {insn.label.target}")
                 case I.LOAD():
-                    print(f"{i:=4} {'LOAD':<15} name = {insn.name}")
+                    print(f"{i:=4} {'LOAD':<15} name = {insn.name}, slot = {insn.slot}")
                 case I.STORE():
-                    print(f"{i:=4} {'STORE':<15} name = {insn.name}")
+                    print(f"{i:=4} {'STORE':<15} name = {insn.name}, slot = {insn.slot}")
+                case I.TAIL_CALL():
+                    print(f"{i:=4} {'TAIL_CALL':<15} name = {insn.name}, slot = {insn.slot}")
                 case I.CALL():
-                    print(f"{i:=4} {'CALL':<15} name = {insn.name}")
+                    print(f"{i:=4} {'CALL':<15} name = {insn.name}, slot = {insn.slot}")
                 case I.PUSH():
                     print(f"{i:=4} {'PUSH':<15} value = {insn.value}")
                 case I.PUSHFN():
                     print(f"{i:=4} {'PUSHFN':<15} target = {insn.label.target}, name = {insn.name}")
                 case I.PROPERTY_ACCESS():
                     print(f"{i:=4} {'PROPERTY_ACCESS':<15} operation = {insn.operation}")
+                case I.STR_SLICE():
+                    print(f"{i:=4} {'STR_SLICE':<15} args = {insn.argc}")
                 case I.MAKE_ARRAY():
                     print(f"{i:=4} {'MAKE_ARRAY':<15} size = {insn.size}")
                 case I.MAKE_HASH():
                     print(f"{i:=4} {'MAKE_HASH':<15} size = {insn.size}")
                 case I.TYPECAST():
                     print(f"{i:=4} {'TYPECAST':<15} type = {insn.dtype}")
+                case I.INC_VAR() | I.STORE_CONST():
+                    print(f"{i:=4} {type(insn).__name__:<15} name = {insn.name}, slot = {insn.slot}, value = {insn.value}")
+                case I.CMP_JUMP():
+                    print(f"{i:=4} {'CMP_JUMP':<15} {insn.name} {insn.op} {insn.other}, target = {insn.label.target}")
+                case I.CMP_CONST_JUMP():
+                    print(f"{i:=4} {'CMP_CONST_JUMP':<15} {insn.name} {insn.op} {insn.value!r}, target = {insn.label.target}")
+                case I.LOAD_INDEX2():
+                    print(f"{i:=4} {'LOAD_INDEX2':<15} {insn.name}[{insn.index}][{insn.index2}]")
                 case _:
                     print(f"{i:=4} {insn.__class__.__name__:<15}")
 
+# dedicated instruction of each specialized PropertyAccess node (StrSlice also records its argument count)
+SPECIALIZED_INSNS = {ArrayLen: I.ARRAY_LEN, ArrayAppend: I.ARRAY_APPEND, ArrayPopBack: I.ARRAY_POP_BACK,
+                     ArrayPopFront: I.ARRAY_POP_FRONT, StrLen: I.STR_LEN, HashLen: I.HASH_LEN,
+                     HashContains: I.HASH_CONTAINS}
+
 def codegen(ast_node):
     code = ByteCode()
     generate_bytecode(ast_node, code)
@@ -232,11 +350,8 @@ def codegen(ast_node):
 def generate_bytecode(node, code):
     match node:
         # Basic values
-        case Number(n):
-            if '.' in n:
-                code.emit(I.PUSH(float(n)))
-            else:
-                code.emit(I.PUSH(int(n)))
+        case Number():
+            code.emit(I.PUSH(node.value))
 
         case String(s):
             code.emit(I.PUSH(s))
@@ -257,6 +372,7 @@ def generate_bytecode(node, code):
                 case "-": code.emit(I.SUB())
                 case "*": code.emit(I.MUL())
                 case "/" | "÷": code.emit(I.DIV())
+                case "//": code.emit(I.FLOORDIV())
                 case "**": code.emit(I.POW())
                 case "%": code.emit(I.MODULO())
                 case "<": code.emit(I.LT())
@@ -289,7 +405,7 @@ def generate_bytecode(node, code):
         # Variable binding and assignment
         case VarBind(name, dtype, value, _):
             generate_bytecode(value, code)
-            if dtype:
+            if dtype and node.cast:  # no cast when the value is known to have the type already
                 code.emit(I.TYPECAST(dtype))
             code.emit(I.STORE(name))
         
@@ -328,7 +444,12 @@ def generate_bytecode(node, code):
                 generate_bytecode(arg, code)
             
             # Emit property access instruction with operation name
-            code.emit(I.PROPERTY_ACCESS(operation))
+            if isinstance(node, StrSlice):
+                code.emit(I.STR_SLICE(len(args)))
+            elif type(node) in SPECIALIZED_INSNS:
+                code.emit(SPECIALIZED_INSNS[type(node)]())
+            else:
+                code.emit(I.PROPERTY_ACCESS(operation))
             
             # Store back only for operations that modify the original object in-place
             # Arrays: PushBack, PushFront, Clear, Insert, Remove
@@ -668,6 +789,7 @@ def generate_bytecode(node, code):
             
             code.emit(I.JMP(func_end_label))
             code.emit_label(func_start_label)
+            code.begin_function(func_start_label)
             
             # Store parameters in reverse order
             for param in reversed(params):
@@ -675,6 +797,7 @@ def generate_bytecode(node, code):
                 
             generate_bytecode(body, code)
             code.emit(I.RETURN())
+            code.end_function()
             
             code.emit_label(func_end_label)
             code.emit(I.PUSHFN(func_start_label, func_name))
@@ -683,7 +806,7 @@ def generate_bytecode(node, code):
         case FuncCall(func_name, args):
             for arg in args:
                 generate_bytecode(arg, code)
-            code.emit(I.CALL(func_name))
+            code.emit(I.TAIL_CALL(func_name) if node.tail else I.CALL(func_name))
         
         # I/O operations
         case Display(val):
@@ -811,12 +934,18 @@ def generate_bytecode(node, code):
             
             code.emit(I.CALL("obj_slice"))  # Generic slice operation for both strings and arrays
 
-def compile_program(source_code):
+def compile_program(source_code, optimize=True):
+    # imported here: they need the instruction classes above
+    from bytecode_opt import eliminate_dead_code, peephole, fuse_superinstructions
+
     # Parse the program
     ast, symbol_table = parse(source_code, SymbolTable())
-    
+    if not optimize:  # as parsed, and no bytecode passes either
+        return codegen(ast), symbol_table
+    ast, symbol_table = optimizer.optimize(ast, symbol_table)
+
     # Generate bytecode
-    bytecode = codegen(ast)
+    bytecode = fuse_superinstructions(peephole(eliminate_dead_code(codegen(ast))))
     
     return bytecode, symbol_table
 
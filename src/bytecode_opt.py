@@ -0,0 +1,363 @@
+"""
+Passes over generated bytecode: dead-code elimination, peephole optimization, then
+superinstruction fusion.
+
+`eliminate_dead_code` runs on a finished `ByteCode` (see `codegen`) and rewrites it in place:
+
+- constant branches: `PUSH c; JMP_IF_FALSE/JMP_IF_TRUE` becomes a `JMP` or disappears;
+- unused functions: the body, the `JMP` around it and the `PUSHFN` of a function whose name
+  is never loaded or called are removed;
+- dead stores: a `STORE` to a name that is never loaded becomes a `POP` (or vanishes
+  together with the `PUSH` feeding it);
+- unreachable code: instructions no path from the program start or a function entry reaches;
+- function bodies are moved after the final `HALT`, so no `JMP` around them is needed.
+
+Variables are looked up by name across frames at run time, so "never loaded" means no `LOAD`
+or `CALL` of that name anywhere in the program. The count of removed instructions per kind
+is kept in `ByteCode.eliminated`.
+
+`peephole` then cleans up what the generator and dead-code elimination leave, rule by rule
+until none applies:
+
+- jump threading: a jump to a `JMP` goes straight to where that one leads; a `JMP` to a
+  `RETURN` or `HALT` becomes a copy of it;
+- jumps to next: a `JMP` to the instruction after it is removed, a conditional one becomes a
+  `POP` of its condition;
+- push/pop pairs: `PUSH c; POP` and `DUP; POP` are removed;
+- store/load pairs: `STORE x; LOAD x` becomes `DUP; STORE x`, unless either instruction is
+  part of a sequence `fuse_superinstructions` fuses;
+- unreachable: an instruction after a `JMP`, `RETURN` or `HALT` that no jump leads to.
+
+The number of instructions each rule removed, and of rewrites by the others, is kept in
+`ByteCode.peephole`.
+
+`fuse_superinstructions` then replaces the most common short sequences by one instruction
+each (the superinstructions of `I`), so the VM dispatches once where it dispatched up to five
+times, and keeps the operands off its stack. Only the fusions in `FUSIONS` are made; see
+benchmarks/opcode_report.py for the frequencies that chose them.
+"""
+from bisect import bisect_left
+from bytecode_gen_new import I, Label
+
+# superinstructions made by default: those saving over 1% of the instructions dispatched on the
+# Project Euler programs, CMP_JUMP 14.7% and INC_VAR 12.6%; CMP_CONST_JUMP saves 0.4%,
+# STORE_CONST 0.1% and LOAD_INDEX2 next to nothing (see benchmarks/opcode_report.py)
+FUSIONS = ("INC_VAR", "CMP_JUMP")
+
+COMPARISONS = (I.EQ, I.NE, I.LT, I.GT, I.LE, I.GE)
+
+
+def eliminate_dead_code(code):
+    insns = code.insns
+    eliminated = {"constant branches": 0, "unused functions": 0, "dead stores": 0, "unreachable": 0,
+                  "function jumps": 0}
+    removed = [False] * len(insns)
+    targets = _jump_targets(insns)
+
+    # constant branches
+    for i in range(len(insns) - 1):
+        insn, jump = insns[i], insns[i + 1]
+        if isinstance(insn, I.PUSH) and isinstance(jump, (I.JMP_IF_FALSE, I.JMP_IF_TRUE)) and i + 1 not in targets:
+            if bool(insn.value) == isinstance(jump, I.JMP_IF_TRUE):
+                insns[i] = I.JMP(jump.label)
+                removed[i + 1] = True
+            else:
+                removed[i] = removed[i + 1] = True
+            eliminated["constant branches"] += 1
+
+    # unused functions (until none is left: a dead function may be the only user of another)
+    functions = _functions(insns)
+    changed = True
+    while changed:
+        changed = False
+        used = _used_names(insns, removed)
+        for jmp_index, entry, pushfn_index in functions:
+            if not removed[pushfn_index] and insns[pushfn_index].name not in used:
+                for i in range(jmp_index, pushfn_index + 1):
+                    if not removed[i]:
+                        removed[i] = True
+                        eliminated["unused functions"] += 1
+                changed = True
+
+    # dead stores
+    used = _used_names(insns, removed)
+    for i, insn in enumerate(insns):
+        if removed[i] or not isinstance(insn, I.STORE) or insn.name in used:
+            continue
+        if i > 0 and isinstance(insns[i - 1], I.PUSH) and not removed[i - 1] and i not in targets:
+            removed[i - 1] = removed[i] = True
+            eliminated["dead stores"] += 2
+        else:
+            insns[i] = I.POP()
+            eliminated["dead stores"] += 1
+
+    # unreachable code
+    roots = [0, len(insns) - 1]  # the program start, and the final HALT
+    roots += [entry for _, entry, pushfn_index in functions if not removed[pushfn_index]]
+    reachable = _reachable(insns, removed, roots)
+    for i in range(len(insns)):
+        if not removed[i] and not reachable[i]:
+            removed[i] = True
+            eliminated["unreachable"] += 1
+
+    _compact(code, [i for i in range(len(insns)) if not removed[i]])
+    eliminated["function jumps"] = _hoist_functions(code)
+    code.eliminated = eliminated
+    return code
+
+
+def _jump_targets(insns):
+    return {insn.label.target for insn in insns if isinstance(insn, (I.JMP, I.JMP_IF_TRUE, I.JMP_IF_FALSE))}
+
+
+def _functions(insns):
+    """(index of the JMP around it, entry, index of its PUSHFN) for every function, as emitted by codegen."""
+    functions = []
+    for i, insn in enumerate(insns):
+        if isinstance(insn, I.PUSHFN):
+            entry = insn.label.target
+            jmp = insns[entry - 1]
+            if isinstance(jmp, I.JMP) and jmp.label.target == i:
+                functions.append((entry - 1, entry, i))
+    return functions
+
+
+def _used_names(insns, removed):
+    return {insn.name for i, insn in enumerate(insns) if not removed[i] and isinstance(insn, (I.LOAD, I.CALL))}
+
+
+def _reachable(insns, removed, roots):
+    reachable = [False] * len(insns)
+    pending = list(roots)
+    while pending:
+        i = pending.pop()
+        if i >= len(insns) or reachable[i]:
+            continue
+        reachable[i] = True
+        if removed[i]:  # already dropped: execution falls through it
+            pending.append(i + 1)
+            continue
+        insn = insns[i]
+        if isinstance(insn, (I.JMP, I.JMP_IF_TRUE, I.JMP_IF_FALSE)):
+            pending.append(insn.label.target)
+        if not isinstance(insn, (I.JMP, I.RETURN, I.HALT)):
+            pending.append(i + 1)
+    return reachable
+
+
+def _compact(code, order, moved=()):
+    """
+    Keep the instructions at the old indices `order`, in that order, and retarget every label
+    and frame layout. A label on a dropped instruction moves to the next kept one (in `moved`,
+    {dropped index: index it moves to}, or else the next one in the old order).
+    """
+    new_index = {old: new for new, old in enumerate(order)}
+    kept = sorted(order)
+
+    def retarget(old):
+        old = moved.get(old, old) if moved else old
+        if old in new_index:
+            return new_index[old]
+        following = bisect_left(kept, old)
+        return new_index[kept[following]] if following < len(kept) else len(order)
+
+    insns = [code.insns[old] for old in order]
+    labels = {id(insn.label): insn.label for insn in insns if hasattr(insn, "label")}
+    entries = {insn.label.target: id(insn.label) for insn in insns if isinstance(insn, I.PUSHFN)}
+    new_targets = {key: retarget(label.target) for key, label in labels.items()}
+    for key, label in labels.items():
+        label.target = new_targets[key]
+    code.layouts = {0: code.layouts[0], **{labels[key].target: code.layouts[old]
+                                           for old, key in entries.items() if old in code.layouts}}
+    code.insns = insns
+
+
+def _hoist_functions(code):
+    """Move every function body after the main program's HALT and drop the JMP around it;
+    returns the number of JMPs dropped."""
+    functions = _functions(code.insns)
+    if not functions:
+        return 0
+    owner = [None] * len(code.insns)  # innermost function containing each instruction
+    for function in sorted(functions, key=lambda f: f[2] - f[1], reverse=True):
+        _, entry, pushfn_index = function
+        for i in range(entry, pushfn_index):
+            owner[i] = function
+    jumps = {jmp_index: pushfn_index for jmp_index, _, pushfn_index in functions}
+    order = [i for i in range(len(code.insns)) if owner[i] is None and i not in jumps]
+    for function in functions:
+        order += [i for i in range(function[1], function[2]) if owner[i] is function and i not in jumps]
+    _compact(code, order, moved=jumps)
+    return len(jumps)
+
+
+def peephole(code):
+    """Apply the peephole rules to the `ByteCode` `code` in place until none applies."""
+    removed = {"jumps to next": 0, "push/pop pairs": 0, "unreachable": 0}
+    rewritten = {"jump threading": 0, "jumps to exits": 0, "conditional jumps to next": 0, "store/load pairs": 0}
+    changed = True
+    while changed:
+        changed = _thread_jumps(code.insns, rewritten)
+        changed = _peephole_pass(code, removed, rewritten) or changed
+    code.peephole = {"removed": removed, "rewritten": rewritten}
+    return code
+
+
+def _thread_jumps(insns, rewritten):
+    changed = False
+    for i, insn in enumerate(insns):
+        if type(insn) not in (I.JMP, I.JMP_IF_TRUE, I.JMP_IF_FALSE):
+            continue
+        target, seen = insn.label.target, set()
+        while target < len(insns) and type(insns[target]) is I.JMP and target not in seen:  # (a loop `JMP`s to itself)
+            seen.add(target)
+            target = insns[target].label.target
+        if target != insn.label.target:
+            insn.label = Label(target)  # its own: the old label may be shared with other instructions
+            rewritten["jump threading"] += 1
+            changed = True
+        if type(insn) is I.JMP and target < len(insns) and type(insns[target]) in (I.RETURN, I.HALT):
+            insns[i] = type(insns[target])()
+            rewritten["jumps to exits"] += 1
+            changed = True
+    return changed
+
+
+def _peephole_pass(code, removed, rewritten):
+    """
+    One sweep of the rules other than jump threading. Like fusion, none touches the instruction
+    after an ARRAY_SET (which skips it) or spans an instruction a jump leads to.
+    """
+    insns = code.insns
+    entered = _jump_targets(insns) | {insn.label.target for insn in insns if isinstance(insn, I.PUSHFN)}
+    order, i, changed = [], 0, False
+    while i < len(insns):
+        insn = insns[i]
+        following = insns[i + 1] if i + 1 < len(insns) and i + 1 not in entered else None
+        if i > 0 and type(insns[i - 1]) is I.ARRAY_SET:
+            pass
+        elif type(insn) is I.JMP and insn.label.target == i + 1:
+            removed["jumps to next"] += 1
+            i += 1
+            continue
+        elif type(insn) in (I.JMP_IF_TRUE, I.JMP_IF_FALSE) and insn.label.target == i + 1:
+            insns[i] = I.POP()
+            rewritten["conditional jumps to next"] += 1
+            changed = True
+        elif type(insn) in (I.PUSH, I.DUP) and type(following) is I.POP:
+            removed["push/pop pairs"] += 2
+            i += 2
+            continue
+        elif (type(insn) is I.STORE and type(following) is I.LOAD and following.name == insn.name
+              and not _fusible(insns, i) and not _fusible(insns, i + 1)):
+            insns[i], insns[i + 1] = I.DUP(), insn
+            rewritten["store/load pairs"] += 1
+            changed = True
+        elif (i not in entered and order and order[-1] == i - 1
+              and type(insns[i - 1]) in (I.JMP, I.RETURN, I.HALT)):
+            removed["unreachable"] += 1
+            i += 1
+            continue
+        order.append(i)
+        i += 1
+    if len(order) < len(insns):
+        _compact(code, order)
+        changed = True
+    return changed
+
+
+def _fusible(insns, i):
+    """Whether a sequence of the default `FUSIONS` takes in the instruction at `i`."""
+    for start in range(max(0, i - 4), i + 1):
+        for fusion in FUSIONS:
+            found = _MATCHERS[fusion](insns, start)
+            if found is not None and start + found[1] > i:
+                return True
+    return False
+
+
+def fuse_superinstructions(code, fusions=FUSIONS):
+    """
+    Replace in place each sequence of instructions a superinstruction in `fusions` (names of
+    superinstructions of `I`) stands for by that superinstruction. A sequence is fused only if
+    execution can enter it at its first instruction alone: none of the others is a jump target
+    or function entry, and it does not follow an ARRAY_SET (which skips its next instruction).
+    The count of each superinstruction made is kept in `ByteCode.fused`.
+    """
+    insns = code.insns
+    entered = _jump_targets(insns) | {insn.label.target for insn in insns if isinstance(insn, I.PUSHFN)}
+    matchers = [match for name, match in _MATCHERS.items() if name in fusions]
+    fused = dict.fromkeys(fusions, 0)
+    order, i = [], 0
+    while i < len(insns):
+        order.append(i)
+        length = 1
+        if i == 0 or type(insns[i - 1]) is not I.ARRAY_SET:
+            for match in matchers:
+                found = match(insns, i)
+                if found is not None and entered.isdisjoint(range(i + 1, i + found[1])):
+                    insns[i], length = found
+                    fused[type(insns[i]).__name__] += 1
+                    break
+        i += length
+    _compact(code, order)
+    code.fused = fused
+    return code
+
+
+def _sequence(insns, i, *kinds):
+    """The instructions from `i` on if they are of `kinds` (each a class, or a tuple of classes), else None."""
+    sequence = insns[i:i + len(kinds)]
+    if len(sequence) < len(kinds):
+        return None
+    for insn, kind in zip(sequence, kinds):
+        if type(insn) not in (kind if isinstance(kind, tuple) else (kind,)):
+            return None
+    return sequence
+
+
+# (superinstruction, number of instructions it replaces) for the sequence at `i`, or None
+
+def _inc_var(insns, i):
+    sequence = _sequence(insns, i, I.LOAD, I.PUSH, I.ADD, I.STORE)
+    if sequence is not None and sequence[0].name == sequence[3].name:
+        load, push, _, _ = sequence
+        return I.INC_VAR(load.name, load.slot, push.value), 4
+    return None
+
+
+def _store_const(insns, i):
+    sequence = _sequence(insns, i, I.PUSH, I.STORE)
+    if sequence is not None:
+        push, store = sequence
+        return I.STORE_CONST(store.name, store.slot, push.value), 2
+    return None
+
+
+def _cmp_jump(insns, i):
+    sequence = _sequence(insns, i, I.LOAD, I.LOAD, COMPARISONS, I.JMP_IF_FALSE)
+    if sequence is not None:
+        load, other, compare, jump = sequence
+        return I.CMP_JUMP(type(compare).__name__, jump.label, load.name, load.slot, other.name, other.slot), 4
+    return None
+
+
+def _cmp_const_jump(insns, i):
+    sequence = _sequence(insns, i, I.LOAD, I.PUSH, COMPARISONS, I.JMP_IF_FALSE)
+    if sequence is not None:
+        load, push, compare, jump = sequence
+        return I.CMP_CONST_JUMP(type(compare).__name__, jump.label, load.name, load.slot, push.value), 4
+    return None
+
+
+def _load_index2(insns, i):
+    sequence = _sequence(insns, i, I.LOAD, I.LOAD, I.ARRAY_GET, I.LOAD, I.ARRAY_GET)
+    if sequence is not None:
+        load, index, _, index2, _ = sequence
+        return I.LOAD_INDEX2(load.name, load.slot, index.name, index.slot, index2.name, index2.slot), 5
+    return None
+
+
+_MATCHERS = {"INC_VAR": _inc_var, "STORE_CONST": _store_const, "CMP_JUMP": _cmp_jump,
+             "CMP_CONST_JUMP": _cmp_const_jump, "LOAD_INDEX2": _load_index2}
+ALL_FUSIONS = tuple(_MATCHERS)
@@ -0,0 +1,418 @@
+"""
+Closure-compiling backend for the tree-walk evaluator.
+
+`compile_tree` turns an AST (as `execute` prepares it: parsed, optimized and resolved) into
+one Python closure per node, each taking the runtime scope and returning the node's value,
+just as `e(node, tS)` would. Everything `e` decides from the node alone — the case it
+matches, the operator, the static address, the child nodes — is decided once here, so
+running the program is a chain of direct calls with no `match` dispatch left.
+
+Nodes without a compiler of their own below (rare statements and the built-in calls) compile
+to a closure calling `e`, so both engines always agree. Function bodies are compiled on
+their first call and kept in `Compiler.bodies`, keyed by the body node shared by every
+`Closure` and scope entry of the function; a `TailCall` made by either engine runs here.
+
+`execute(prog, compiled=True)` runs a program this way.
+"""
+from parser import *
+from scope import SymbolCategory
+from resolver import children
+from optimizer import BINARY, UNARY, MATH, BUILTIN_CALLS
+from evaluator import e, Closure, TailCall, CATEGORY_OF_TYPE, perform_typecast, find_function
+
+VARIABLE, FIXED, FUNCTION = SymbolCategory.VARIABLE, SymbolCategory.FIXED, SymbolCategory.FUNCTION
+PARAMETER_CATEGORIES = (SymbolCategory.VARIABLE, SymbolCategory.ARRAY, SymbolCategory.HASH)
+
+# BinOp cases of `e` evaluating both sides; and/or short-circuit and ** checks its operands
+EAGER = {op: fn for op, fn in BINARY.items() if op not in ("and", "or", "**")}
+
+
+def compile_tree(tree):
+    """Closure computing `e(tree, tS)` from the scope `tS`."""
+    return Compiler().compile(tree)
+
+
+def _nothing(tS):
+    return None
+
+
+class Compiler:
+    def __init__(self):
+        self.bodies = {}  # id(function body) -> (body, its closure)
+        self.compiled = {}  # id(node) -> closure, while `compile` runs
+
+    def compile(self, tree):
+        if tree is None:
+            return _nothing
+        # children before their parents, with an explicit stack (expressions nest deeply)
+        order, stack = [], [tree]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(children(node))
+        try:
+            for node in reversed(order):
+                self.compiled[id(node)] = self.node(node)
+            return self.compiled[id(tree)]
+        finally:
+            self.compiled = {}
+
+    def body(self, body):
+        """The closure of the function body `body`, compiled on first use."""
+        entry = self.bodies.get(id(body))
+        if entry is None:
+            entry = self.bodies[id(body)] = (body, self.compile(body))  # holding `body` keeps its id
+        return entry[1]
+
+    def c(self, node):
+        """The closure of `node`, a child of the node being compiled."""
+        return _nothing if node is None else self.compiled[id(node)]
+
+    def node(self, tree):
+        c = self.c
+        match tree:
+            # PRIMITIVES
+            case Number() | String() | Boolean():
+                value = tree.value if isinstance(tree, Number) else tree.val
+                return lambda tS: value
+
+            # OPERATORS
+            case BinOp("and", l, r):
+                l, r = c(l), c(r)
+                return lambda tS: l(tS) and r(tS)
+            case BinOp("or", l, r):
+                l, r = c(l), c(r)
+                return lambda tS: l(tS) or r(tS)
+            case BinOp("**", l, r):
+                l, r, power = c(l), c(r), BINARY["**"]
+                return lambda tS: power(l(tS), r(tS))
+            case BinOp("not", l, _):  # unary forms kept from the old parser
+                l = c(l)
+                return lambda tS: not l(tS)
+            case BinOp("~", l, _):
+                l = c(l)
+                return lambda tS: ~l(tS)
+            case BinOp(op, l, r) if op in EAGER:
+                return self.binop(op, c(l), c(r))
+            case UnaryOp(op, val) if op in UNARY:
+                fn, val = UNARY[op], c(val)
+                return lambda tS: fn(val(tS))
+
+            # VARIABLE ACCESS, DECLARATION & UPDATE
+            case Variable(name):
+                return self.variable(name, tree.depth, tree.slot)
+            case VarBind(name, dtype, value, category):
+                return self.var_bind(tree, c(value))
+            case UpdateVar(name, value):
+                return self.update_var(tree, c(value))
+            case CompoundAssignment(name, op, value):
+                return self.compound_assignment(tree, c(value))
+
+            # FUNCTIONS
+            case FuncDef(_, params, body, scope):
+                self.bodies[id(body)] = (body, c(body))
+                code = (params, body, scope)
+                return lambda tS: Closure(code, tS)
+            case FuncCall(name, args) if not (type(name) is str and name in BUILTIN_CALLS):
+                return self.call(tree, [c(arg) for arg in args])
+
+            # CONDITIONALS AND LOOPS
+            case If(cond, then_body, else_body, block):
+                return self.conditional(block, c(cond), c(then_body), else_body is not None and c(else_body))
+            case WhileLoop(cond, body, block):
+                return self.while_loop(block, c(cond), self.loop_body(body))
+            case ForLoop(init, cond, incr, body, block):
+                return self.for_loop(block, c(init), c(cond), c(incr), self.loop_body(body))
+            case Repeat(times, body, block):
+                return self.repeat(block, c(times), self.loop_body(body))
+            case BreakOut():
+                return lambda tS: BreakOut()
+            case MoveOn():
+                return lambda tS: MoveOn()
+            case Statements(statements):
+                return self.statements([c(stmt) for stmt in statements])
+
+            # ARRAYS, HASHES AND STRINGS
+            case Array(items):
+                items = [c(item) for item in items]
+                return lambda tS: [item(tS) for item in items]
+            case Hash(pairs):
+                pairs = [(c(k), c(v)) for k, v in pairs]
+                return lambda tS: {k(tS): v(tS) for k, v in pairs}
+            case CallArr(name, indices) | CallHashVal(name, indices) if isinstance(indices, list):
+                return self.subscript(name, [c(index) for index in indices])
+            case AssignHashVal(name, keys, value) if isinstance(keys, list):
+                return self.assign_subscript(name, [c(key) for key in keys], c(value))
+            case AssigntoArr(name, indices, value) if isinstance(indices, list):
+                assign = self.assign_subscript(name, [c(index) for index in indices], c(value))
+                return lambda tS: e(tree, tS) if type(tS.lookup(name)) is str else assign(tS)
+            case ArrayLen() | StrLen() | HashLen():
+                return self.property_access(tree, None)
+            case ArrayAppend(name, _, [arg]) | HashContains(name, _, [arg]):
+                return self.property_access(tree, c(arg))
+            case ArrayPopBack(name) | ArrayPopFront(name):
+                return self.property_access(tree, None)
+
+            # FEATURES
+            case Display(val):
+                val = c(val)
+                return lambda tS: print(val(tS), end="")
+            case DisplayL(val):
+                val = c(val)
+                return lambda tS: print(val(tS))
+            case TypeCast(dtype, val):
+                val = c(val)
+                return lambda tS: perform_typecast(val(tS), dtype)
+            case MathFunction(name, args) if name in MATH:
+                fn, args = MATH[name], [c(arg) for arg in args]
+                if len(args) == 1:
+                    arg, = args
+                    return lambda tS: fn(arg(tS))
+                return lambda tS: fn(*[arg(tS) for arg in args])
+
+        return lambda tS: e(tree, tS)
+
+    @staticmethod
+    def binop(op, l, r):
+        # the most common operators get a closure of their own, the others call through BINARY
+        match op:
+            case "+":
+                return lambda tS: l(tS) + r(tS)
+            case "-":
+                return lambda tS: l(tS) - r(tS)
+            case "*":
+                return lambda tS: l(tS) * r(tS)
+            case "%":
+                return lambda tS: l(tS) % r(tS)
+            case "<":
+                return lambda tS: l(tS) < r(tS)
+            case ">":
+                return lambda tS: l(tS) > r(tS)
+            case "<=":
+                return lambda tS: l(tS) <= r(tS)
+            case ">=":
+                return lambda tS: l(tS) >= r(tS)
+            case "==":
+                return lambda tS: l(tS) == r(tS)
+            case "!=":
+                return lambda tS: l(tS) != r(tS)
+        fn = BINARY[op]
+        return lambda tS: fn(l(tS), r(tS))
+
+    @staticmethod
+    def variable(name, depth, slot):
+        def variable(tS):
+            scope, slot_ = tS.find(name, depth, slot)
+            if scope.categories[slot_] == FUNCTION:
+                return Closure(scope.values[slot_], scope)
+            return scope.values[slot_]
+        return variable
+
+    @staticmethod
+    def var_bind(tree, value):
+        name, dtype, cast = tree.var_name, tree.dtype, tree.cast
+        category = tree.category
+        if category != FIXED and tree.vtype is not None:  # the category is known already
+            category = CATEGORY_OF_TYPE.get(tree.vtype, VARIABLE)
+        elif category != FIXED:
+            category = None  # the category of the value stored
+
+        def var_bind(tS):
+            var_val = value(tS)
+            if cast:
+                var_val = perform_typecast(var_val, dtype, name)
+            tS.define(name, var_val, category or CATEGORY_OF_TYPE.get(type(var_val), VARIABLE))
+            return var_val
+        return var_bind
+
+    @staticmethod
+    def update_var(tree, value):
+        name, depth, slot, vtype = tree.var_name, tree.depth, tree.slot, tree.vtype
+
+        def update_var(tS):
+            new_val = value(tS)
+            scope, slot_ = tS.find(name, depth, slot)
+            if slot_ in scope.fixed:
+                raise ValueError(f"Error: Cannot reassign to a fixed variable '{name}'")
+            scope.values[slot_] = new_val
+            if scope is tS:  # only a variable of this very scope takes the new category
+                scope.categories[slot_] = CATEGORY_OF_TYPE.get(vtype or type(new_val), VARIABLE)
+            return new_val
+        return update_var
+
+    @staticmethod
+    def compound_assignment(tree, value):
+        name, depth, slot, vtype, fn = tree.var_name, tree.depth, tree.slot, tree.vtype, BINARY[tree.op[0]]
+
+        def compound_assignment(tS):
+            scope, slot_ = tS.find(name, depth, slot)
+            if slot_ in scope.fixed:
+                raise ValueError(f"Error: Cannot modify fixed variable '{name}'")
+            new_val = fn(scope.values[slot_], value(tS))
+            scope.values[slot_] = new_val
+            if scope is tS:
+                scope.categories[slot_] = CATEGORY_OF_TYPE.get(vtype or type(new_val), VARIABLE)
+            return new_val
+        return compound_assignment
+
+    def call(self, tree, args):
+        """A user function call, as `bind_call` and the FuncCall case of `e` make it."""
+        name, tail, bodies, body_of = tree.funcName, tree.tail, self.bodies, self.body
+
+        if isinstance(name, CallArr):  # a Closure stored in an array or hash
+            element = self.c(name)
+
+            def callee(tS):
+                closure = element(tS)
+                return closure.code, closure.env
+        else:
+            def callee(tS):
+                return find_function(name, tS)
+
+        def call(tS):
+            (params, body, parsed_scope), parent = callee(tS)
+            scope = parsed_scope.instantiate(parent)
+            for param, arg in zip(params, args):
+                if param[1] in PARAMETER_CATEGORIES:
+                    scope.define(param[0], arg(tS), param[1])
+            if tail:
+                return TailCall(body, scope)
+            entry = bodies.get(id(body))
+            result = (entry[1] if entry is not None else body_of(body))(scope)
+            while isinstance(result, TailCall):
+                entry = bodies.get(id(result.body))
+                result = (entry[1] if entry is not None else body_of(result.body))(result.scope)
+            return result
+        return call
+
+    @staticmethod
+    def statements(stmts):
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def statements(tS):
+            result = None
+            for stmt in stmts:
+                result = stmt(tS)
+            return result
+        return statements
+
+    def loop_body(self, body):
+        """The statements of a loop body, run until one yields BreakOut or MoveOn."""
+        return [self.c(stmt) for stmt in body.statements]
+
+    @staticmethod
+    def conditional(block, cond, then_body, else_body):
+        def conditional(tS):
+            scope = block.instantiate(tS)
+            if cond(scope):
+                return then_body(scope)
+            elif else_body:
+                return else_body(scope)
+            return None
+        return conditional
+
+    @staticmethod
+    def while_loop(block, cond, body):
+        def while_loop(tS):
+            scope = block.instantiate(tS)
+            while cond(scope):
+                for stmt in body:
+                    result = stmt(scope)
+                    if isinstance(result, (BreakOut, MoveOn)):
+                        if isinstance(result, BreakOut):
+                            return None
+                        break
+        return while_loop
+
+    @staticmethod
+    def for_loop(block, init, cond, incr, body):
+        def for_loop(tS):
+            scope = block.instantiate(tS)
+            init(scope)
+            while cond(scope):
+                for stmt in body:
+                    result = stmt(scope)
+                    if isinstance(result, (BreakOut, MoveOn)):
+                        if isinstance(result, BreakOut):
+                            return None
+                        break
+                incr(scope)
+        return for_loop
+
+    @staticmethod
+    def repeat(block, times, body):
+        def repeat(tS):
+            scope = block.instantiate(tS)
+            repetitions = times(scope)
+            if not isinstance(repetitions, int) or repetitions < 0:
+                raise ValueError(
+                    "Repeat loop requires a non-negative integer for the number of repetitions."
+                )
+            for _ in range(repetitions):
+                for stmt in body:
+                    result = stmt(scope)
+                    if isinstance(result, (BreakOut, MoveOn)):
+                        if isinstance(result, BreakOut):
+                            return None
+                        break
+        return repeat
+
+    @staticmethod
+    def property_access(tree, arg):
+        """A specialized property access (see parser.property_access); like `e`, it takes the
+        generic path once the name holds a value of another type."""
+        name = tree.var_name
+
+        match tree:
+            case ArrayLen() | StrLen() | HashLen():
+                def property_access(tS):
+                    value = tS.lookup(name)
+                    return len(value) if type(value) in (list, str, dict) else e(tree, tS)
+            case ArrayAppend():
+                def property_access(tS):
+                    arr = tS.lookup(name)
+                    if type(arr) is not list:
+                        return e(tree, tS)
+                    arr.append(arg(tS))
+                    return arr
+            case HashContains():
+                def property_access(tS):
+                    table = tS.lookup(name)
+                    if type(table) is not dict:
+                        return e(tree, tS)
+                    return arg(tS) in table
+            case ArrayPopBack():
+                def property_access(tS):
+                    arr = tS.lookup(name)
+                    return arr.pop() if type(arr) is list and arr else e(tree, tS)
+            case ArrayPopFront():
+                def property_access(tS):
+                    arr = tS.lookup(name)
+                    return arr.pop(0) if type(arr) is list and arr else e(tree, tS)
+        return property_access
+
+    @staticmethod
+    def subscript(name, indices):
+        if len(indices) == 1:
+            index, = indices
+            return lambda tS: tS.lookup(name)[index(tS)]
+
+        def subscript(tS):
+            value = tS.lookup(name)
+            for index in indices:
+                value = value[index(tS)]
+            return value
+        return subscript
+
+    @staticmethod
+    def assign_subscript(name, indices, value):
+        def assign_subscript(tS):
+            container = tS.lookup(name)
+            *outer, last = [index(tS) for index in indices]
+            for index in outer:
+                container = container[index]
+            container[last] = value(tS)
+            tS.find_and_update(name, tS.lookup(name))
+            return container[last]
+        return assign_subscript
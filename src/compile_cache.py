@@ -0,0 +1,98 @@
+"""
+On-disk cache of compiled Nexus programs (`.nxc` files).
+
+Works like `__pycache__`: the result of compiling a program (the VM's `ByteCode`, or the
+tree-walker's AST) is pickled into a `__nxcache__` directory next to the `.nx` file, or into
+an explicit cache directory keyed by the source hash. An entry is reused only when both the
+sha256 of the source and the compiler fingerprint (size and mtime of every module in `src/`,
+plus the Python version) match, so editing either the program or the compiler invalidates it.
+
+Cache files are trusted like `.pyc` files: only point `cache_dir` at directories you own.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import sys
+
+CACHE_DIR_NAME = "__nxcache__"
+CACHE_SUFFIX = ".nxc"
+FORMAT_VERSION = 1  # bump when the layout of a cache entry changes
+
+_compiler_fingerprint = None
+
+
+def compiler_fingerprint():
+    """Hash identifying this compiler build and Python version; part of every cache key."""
+    global _compiler_fingerprint
+    if _compiler_fingerprint is None:
+        # stat, not read: like .pyc invalidation, any edit to a compiler module changes it
+        digest = hashlib.sha256(f"nxc{FORMAT_VERSION}:{sys.version_info[:2]}".encode())
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        for path in sorted(glob.glob(os.path.join(src_dir, "*.py"))):
+            st = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+        _compiler_fingerprint = digest.hexdigest()
+    return _compiler_fingerprint
+
+
+def source_hash(source):
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def cache_path_for(kind, source, source_path=None, cache_dir=None):
+    """
+    Location of the cache entry of `kind` ("bytecode" or "ast") for a program.
+
+    With `source_path` the entry lives in `__nxcache__/` beside the file (or in `cache_dir`
+    if given) and is named after it; otherwise it is named after the source hash.
+    """
+    if source_path is not None:
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        directory = cache_dir or os.path.join(os.path.dirname(os.path.abspath(source_path)), CACHE_DIR_NAME)
+    else:
+        stem = source_hash(source)[:32]
+        directory = cache_dir
+    return os.path.join(directory, f"{stem}.{kind}{CACHE_SUFFIX}")
+
+
+def load_or_compile(kind, source, compile_fn, source_path=None, cache_dir=None, optimize=True):
+    """
+    Return `compile_fn()` for `source`, reusing a valid `.nxc` entry when there is one.
+
+    `optimize` says whether `compile_fn` optimizes the program; unoptimized compiles are
+    cached apart, as `<name>.<kind>-noopt.nxc`.
+    Caching is off unless `source_path` or `cache_dir` is given. A missing, stale or
+    unreadable entry is simply recompiled and rewritten; failing to write one (read-only
+    directory, unpicklable result) never fails the compile.
+    """
+    if source_path is None and cache_dir is None:
+        return compile_fn()
+
+    path = cache_path_for(kind if optimize else f"{kind}-noopt", source, source_path, cache_dir)
+    key = (compiler_fingerprint(), source_hash(source), optimize)
+    try:
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+        if entry["key"] == key:
+            return entry["payload"]
+    except Exception:
+        pass  # no entry yet, or one from another compiler: rebuild it
+
+    result = compile_fn()
+    _store(path, {"key": key, "payload": result})
+    return result
+
+
+def _store(path, entry):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)  # atomic, so concurrent runs never see half an entry
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
@@ -1,6 +1,9 @@
 from parser import *
 from scope import SymbolCategory, SymbolTable
-import copy
+from compile_cache import load_or_compile
+from resolver import resolve
+from optimizer import BINARY
+import optimizer
 import math
 import re
 import sys
@@ -13,16 +16,11 @@ enable_cat_fn = False
 
 def determine_runtime_category(value):
     """Determine the SymbolCategory of a runtime value."""
-    if isinstance(value, list):
-        return SymbolCategory.ARRAY
-    elif isinstance(value, dict):
-        return SymbolCategory.HASH
-    elif isinstance(value, str):
-        return SymbolCategory.STRING
-    # elif isinstance(value, tuple) and len(value) >= 2 and isinstance(value[1], Statements):
-    #     return SymbolCategory.FUNCTION
-    else:
-        return SymbolCategory.VARIABLE
+    return CATEGORY_OF_TYPE.get(type(value), SymbolCategory.VARIABLE)
+
+# runtime category of a value of each type (any other type is a VARIABLE)
+CATEGORY_OF_TYPE = {list: SymbolCategory.ARRAY, dict: SymbolCategory.HASH, str: SymbolCategory.STRING,
+                    int: SymbolCategory.VARIABLE, float: SymbolCategory.VARIABLE, bool: SymbolCategory.VARIABLE}
 
 def perform_typecast(var_val, dtype, name=None):
     try:
@@ -60,6 +58,86 @@ def perform_typecast(var_val, dtype, name=None):
     return var_val
 
 
+class Closure:
+    """
+    A function used as a value: its declaration `(params, body, scope)`, shared with every
+    other use of the function, and `env`, the runtime scope it was found or defined in.
+
+    Making one is O(1); a call binds the parameters in a fresh instance of `scope` under
+    `env`, just as a call by name does under the scope the function is found in.
+    """
+    __slots__ = ("code", "env")
+
+    def __init__(self, code, env):
+        self.code = code
+        self.env = env
+
+
+class TailCall:
+    """
+    A user function call with its scope ready and arguments bound, not run yet.
+
+    A call in tail position (marked by optimizer.mark_tail_calls) evaluates to one of these;
+    it passes up through the `if`s and statement lists it ends to the `FuncCall` running the
+    caller's body, which runs it in the caller's place. Tail-recursive functions thus take
+    constant Python stack, and each finished scope is freed as the next call starts.
+    """
+    __slots__ = ("body", "scope")
+
+    def __init__(self, body, scope):
+        self.body = body
+        self.scope = scope
+
+
+def find_function(fn_name, tS):
+    """`(declaration, parent)` of the function called `fn_name` from `tS`: its `(params, body,
+    scope)` and the runtime scope a call's scope goes under."""
+    try:
+        scope, slot = tS.find(fn_name)
+    except NameError:
+        raise NameError(f"Function '{fn_name}' not found!") from None
+    value = scope.values[slot]
+    if scope.categories[slot] == SymbolCategory.FUNCTION:
+        # a declared function: its parent is the scope it is found in
+        return value, scope
+    # means variable was assigned a function (a Closure), and now being called
+    return value.code, value.env
+
+
+def bind_call(fn_name, fn_args, tS):
+    """The call of the user function `fn_name` with `fn_args`, evaluated in `tS`, as a `TailCall`."""
+    # Step 1: Extract function body & adjust scope
+    if (isinstance(fn_name, CallArr)):
+        arr = tS.lookup(fn_name.xname)
+        for i_expr in fn_name.index:
+            arr = arr[e(i_expr, tS)]
+        # closure applies here: the Closure carries the scope it was defined in
+        (param_list, fn_body, parsedScope), fn_parent = arr.code, arr.env
+
+    else:
+        (param_list, fn_body, parsedScope), fn_parent = find_function(fn_name, tS)
+
+    # parameters and local variables start out as None; nested function
+    # declarations (params, body, tS_f) are shared, not copied
+    eval_scope = parsedScope.instantiate(fn_parent)
+
+    # Step 2: Put argument values into function's scope
+
+    for param, arg in zip(param_list, fn_args):
+        """
+        if variable/fn, pass by value
+        if array, pass by reference
+        """
+        if param[1]==SymbolCategory.VARIABLE:
+            eval_scope.define(param[0], e(arg, tS), SymbolCategory.VARIABLE)
+        elif param[1]==SymbolCategory.ARRAY:
+            eval_scope.define(param[0], e(arg, tS), SymbolCategory.ARRAY)
+        elif param[1]==SymbolCategory.HASH:
+            eval_scope.define(param[0], e(arg, tS), SymbolCategory.HASH)
+
+    return TailCall(fn_body, eval_scope)
+
+
 # ================================================================================================================
 """
 Cases inside e() listed in below order:
@@ -78,11 +156,8 @@ Cases inside e() listed in below order:
 def e(tree: AST, tS) -> Any:
     match tree:
         # Primitives ========================================================
-        case Number(n):
-            if "." in n:  # Check if the number contains a decimal point
-                return float(n)  # Return as a float
-            else:
-                return int(n)
+        case Number():
+            return tree.value  # int or float, decoded by the parser
         case String(s):
             return s
         case Boolean(b):
@@ -99,6 +174,8 @@ def e(tree: AST, tS) -> Any:
             return e(l, tS) / e(r, tS)
         case BinOp("/", l, r):
             return e(l, tS) / e(r, tS)
+        case BinOp("//", l, r):  # only made by the optimizer, from floor(a / b) on integers
+            return e(l, tS) // e(r, tS)
         case BinOp("**", l, r):
             base = e(l, tS)
             exponent = e(r, tS)
@@ -108,7 +185,7 @@ def e(tree: AST, tS) -> Any:
                     "Math error: Zero cannot be raised to a negative power."
                 )
             # Rule 2: Negative number to the power of a decimal
-            if base < 0 and not exponent.is_integer():
+            if base < 0 and not float(exponent).is_integer():
                 raise ValueError(
                     "Math error: Negative numbers cannot be raised to a decimal power."
                 )
@@ -162,50 +239,49 @@ def e(tree: AST, tS) -> Any:
 
         # VARIABLE ACCESS, DECLARATION & UPDATE ========================================================
         case Variable(v):
-            cat = tS.lookup(v, cat=True)
-            if cat == SymbolCategory.FUNCTION:
-                value, lexParent = tS.lookup(v, giveParent=True)
-                """
-                when accessing function like a variable (as param/return)
-                value format: (params:[], body: Statements(), pS)
-                pS is parsedScope whose parent must be set to lexical parent
-                """
-                # value[2].parent = lexParent # where this variable is found
-                # return (value[0], value[1], value[2])
-                isolated_scope = copy.deepcopy(value[2])
-                isolated_scope.parent = lexParent
-                return (value[0], value[1], isolated_scope)
+            lexParent, slot = tS.find(v, tree.depth, tree.slot)
+            value = lexParent.values[slot]
+            if lexParent.categories[slot] == SymbolCategory.FUNCTION:
+                # accessing a function like a variable (as param/return): it closes over
+                # the scope it is found in
+                return Closure(value, lexParent)
             else:
-                return tS.lookup(v)
+                return value
 
         case VarBind(name, dtype, value, category):
             var_val = e(value, tS)
-            var_val = perform_typecast(var_val, dtype, name)
-            category = determine_runtime_category(var_val)
+            if tree.cast:  # not when the value is known to have the type already
+                var_val = perform_typecast(var_val, dtype, name)
+            if category != SymbolCategory.FIXED:
+                category = CATEGORY_OF_TYPE.get(tree.vtype or type(var_val), SymbolCategory.VARIABLE)
             tS.define(name, var_val, category)  # binds in current scope
             return var_val
 
         case UpdateVar(var_name, value):
             val_to_assign = e(value, tS)
-            category = determine_runtime_category(val_to_assign)
-            tS.find_and_update(var_name, val_to_assign, category)
+            scope, slot = tS.find(var_name, tree.depth, tree.slot)
+            if slot in scope.fixed:
+                raise ValueError(f"Error: Cannot reassign to a fixed variable '{var_name}'")
+            scope.values[slot] = val_to_assign
+            if scope is tS:  # only a variable of this very scope takes the new category
+                scope.categories[slot] = CATEGORY_OF_TYPE.get(tree.vtype or type(val_to_assign), SymbolCategory.VARIABLE)
             return val_to_assign
 
         case CompoundAssignment(var_name, op, value):
             # Check if variable is fixed
-            category = tS.lookup(var_name, cat=True)
-            if category == SymbolCategory.FIXED:
+            scope, slot = tS.find(var_name, tree.depth, tree.slot)
+            if slot in scope.fixed:
                 raise ValueError(f"Error: Cannot modify fixed variable '{var_name}'")
-            prev_val = tS.lookup(var_name)
-            new_val = e(BinOp(op[0], Number(str(prev_val)), value), tS)
-            new_category = determine_runtime_category(new_val)
-            tS.find_and_update(var_name, new_val, new_category)
+            new_val = BINARY[op[0]](scope.values[slot], e(value, tS))
+            scope.values[slot] = new_val
+            if scope is tS:  # only a variable of this very scope takes the new category
+                scope.categories[slot] = CATEGORY_OF_TYPE.get(tree.vtype or type(new_val), SymbolCategory.VARIABLE)
             return new_val
 
         # FUNCTIONS ===========================================================================
         case FuncDef(funcDefName, funcDefParams, funcDefBody, funcDefScope):
             # tS.define(fusncName, (funcParams, funcBody, funcScope, isRec), SymbolCategory.FUNCTION)
-            return (funcDefParams, funcDefBody, funcDefScope)
+            return Closure((funcDefParams, funcDefBody, funcDefScope), tS)
 
         case FuncCall(fn_name, fn_args):
 
@@ -302,60 +378,20 @@ def e(tree: AST, tS) -> Any:
                 return tS.lookup(arg.var_name, cat=True)
 
             # GENERAL FUNCTION CALLS ********
-            # Step 1: Extract function body & adjust scope
-            if (isinstance(fn_name, CallArr)):
-                arr = tS.lookup(fn_name.xname)
-                for i_expr in fn_name.index:
-                    arr = arr[e(i_expr, tS)]
-            
-                (param_list, fn_body, parsedScope) = arr
-                eval_scope = SymbolTable(parsedScope.parent)
-
-            else:    
-                cat = tS.lookup(fn_name, cat=True)
-                if cat == SymbolCategory.VARIABLE:
-                    # means variable was assigned a function, and now being called
-                    # closure applies here, i.e, parsedScope already "carries" the correct parent
-                    (param_list, fn_body, parsedScope) = tS.lookup(fn_name)
-                    eval_scope = SymbolTable(parsedScope.parent)
-                else:
-                    # else we "find" the parent
-                    ((param_list, fn_body, parsedScope), fn_parent) = tS.lookup_fun(fn_name)
-                    eval_scope = SymbolTable(fn_parent)
-
-            for key, value in parsedScope.table.items():
-                if value[1] == SymbolCategory.VARIABLE:
-                    # for parameters and local variables (for which value[0] is None in parsedScope)
-                    eval_scope.table[key] = (None, SymbolCategory.VARIABLE)
-                elif value[1] == SymbolCategory.FUNCTION:
-                    # for function declarations (value[0] is a tuple (params, body, tS_f))
-                    # prm = copy.deepcopy(value[0][0]) # list of strings
-                    # bdy = copy.deepcopy(value[0][1]) # Statements
-                    prm = value[0][0]  # list of strings
-                    bdy = value[0][1]  # Statements
-                    eval_scope.table[key] = (
-                        (prm, bdy, value[0][2]),
-                        SymbolCategory.FUNCTION,
-                    )
-
-            # Step 2: Put argument values into function's scope
-
-            for param, arg in zip(param_list, fn_args):
-                """
-                if variable/fn, pass by value
-                if array, pass by reference
-                """
-                if param[1]==SymbolCategory.VARIABLE:
-                    eval_scope.define(param[0], e(arg, tS), SymbolCategory.VARIABLE)
-                elif param[1]==SymbolCategory.ARRAY:
-                    eval_scope.define(param[0], e(arg, tS), SymbolCategory.ARRAY)
-                elif param[1]==SymbolCategory.HASH:
-                    eval_scope.define(param[0], e(arg, tS), SymbolCategory.HASH)
-
-            # Step 3: Evaluate the function body
-            ans = None
-            for stmt in fn_body.statements:
-                ans = e(stmt, eval_scope)
+            call = bind_call(fn_name, fn_args, tS)
+            if tree.tail:
+                # nothing is left to do here after the call: the call running this body runs it
+                return call
+
+            # Step 3: Evaluate the function body; a tail call it ends in replaces it, in this
+            # loop, instead of nesting another Python frame per call
+            while True:
+                ans = None
+                for stmt in call.body.statements:
+                    ans = e(stmt, call.scope)
+                if not isinstance(ans, TailCall):
+                    break
+                call = ans
 
             # NOT DONE to support closure
             # Step 4: Pop the arg values from the function's scope (don't delete the scope table)
@@ -367,13 +403,8 @@ def e(tree: AST, tS) -> Any:
 
         # CONDITIONAL ===========================================================================
         case If(cond, then_body, else_body, tS_cond):
-            eval_cond_scope = SymbolTable(parent=tS)
             # Copy static declarations from parse-time scope
-            for key, value in tS_cond.table.items():
-                if value[1] == SymbolCategory.VARIABLE:
-                    eval_cond_scope.table[key] = (None, SymbolCategory.VARIABLE)
-                elif value[1] == SymbolCategory.FUNCTION:
-                    eval_cond_scope.table[key] = copy.deepcopy(value)
+            eval_cond_scope = tS_cond.instantiate(parent=tS)
             ans = None
             if e(cond, eval_cond_scope):
                 ans = e(then_body, eval_cond_scope)
@@ -383,14 +414,8 @@ def e(tree: AST, tS) -> Any:
 
         # LOOPS ========================================================================================
         case WhileLoop(cond, body, tS_while):
-
-            eval_while_scope = SymbolTable(parent=tS)
             # Copy static declarations from parse-time scope
-            for key, value in tS_while.table.items():
-                if value[1] == SymbolCategory.VARIABLE:
-                    eval_while_scope.table[key] = (None, SymbolCategory.VARIABLE)
-                elif value[1] == SymbolCategory.FUNCTION:
-                    eval_while_scope.table[key] = copy.deepcopy(value)
+            eval_while_scope = tS_while.instantiate(parent=tS)
 
             while e(cond, eval_while_scope):
                 loop_should_break = False
@@ -405,13 +430,8 @@ def e(tree: AST, tS) -> Any:
                     break
 
         case ForLoop(init, cond, incr, body, tS_for):
-            eval_for_scope = SymbolTable(parent=tS)
             # Copy static declarations from parse-time scope
-            for key, value in tS_for.table.items():
-                if value[1] == SymbolCategory.VARIABLE:
-                    eval_for_scope.table[key] = (None, SymbolCategory.VARIABLE)
-                elif value[1] == SymbolCategory.FUNCTION:
-                    eval_for_scope.table[key] = copy.deepcopy(value)
+            eval_for_scope = tS_for.instantiate(parent=tS)
 
             e(init, eval_for_scope)
             while e(cond, eval_for_scope):
@@ -427,7 +447,9 @@ def e(tree: AST, tS) -> Any:
                     break
                 e(incr, eval_for_scope)
 
-        case Repeat(times, body, repeatScope):
+        case Repeat(times, body, tS_repeat):
+            # Copy static declarations from parse-time scope
+            repeatScope = tS_repeat.instantiate(parent=tS)
             repetitions = e(times, repeatScope)
             if not isinstance(repetitions, int) or repetitions < 0:
                 raise ValueError(
@@ -490,6 +512,24 @@ def e(tree: AST, tS) -> Any:
 
         # PROPERTY ACCESS AT RUNTIME===================
         case PropertyAccess(var_name, operation, args):
+            # receiver category known at parse time (parser.property_access): run the operation
+            # directly while the name still holds that type, else take the generic path below
+            match tree:
+                case ArrayLen() | StrLen() | HashLen() if type(value := tS.lookup(var_name)) in (list, str, dict):
+                    return len(value)
+                case ArrayAppend(_, _, [arg]) if type(arr := tS.lookup(var_name)) is list:
+                    arr.append(e(arg, tS))
+                    return arr
+                case ArrayPopBack() if type(arr := tS.lookup(var_name)) is list and arr:
+                    return arr.pop()
+                case ArrayPopFront() if type(arr := tS.lookup(var_name)) is list and arr:
+                    return arr.pop(0)
+                case StrSlice() if type(s := tS.lookup(var_name)) is str:
+                    start, end, step = [e(arg, tS) for arg in args] + [None] * (3 - len(args))
+                    return s[start:end:step]
+                case HashContains(_, _, [key]) if type(table := tS.lookup(var_name)) is dict:
+                    return e(key, tS) in table
+
             # Get the actual value and determine its runtime type
             try:
                 var_value = tS.lookup(var_name) # var_name: (value, category)
@@ -985,9 +1025,22 @@ def e(tree: AST, tS) -> Any:
 # ================================================================================================================
 
 
-def execute(prog):
-    pS = SymbolTable()
-    lines, tS = parse(prog, pS)
+def execute(prog, source_path=None, cache_dir=None, compiled=False, explicit_stack=False, optimize=True):
+    # `source_path`/`cache_dir` reuse the parsed program from a cached `.nxc` (see compile_cache);
+    # `optimize=False` runs the program as parsed, without the passes of optimizer.py
+    def compile_fn():
+        ast, tS = parse(prog, SymbolTable())
+        return resolve(*optimizer.optimize(ast, tS) if optimize else (ast, tS))
+
+    lines, tS = load_or_compile("ast", prog, compile_fn, source_path, cache_dir, optimize)
+    if explicit_stack:  # no Python recursion: nesting is limited by stack_eval.HEAP_BUDGET only
+        from stack_eval import run
+        run(lines, tS)
+        return
+    if compiled:  # compile the tree into closures first (see closure_eval), then run those
+        from closure_eval import compile_tree
+        compile_tree(lines)(tS)
+        return
     for line in lines.statements:
         e(line, tS)
 
@@ -1,4 +1,6 @@
+import re
 from dataclasses import dataclass
+from array import array
 from collections.abc import Iterator
 from tokens import  *
 from typing import Union
@@ -9,96 +11,304 @@ from typing import Union
 class Token:
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class VarToken(Token):
     var_name: str # identifier
 
-@dataclass
+@dataclass(frozen=True)
 class NumberToken(Token):
     val: str
 
-@dataclass
+@dataclass(frozen=True)
 class OperatorToken(Token):
     o: str
 
-@dataclass
+@dataclass(frozen=True)
 class DotToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class StringToken(Token):
     val: str
 
-@dataclass
+@dataclass(frozen=True)
 class KeywordToken(Token):
     kw_name: str
 
-@dataclass
+@dataclass(frozen=True)
 class BooleanToken(Token):
     val: str
 
-@dataclass
+@dataclass(frozen=True)
 class BreakToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class TypeToken(Token):
     type_name: str
 
-@dataclass
+@dataclass(frozen=True)
 class SemicolonToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class CommaToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class ColonToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class LeftBraceToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class LeftSquareToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class RightSquareToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class RightBraceToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class LeftParenToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class RightParenToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class BreakOutToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class MoveOnToken(Token):
     pass
 
-@dataclass
+@dataclass(frozen=True)
 class FstringToken(Token): 
     value: str
 
-@dataclass
+@dataclass(frozen=True)
 class MathToken(Token):
     value : str
 
 # ======================================================================================================
+# Table-driven lexer: a single compiled master pattern finds the extent of every lexeme
+# and a classification table maps words straight to their token kinds.
+
+_TWO_CHAR_OPERATORS = top_level_operator_tokens + ("**",)
+_ONE_CHAR_OPERATORS = tuple(
+    op for op in base_operator_tokens + bitwise_ops if len(op) == 1
+)
+
+# Leading whitespace is folded into every match; group order matters: comments must win
+# over the `/` operator and `++` over `+`.
+_MASTER_PATTERN = re.compile(
+    r"\s*(?:"
+    + "|".join(
+        (
+            r"(?P<SEMICOLON>;)",
+            r"(?P<WORD>[^\W\d_]\w*)",
+            r"(?P<STRING>\"[^\"]*\"|'[^']*')",
+            r"(?P<FSTRING>`[^`]*`)",
+            r"(?P<NUMBER>\d+(?:\.\d*)?)",
+            r"(?P<LINE_COMMENT>/>[^\n]*)",
+            r"(?P<BLOCK_COMMENT>/~(?:.*?~/|.*))",
+            r"(?P<BAD_OPERATOR>\+\+)",
+            "(?P<OPERATOR>"
+            + "|".join(map(re.escape, _TWO_CHAR_OPERATORS + _ONE_CHAR_OPERATORS))
+            + ")",
+            r"(?P<PUNCTUATION>[{}()\[\],.:])",
+            r"(?P<UNTERMINATED>[\"'`])",
+            r"(?P<MISMATCH>.)",
+            r"(?P<END>\Z)",
+        )
+    )
+    + ")",
+    re.DOTALL,
+)
+
+# ======================================================================================================
+# Token kinds: every fixed lexeme (keyword, type, math name, boolean, operator, punctuation) has its
+# own kind code and one shared, immutable token instance. Identifiers, numbers and string literals
+# use the four payload kinds and are materialized from the source text on demand.
+
+VAR_KIND, NUMBER_KIND, STRING_KIND, FSTRING_KIND = range(4)
+_PAYLOAD_CLASSES = (VarToken, NumberToken, StringToken, FstringToken)
+
+KIND_TOKENS = [None, None, None, None]  # kind -> shared token (None for payload kinds)
+FIXED_TOKENS = {}  # lexeme -> shared token
+FIXED_KINDS = {}  # lexeme -> kind
+
+
+def _add_fixed(lexeme, token):
+    FIXED_TOKENS[lexeme] = token
+    FIXED_KINDS[lexeme] = len(KIND_TOKENS)
+    KIND_TOKENS.append(token)
+
+
+for _words, _make in (  # in priority order: a keyword is never re-classified
+    (keyword_tokens, KeywordToken),
+    (boolean_tokens, BooleanToken),
+    (base_type_tokens, TypeToken),
+    (math_tokens, MathToken),
+):
+    for _word in _words:
+        if _word not in FIXED_TOKENS:
+            _add_fixed(_word, _make(_word))
+_add_fixed("break", BreakToken())
+_add_fixed("breakout", BreakOutToken())
+_add_fixed("moveon", MoveOnToken())
+_WORD_KINDS = dict(FIXED_KINDS)
+
+for _op in _TWO_CHAR_OPERATORS + _ONE_CHAR_OPERATORS:
+    _add_fixed(_op, OperatorToken(_op))
+for _lexeme, _make in (
+    (";", SemicolonToken),
+    ("{", LeftBraceToken),
+    ("}", RightBraceToken),
+    ("(", LeftParenToken),
+    (")", RightParenToken),
+    ("[", LeftSquareToken),
+    ("]", RightSquareToken),
+    (",", CommaToken),
+    (".", DotToken),
+    (":", ColonToken),
+):
+    _add_fixed(_lexeme, _make())
+
+SEMICOLON = FIXED_TOKENS[";"]
+LEFT_BRACE = FIXED_TOKENS["{"]
+RIGHT_BRACE = FIXED_TOKENS["}"]
+LEFT_PAREN = FIXED_TOKENS["("]
+RIGHT_PAREN = FIXED_TOKENS[")"]
+LEFT_SQUARE = FIXED_TOKENS["["]
+RIGHT_SQUARE = FIXED_TOKENS["]"]
+COMMA = FIXED_TOKENS[","]
+DOT = FIXED_TOKENS["."]
+COLON = FIXED_TOKENS[":"]
+
+
+class TokenStream:
+    """
+    Array-backed token buffer produced by `tokenize`.
+
+    Tokens are stored as parallel kind/offset/length arrays over the source text. Reading a
+    position yields the shared singleton for fixed lexemes, or a payload token interned by
+    text, so a program allocates one object per distinct identifier/literal rather than one
+    per token. The stream doubles as the parser's cursor through `peek` and `next`.
+    """
+
+    __slots__ = ("source", "kinds", "offsets", "lengths", "size", "pos", "_interned", "_head_pos", "_head")
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array("B")
+        self.offsets = array("I")
+        self.lengths = array("I")
+        self.size = 0
+        self.pos = 0
+        self._interned = ({}, {}, {}, {})
+        # The parser peeks at the same position many times; remember the last decoded token.
+        self._head_pos = -1
+        self._head = None
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        kind = self.kinds[i]
+        token = KIND_TOKENS[kind]
+        if token is None:
+            start = self.offsets[i]
+            text = self.source[start : start + self.lengths[i]]
+            interned = self._interned[kind]
+            token = interned.get(text)
+            if token is None:
+                token = interned[text] = _PAYLOAD_CLASSES[kind](text)
+        return token
+
+    def text(self, i):
+        """Source text of the token at position `i` (string literals without quotes)."""
+        start = self.offsets[i]
+        return self.source[start : start + self.lengths[i]]
+
+    def peek(self, default=None):
+        pos = self.pos
+        if pos == self._head_pos:
+            return self._head
+        if pos < self.size:
+            self._head_pos = pos
+            self._head = token = self[pos]
+            return token
+        return default
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        pos = self.pos
+        if pos >= self.size:
+            raise StopIteration
+        self.pos = pos + 1
+        if pos == self._head_pos:
+            return self._head
+        return self[pos]
+
+
+def tokenize(s: str) -> TokenStream:
+    stream = TokenStream(s)
+    add_kind = stream.kinds.append
+    add_offset = stream.offsets.append
+    add_length = stream.lengths.append
+    word_kinds = _WORD_KINDS
+    fixed_kinds = FIXED_KINDS
+    for m in _MASTER_PATTERN.finditer(s):
+        group = m.lastgroup
+        start, end = m.span(group)
+        if group == "WORD":
+            add_kind(word_kinds.get(m.group(group), VAR_KIND))
+        elif group == "OPERATOR" or group == "PUNCTUATION" or group == "SEMICOLON":
+            add_kind(fixed_kinds[m.group(group)])
+        elif group == "NUMBER":
+            add_kind(NUMBER_KIND)
+        elif group == "STRING":
+            add_kind(STRING_KIND)
+            start += 1
+            end -= 1
+        elif group == "FSTRING":
+            add_kind(FSTRING_KIND)
+            start += 1
+            end -= 1
+        elif group == "LINE_COMMENT" or group == "BLOCK_COMMENT" or group == "END":
+            continue
+        elif group == "BAD_OPERATOR":
+            raise SyntaxError("Invalid operator '++'. Did you mean '+'?")
+        elif group == "UNTERMINATED":
+            raise SyntaxError(f"Expected {m.group(group)}")
+        else:
+            raise SyntaxError(f"Unexpected character: {m.group(group)}")
+        add_offset(start)
+        add_length(end - start)
+    stream.size = len(stream.kinds)
+    return stream
+
+
 def lex(s: str) -> Iterator[Token]:
+    return tokenize(s)
+
+
+# ======================================================================================================
+# Original character-at-a-time lexer, kept as the reference implementation that `lex` is
+# checked and benchmarked against.
+def lex_charwise(s: str) -> Iterator[Token]:
     i = 0
     # prev_char = None
     prevToken= None
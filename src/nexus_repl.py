@@ -6,6 +6,7 @@ import os
 from lexer import lex
 from parser import parse, VarBind
 from evaluator import e
+from resolver import resolve
 from scope import SymbolTable
 
 class NexusREPL:
@@ -90,7 +91,7 @@ class NexusREPL:
             if self.is_balanced(code) and code.strip().endswith((";", "}")):
                 try:
                     # Attempt to parse and evaluate
-                    ast, self.global_scope = parse(code, self.global_scope)
+                    ast, self.global_scope = resolve(*parse(code, self.global_scope))
                     result = e(ast, self.global_scope)
                     # Success - make sure we return a non-None value to reset prompt
                     return result if result is not None else ""
@@ -105,7 +106,7 @@ class NexusREPL:
                     raise  # Re-raise other errors
             
             # Try normal parsing for other cases
-            ast, self.global_scope = parse(code, self.global_scope)
+            ast, self.global_scope = resolve(*parse(code, self.global_scope))
             result = e(ast, self.global_scope)
             return result
                 
@@ -158,7 +159,7 @@ class NexusREPL:
                     if self.is_balanced(full_code):
                         # Force evaluation of potentially complete input
                         try:
-                            ast, self.global_scope = parse(full_code, self.global_scope)
+                            ast, self.global_scope = resolve(*parse(full_code, self.global_scope))
                             result = e(ast, self.global_scope)
                             current_input = []
                             prompt = "nexus> "
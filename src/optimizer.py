@@ -0,0 +1,880 @@
+"""
+AST-level optimizations, run on a parsed program before it is evaluated or compiled.
+
+`optimize` rewrites the tree in place (function bodies are shared with the symbol tables, so
+nodes are never rebuilt, only their children replaced):
+
+- constant folding: operators, unary operators and math calls whose operands are literals
+  become a single `Number`, `String` or `Boolean`;
+- inlining: calls of small non-recursive functions become a copy of the function body;
+- `fixed var` propagation: a fixed binding with a literal value replaces later reads of it;
+- strength reduction: `floor(a / b)` and small powers of integer-typed values become `//` and
+  multiplications;
+- common subexpressions: an indexing or `.Length` read again before anything could change it
+  is computed once;
+- loop-invariant code motion: expressions a loop does not change are computed before it;
+- dead branches: the branch of an `if` and the body of a `while` a literal condition rules out
+  are dropped (bytecode_opt.py removes the remaining dead code after code generation);
+- tail calls: calls whose value the calling function returns as it is are marked, so both
+  engines run them without keeping the caller's frame.
+- types: bindings whose value has a type proven from the declared dtypes are marked, so both
+  engines skip the casts and type checks the proof makes unnecessary.
+
+Anything that would raise when folded (division by zero, the `**` rules of the evaluator,
+`ascii` of a number, ...) is left alone, so the error still surfaces at run time.
+"""
+import math
+import operator
+import itertools
+from copy import deepcopy
+from dataclasses import fields
+from resolver import children
+from scope import SymbolTable
+from parser import (AST, Number, String, Boolean, Variable, BinOp, UnaryOp, MathFunction, VarBind,
+                    UpdateVar, CompoundAssignment, If, WhileLoop, ForLoop, Repeat, Statements, FuncDef,
+                    FuncCall, Return, Break, BreakOut, MoveOn, CallArr, PropertyAccess, PushFront,
+                    PushBack, PopFront, PopBack, AssigntoArr, AddHashPair, RemoveHashPair, AssignHashVal,
+                    InsertAt, RemoveAt, ClearArray, AssignStringVal, Sort, GetLength, Array, Hash,
+                    FormatString, Feed, TypeOf, TypeCast, SymbolCategory)
+
+MAX_INT_BITS = 128     # folded literals stay small, like CPython's own constant folding
+MAX_STR_LENGTH = 4096
+INLINE_MAX_COST = 16   # AST nodes in a function body worth copying into each of its call sites
+
+
+def _power(base, exponent):
+    # the rules of BinOp("**") in evaluator.py
+    if base == 0 and exponent < 0:
+        raise ValueError("Math error: Zero cannot be raised to a negative power.")
+    if base < 0 and not float(exponent).is_integer():
+        raise ValueError("Math error: Negative numbers cannot be raised to a decimal power.")
+    return base ** exponent
+
+
+BINARY = {
+    "+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv,
+    "÷": operator.truediv, "//": operator.floordiv, "%": operator.mod, "**": _power,
+    "<": operator.lt, ">": operator.gt, "==": operator.eq, "!=": operator.ne,
+    "<=": operator.le, ">=": operator.ge,
+    "and": lambda a, b: a and b, "or": lambda a, b: a or b,
+    "&": operator.and_, "|": operator.or_, "^": operator.xor,
+    "<<": operator.lshift, ">>": operator.rshift,
+}
+
+UNARY = {
+    "+": operator.pos, "-": operator.neg, "~": operator.invert,
+    "not": operator.not_, "!": operator.not_, "ascii": ord, "char": chr,
+}
+
+MATH = {  # the MathFunction cases of evaluator.py that take plain numbers
+    "abs": math.fabs, "round": lambda x, digits=0: round(x, digits), "ceil": math.ceil,
+    "floor": math.floor, "truncate": math.trunc, "sqrt": math.sqrt, "cbrt": lambda x: x ** (1 / 3),
+    "pow": math.pow, "exp": math.exp, "log": math.log, "log10": math.log10, "log2": math.log2,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan, "asin": math.asin, "acos": math.acos,
+    "atan": math.atan, "atan2": math.atan2, "sinh": math.sinh, "cosh": math.cosh,
+    "tanh": math.tanh, "asinh": math.asinh, "acosh": math.acosh, "atanh": math.atanh,
+    "PI": lambda: math.pi, "E": lambda: math.e,
+}
+
+# nodes an inlined body may consist of: expressions that neither write, print nor call
+PURE = (Number, String, Boolean, Variable, BinOp, UnaryOp, MathFunction, CallArr)
+
+# nodes that change an array, string or hash in place (arrays are shared by reference)
+MUTATORS = (PushFront, PushBack, PopFront, PopBack, AssigntoArr, AddHashPair, RemoveHashPair,
+            AssignHashVal, InsertAt, RemoveAt, ClearArray, AssignStringVal, Sort)
+
+# calls the evaluator or the VM sends to a built-in before looking for a user function
+BUILTIN_CALLS = {"sort", "lower", "upper", "reverse", "unique", "so", "num", "cat", "length", "typeof"}
+BUILTIN_PREFIXES = ("array_", "string_", "hash_", "math_", "format_string_", "obj_", "type_check")
+
+# the type a value declared with each dtype has once both engines have cast it
+DTYPES = {"integer": int, "uinteger": int, "decimal": float, "string": str, "boolean": bool,
+          "array": list, "Hash": dict}
+
+# the type of the value of each math function, whatever its arguments (or an error)
+MATH_TYPES = {**dict.fromkeys(("floor", "ceil", "truncate"), int),
+              **dict.fromkeys(("abs", "sqrt", "pow", "exp", "log", "log10", "log2", "sin", "cos", "tan",
+                               "asin", "acos", "atan", "atan2", "sinh", "cosh", "tanh", "asinh", "acosh",
+                               "atanh", "PI", "E"), float)}
+
+# value types a `fixed var` of each declared type holds unchanged (no typecast needed)
+FIXED_TYPES = {None: (int, float, str, bool), "integer": (int,), "decimal": (float,),
+               "string": (str,), "boolean": (bool,)}
+
+
+def is_literal(node):
+    return isinstance(node, (Number, String, Boolean))
+
+
+def val_of(literal_node):
+    return literal_node.value if isinstance(literal_node, Number) else literal_node.val
+
+
+def literal(value):
+    """Literal node for a folded value, or None if the value has no literal form."""
+    if isinstance(value, bool) or value is None:
+        return Boolean(value)
+    if isinstance(value, int):
+        return Number.of(value) if value.bit_length() <= MAX_INT_BITS else None
+    if isinstance(value, float):
+        return Number.of(value)
+    if isinstance(value, str):
+        return String(value) if len(value) <= MAX_STR_LENGTH else None
+    return None
+
+
+def _too_big(op, a, b):
+    # refuse to build huge values at compile time; the program may never get there
+    if op == "**" and type(a) is int and type(b) is int and abs(a) > 1 and b > 0:
+        return b * abs(a).bit_length() > MAX_INT_BITS
+    if op == "<<" and type(b) is int:
+        return b > MAX_INT_BITS
+    if op == "*" and isinstance(a, str) != isinstance(b, str):
+        count = b if isinstance(a, str) else a
+        return type(count) is int and count * len(a if isinstance(a, str) else b) > MAX_STR_LENGTH
+    return False
+
+
+def fold(root):
+    """`root` with every constant subexpression below it folded into a literal."""
+    return rewrite(root, fold_node)
+
+
+def rewrite(root, fn):
+    """`root` with every node below it replaced by `fn(node)`, children before their parents."""
+    # without recursion: operator chains nest deeper than Python allows
+    order = list(walk(root))
+    folded = {}  # id(node) -> its replacement
+    for node in reversed(order):
+        for f in fields(node):
+            value = getattr(node, f.name)
+            if isinstance(value, (AST, list, tuple)):
+                setattr(node, f.name, _replace(value, folded))
+        folded[id(node)] = fn(node)
+    return folded[id(root)]
+
+
+def walk(root):
+    """`root` and every node below it, each parent before its children."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(children(node))
+
+
+def _replace(value, folded):
+    if isinstance(value, AST):
+        return folded.get(id(value), value)
+    if isinstance(value, list):
+        value[:] = [_replace(item, folded) for item in value]
+        return value
+    if isinstance(value, tuple):
+        return tuple(_replace(item, folded) for item in value)
+    return value
+
+
+def fold_node(node):
+    """A literal for `node` if its operands are literals and it can be computed, else `node`
+    itself, with any branch its literal condition rules out dropped."""
+    match node:
+        case BinOp(op, l, r) if op in BINARY and is_literal(l) and is_literal(r):
+            if _too_big(op, val_of(l), val_of(r)):
+                return node
+            return _compute(node, BINARY[op], l, r)
+        case UnaryOp(op, val) if op in UNARY and is_literal(val):
+            return _compute(node, UNARY[op], val)
+        case MathFunction(name, args) if name in MATH and all(isinstance(arg, Number) for arg in args):
+            return _compute(node, MATH[name], *args)
+        case If(c, _, _, _) if is_literal(c):
+            # the node stays (it still opens a scope and yields None), the branch that cannot run goes
+            if val_of(c):
+                node.e = None
+            else:
+                node.t = Statements([])
+        case WhileLoop(c, _, _) if is_literal(c) and not val_of(c):
+            node.body = Statements([])
+    return node
+
+
+def _compute(node, fn, *operands):
+    try:
+        folded = literal(fn(*(val_of(x) for x in operands)))
+    except Exception:
+        return node  # let it fail at run time, where the program reaches it
+    return folded if folded is not None else node
+
+
+def written_names(root):
+    """Count, per name, the nodes that bind or modify a variable of that name."""
+    counts = {}
+    for node in walk(root):
+        match node:
+            case FuncDef(name, params, _, _):
+                for target in [name] + [param[0] for param in params]:
+                    counts[target] = counts.get(target, 0) + 1
+            case Variable():
+                pass
+            case _:
+                # VarBind and UpdateVar, but also every in-place array/string/hash operation
+                # (and, conservatively, the reads among them that name their operand)
+                target = getattr(node, "var_name", None) or getattr(node, "xname", None) or getattr(node, "name", None)
+                if target is not None:
+                    counts[target] = counts.get(target, 0) + 1
+    return counts
+
+
+def propagate(node, constants, writes):
+    """
+    Replace reads of fixed variables in `constants` ({name: value}) below `node`.
+
+    Walks statement lists in order, so a binding only reaches the statements after it in its
+    own block and the blocks nested there, never function bodies, which may run before it.
+    """
+    match node:
+        case Variable(name) if name in constants:
+            return literal(constants[name])
+        case FuncDef():
+            constants = {}
+        case Statements(statements):
+            constants = dict(constants)  # bindings made in the block end with it
+            for i, stmt in enumerate(statements):
+                if isinstance(stmt, AST):  # the parser leaves None for an empty statement
+                    statements[i] = stmt = propagate(stmt, constants, writes)
+                match stmt:
+                    case VarBind(name, dtype, val, SymbolCategory.FIXED) if (
+                        writes.get(name) == 1 and is_literal(val)
+                        and type(val_of(val)) in FIXED_TYPES.get(dtype, ())
+                    ):
+                        constants[name] = val_of(val)
+            return node
+    for f in fields(node):
+        value = getattr(node, f.name)
+        if isinstance(value, AST):
+            setattr(node, f.name, propagate(value, constants, writes))
+        elif isinstance(value, list):
+            value[:] = [propagate(item, constants, writes) if isinstance(item, AST) else item for item in value]
+    return node
+
+
+def inline(root):
+    """
+    Replace calls of small functions by their bodies, with the arguments substituted.
+
+    A function qualifies when it is declared once, at the top level of the program, is never
+    used as a value, and its body is a single expression of at most `INLINE_MAX_COST` nodes
+    that reads only its parameters (so it cannot call anything, itself included). Only calls
+    after the declaration are inlined: before it the VM has not bound the name yet.
+    """
+    if not isinstance(root, Statements):
+        return root
+    writes = written_names(root)
+    values = {node.var_name for node in walk(root) if isinstance(node, Variable)}
+    inlinable = {}
+
+    def inline_call(node):
+        if isinstance(node, FuncCall) and isinstance(node.funcName, str) and node.funcName in inlinable:
+            return _expand(inlinable[node.funcName], node)
+        return node
+
+    for i, stmt in enumerate(root.statements):
+        if not isinstance(stmt, AST):
+            continue
+        root.statements[i] = stmt = rewrite(stmt, inline_call)
+        if isinstance(stmt, FuncDef) and writes.get(stmt.funcName) == 1 and stmt.funcName not in values:
+            body = _inline_body(stmt)
+            if body is not None:
+                inlinable[stmt.funcName] = body
+    return root
+
+
+def _inline_body(fn):
+    """(params, body expression, {param: uses}, params read only under and/or) if `fn` may be inlined."""
+    name, params, body = fn.funcName, [param[0] for param in fn.funcParams], fn.funcBody.statements
+    if name in BUILTIN_CALLS or name.startswith(BUILTIN_PREFIXES) or len(body) != 1 or len(set(params)) != len(params):
+        return None
+    expr = body[0]
+    nodes = list(walk(expr)) if isinstance(expr, AST) else []
+    if not nodes or len(nodes) > INLINE_MAX_COST or not all(isinstance(node, PURE) for node in nodes):
+        return None
+    uses = dict.fromkeys(params, 0)
+    for node in nodes:
+        read = node.var_name if isinstance(node, Variable) else node.xname if isinstance(node, CallArr) else None
+        if read is not None:
+            if read not in uses:
+                return None  # a free name would be looked up from the call site instead
+            uses[read] += 1
+    conditional = {node.var_name for op in nodes if isinstance(op, BinOp) and op.op in ("and", "or")
+                   for node in walk(op.right) if isinstance(node, Variable)}
+    return params, expr, uses, conditional
+
+
+def _expand(inlinable, call):
+    """The body of an inlinable function for `call`, or `call` if an argument rules it out."""
+    params, expr, uses, conditional = inlinable
+    args = call.funcArgs
+    if len(args) != len(params):
+        return call
+    for param, arg in zip(params, args):
+        if uses[param] == 0:
+            return call  # the argument must still be evaluated
+        if isinstance(arg, (Number, String, Boolean, Variable)):
+            continue
+        # anything else is evaluated once, before the body: only move it where that still holds
+        if uses[param] > 1 or param in conditional or not all(isinstance(node, PURE) for node in walk(arg)):
+            return call
+    bound = dict(zip(params, args))
+    for node in walk(expr):
+        if isinstance(node, CallArr) and not isinstance(bound[node.xname], Variable):
+            return call  # an indexed parameter needs a variable to index
+
+    def substitute(node):
+        if isinstance(node, Variable):
+            return deepcopy(bound[node.var_name])
+        if isinstance(node, CallArr):
+            node.xname = bound[node.xname].var_name
+        return node
+
+    return rewrite(deepcopy(expr), substitute)
+
+
+def hoist(root, tS):
+    """
+    Loop-invariant code motion: compute expressions a loop does not change once, before it.
+
+    An expression is invariant in a `while`, `for` or `repeat` loop when it only reads
+    (operators, math functions, indexing, `.Length`) names the loop never assigns, and the
+    loop calls no function that could assign them. It moves to a fresh variable bound right
+    before the loop, in the enclosing block:
+
+    - from the condition as it is, since the condition is always evaluated at least once;
+    - from the part of the body every iteration runs (the statements before any `break` or
+      `continue`, outside `if` branches and inner loops) only under the loop's entry test,
+      `if <first condition> then <expr> else None end`, so it is not evaluated (and cannot
+      fail) when the loop never runs. That part ends at the first statement doing more than
+      assign variables (output, input, a change to an array, string or hash): an expression
+      failing after it in the loop must not fail before it has run.
+
+    Inner loops go first; what they hoist into the outer body may then move further out.
+    """
+    names = (f"$loop{n}" for n in itertools.count())  # `$` cannot start a user identifier
+    for block, scope in reversed(blocks(root, tS)):  # inner blocks first
+        hoisted = []
+        for stmt in block.statements:
+            if isinstance(stmt, (WhileLoop, ForLoop, Repeat)):
+                hoisted.extend(_hoist_loop(stmt, scope, names))
+            hoisted.append(stmt)
+        block.statements[:] = hoisted
+    return root
+
+
+def blocks(root, tS):
+    """Every statement list below `root` with the scope it runs in, each before those nested in it."""
+    found = []
+    stack = [(root, tS)]
+    while stack:
+        node, scope = stack.pop()
+        if isinstance(node, Statements):
+            found.append((node, scope))
+        match node:
+            case If(_, _, _, inner) | WhileLoop(_, _, inner) | ForLoop(_, _, _, _, inner) | Repeat(_, _, inner):
+                scope = inner
+            case FuncDef(_, _, _, inner):
+                scope = inner
+        stack.extend((child, scope) for child in children(node))
+    return found
+
+
+def _hoist_loop(loop, scope, names):
+    """Bindings to put before `loop`, evaluated in `scope`; `loop` is rewritten to read them."""
+    nodes = list(walk(loop))
+    if any(isinstance(node, (FuncCall, FuncDef, Return)) for node in nodes):
+        return []  # a function may assign anything
+    assigned = set()
+    mutates = False
+    for node in nodes:
+        if isinstance(node, (VarBind, UpdateVar, CompoundAssignment)):
+            assigned.add(node.var_name)
+        elif isinstance(node, MUTATORS) or isinstance(node, PropertyAccess) and not _is_length(node):
+            assigned.add(getattr(node, "var_name", None) or getattr(node, "xname", None) or node.name)
+            mutates = True
+
+    def invariant(node):
+        if not _pure_read(node):
+            return False
+        name = _read_name(node)
+        if name is not None and name in assigned:
+            return False
+        return not (mutates and isinstance(node, (CallArr, PropertyAccess)))
+
+    match loop:
+        case WhileLoop(cond, body, inner):
+            always, guard = [cond], cond
+        case ForLoop(init, cond, _, body, inner):
+            always, guard = [cond], _first_test(init, cond)
+        case Repeat(times, body, inner):
+            always, guard = [], BinOp(">", times, Number("0"))
+    every_iteration = []
+    for stmt in body.statements if isinstance(body, Statements) else [body]:
+        if not isinstance(stmt, AST):
+            continue
+        if any(isinstance(node, (Break, BreakOut, MoveOn)) for node in walk(stmt)):
+            break
+        every_iteration.append(stmt)
+        if not _quiet(stmt):
+            break  # what follows must not fail before it has had its effect
+
+    bindings, replacements, hoisted = [], {}, []  # hoisted: [(expression, name)]
+    for region, guarded in ((always, False), (every_iteration, True)):
+        for expr in _invariant_parts(region, invariant):
+            name = next((name for seen, name in hoisted if seen == expr), None)
+            if name is None:
+                value = expr
+                if guarded:
+                    if guard is None or not all(_pure_read(node) for node in walk(guard)) or any(
+                        inner.inScope(_read_name(node)) for node in walk(guard) if _read_name(node)
+                    ):
+                        continue  # cannot tell beforehand whether the body runs
+                    test = fold(deepcopy(guard))
+                    if is_literal(test) and not val_of(test):
+                        continue  # the body never runs
+                    if not is_literal(test):
+                        value = If(test, expr, Boolean(None), SymbolTable(parent=scope))
+                name = next(names)
+                scope.define(name, None, SymbolCategory.VARIABLE)
+                bindings.append(VarBind(name, None, value, SymbolCategory.VARIABLE))
+                hoisted.append((expr, name))
+            replacements[id(expr)] = Variable(name)
+    if replacements:
+        rewrite(loop, lambda node: replacements.get(id(node), node))
+    return bindings
+
+
+def _is_length(node):
+    return node.operation == "Length" and not node.args
+
+
+def _pure_read(node):
+    return isinstance(node, PURE) or isinstance(node, PropertyAccess) and _is_length(node)
+
+
+def _quiet(stmt):
+    """Whether `stmt` has no effect but on variables: no output, input, call or in-place change."""
+    return all(isinstance(node, (VarBind, UpdateVar, CompoundAssignment)) or _pure_read(node)
+               for node in walk(stmt))
+
+
+def _read_name(node):
+    if isinstance(node, (Variable, PropertyAccess)):
+        return node.var_name
+    if isinstance(node, CallArr):
+        return node.xname
+    return None
+
+
+def _first_test(init, cond):
+    """`cond` as first evaluated, right after `init` (`var i = start` or `i = start`), or None."""
+    if not isinstance(init, (VarBind, UpdateVar)) or not all(_pure_read(node) for node in walk(init.val)):
+        return None
+    start = init.val
+    return rewrite(deepcopy(cond), lambda node: deepcopy(start)
+                   if isinstance(node, Variable) and node.var_name == init.var_name else node)
+
+
+def _invariant_parts(region, invariant):
+    """The largest invariant expressions below `region` that compute something."""
+    parts = []
+    for root in region:
+        if not isinstance(root, AST):
+            continue
+        order = list(walk(root))
+        whole = {}  # id(node) -> its subtree is invariant
+        for node in reversed(order):
+            whole[id(node)] = invariant(node) and all(whole[id(child)] for child in children(node))
+
+        def part(node):
+            return whole[id(node)] and not isinstance(node, (Variable, Number, String, Boolean))
+
+        parts.extend(node for node in evaluated(root, stop=part) if part(node))
+    return parts
+
+
+def evaluated(root, stop=lambda node: False):
+    """
+    The nodes below `root` evaluated whenever `root` is: not the branches of an `if`, the
+    bodies of loops or functions, or the right operand of `and`/`or`. Nodes `stop` accepts are
+    yielded but not entered.
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        if stop(node):
+            continue
+        match node:
+            case If(c, _, _, _) | WhileLoop(c, _, _):
+                stack.append(c)
+            case ForLoop() | Repeat() | FuncDef():
+                pass
+            case BinOp("and" | "or", left, _):
+                stack.append(left)
+            case _:
+                stack.extend(children(node))
+
+
+def share_accesses(root, tS):
+    """
+    Common-subexpression elimination for collection reads: an indexing `a[i]...` or an
+    `a.Length` a block evaluates more than once is computed once, into a fresh variable bound
+    right before the statement that first evaluates it, and read from there on.
+
+    The variable stands in until a statement could change the value: one that assigns or
+    declares a name the access reads, calls or defines a function, or changes any array,
+    string or hash in place (arrays are shared by reference, so a write through another name
+    may reach the same one). Accesses that only share their leading indices share those:
+    `m[i][0]` and `m[i][1]` become `$cse0[0]` and `$cse0[1]` after `var $cse0 = m[i]`.
+    """
+    names = (f"$cse{n}" for n in itertools.count())
+    for block, scope in blocks(root, tS):
+        statements = block.statements
+        i = 0
+        while i < len(statements):
+            binding = _share_access(statements, i, scope, names)
+            if binding is not None:
+                statements.insert(i, binding)  # and look at the statement again, one further down
+            i += 1
+    return root
+
+
+def _share_access(statements, i, scope, names):
+    """A binding for an access `statements[i]` evaluates and that is evaluated again, or None."""
+    stmt = statements[i]
+    if not isinstance(stmt, AST):
+        return None
+    for access in evaluated(stmt, stop=_is_access):
+        if not _is_access(access) or not all(_pure_read(node) for node in walk(access)):
+            continue
+        reads = {_read_name(node) for node in walk(access)} - {None}
+        if _changes(stmt, reads):
+            continue
+        uses = [stmt]
+        for later in statements[i + 1:]:
+            if isinstance(later, AST):
+                if _changes(later, reads):
+                    break
+                uses.append(later)
+        # the longest run of leading indices that is read again
+        for shared in range(len(access.index), 0, -1) if isinstance(access, CallArr) else [None]:
+            found = [node for use in uses for node in walk(use) if _same_access(node, access, shared)]
+            if len(found) > 1:
+                break
+        else:
+            continue
+        name = next(names)
+        value = deepcopy(access if shared is None else CallArr(access.xname, access.index[:shared]))
+        targets = {id(node) for node in found}
+
+        def replace(node):
+            if id(node) not in targets:
+                return node
+            if shared is None or len(node.index) == shared:
+                return Variable(name)
+            return CallArr(name, node.index[shared:])
+
+        for use in uses:
+            rewrite(use, replace)
+        scope.define(name, None, SymbolCategory.VARIABLE)
+        return VarBind(name, None, value, SymbolCategory.VARIABLE)
+    return None
+
+
+def _is_access(node):
+    return isinstance(node, CallArr) and isinstance(node.index, list) or isinstance(node, PropertyAccess) and _is_length(node)
+
+
+def _same_access(node, access, shared):
+    if shared is None:
+        return node == access
+    return (isinstance(node, CallArr) and node.xname == access.xname and isinstance(node.index, list)
+            and node.index[:shared] == access.index[:shared])
+
+
+def _changes(stmt, names):
+    """Whether running `stmt` may change the value of an access reading `names`."""
+    for node in walk(stmt):
+        if isinstance(node, (FuncCall, FuncDef, MUTATORS)):
+            return True
+        if isinstance(node, PropertyAccess) and not _is_length(node):
+            return True
+        if isinstance(node, (VarBind, UpdateVar, CompoundAssignment)) and node.var_name in names:
+            return True
+    return False
+
+
+def name_types(root):
+    """
+    {name: type} of the names that provably only ever hold values of one type, `int`, `float`,
+    `str`, `bool`, `list` or `dict`: every binding of the name anywhere below `root` stores one.
+    A `var` with a dtype stores what its cast makes; any other `var`, assignment or compound
+    assignment must store an expression of that type, and in-place operations keep the type of
+    an array, string or hash. Parameters and functions are never typed, anything may arrive.
+    """
+    bindings, excluded, first = [], set(), {}
+    for node in walk(root):
+        match node:
+            case VarBind(name, _, _, _):
+                bindings.append(node)
+                first.setdefault(name, node)
+            case UpdateVar() | CompoundAssignment():
+                bindings.append(node)
+            case FuncDef(name, params, _, _):
+                excluded.update([name] + [param[0] for param in params])
+            case _ if isinstance(node, MUTATORS) or isinstance(node, PropertyAccess) and not _is_length(node):
+                bindings.append(node)
+    # a first guess from the first `var` of each name, each guess typing more values
+    types = {}
+    while True:
+        known = _types_below(root, types)
+        guessed = {name: _stored_type(node, known, types) for name, node in first.items()
+                   if name not in types and name not in excluded}
+        guessed = {name: t for name, t in guessed.items() if t is not None}
+        if not guessed:
+            break
+        types.update(guessed)
+    changed = True
+    while changed:  # a binding storing anything else disqualifies its name, and what was typed from it
+        changed = False
+        known = _types_below(root, types)
+        for node in bindings:
+            name = _target(node)
+            if name in types and _stored_type(node, known, types) is not types[name]:
+                del types[name]
+                changed = True
+    return types
+
+
+def type_of(node, types):
+    """The type `node` always evaluates to, given the `types` of names (see `name_types`), or None."""
+    return _types_below(node, types)[id(node)]
+
+
+def _types_below(root, types):
+    """{id(node): type or None} for `root` and every node below it."""
+    known = {}
+    for node in reversed(list(walk(root))):  # children first
+        known[id(node)] = _type(node, known, types)
+    return known
+
+
+def _type(node, known, types):
+    match node:
+        case Number():
+            return type(node.value)
+        case String() | FormatString() | Feed() | TypeOf():
+            return str
+        case Boolean(b):
+            return bool if isinstance(b, bool) else None
+        case Array():
+            return list
+        case Hash():
+            return dict
+        case Variable(name):
+            return types.get(name)
+        case TypeCast(dtype, _):
+            return DTYPES.get(dtype)
+        case VarBind() | UpdateVar() | CompoundAssignment():
+            return _stored_type(node, known, types)
+        case BinOp(op, left, right):
+            return _binary_type(op, known[id(left)], known.get(id(right)), right)
+        case UnaryOp(op, val):
+            return _unary_type(op, known[id(val)])
+        case MathFunction(name, _):
+            return MATH_TYPES.get(name)
+        case PropertyAccess(name, _, _) if _is_length(node):
+            return int if types.get(name) in (list, str, dict) else None
+        case GetLength(name):
+            return int if types.get(name) in (list, str) else None
+        case CallArr(name, [_]) if types.get(name) is str:
+            return str  # a character
+    return None
+
+
+def _binary_type(op, a, b, right):
+    if op in ("<", ">", "==", "!=", "<=", ">=", "not"):
+        return bool
+    if op == "~":
+        return int if a is int else None
+    if a is None or b is None:
+        return None
+    numbers = a in (int, float) and b in (int, float)
+    match op:
+        case "and" | "or":
+            return a if a is b else None
+        case "&" | "|" | "^":
+            return a if a is b and a in (int, bool) else None
+        case "<<" | ">>":
+            return int if a is b is int else None
+        case "+" | "-" | "*" | "//" | "%" if numbers:
+            return int if a is b is int else float
+        case "+" if a is b and a in (str, list):
+            return a
+        case "*" if {a, b} in ({str, int}, {list, int}):
+            return a if a is not int else b
+        case "/" | "÷" if numbers:
+            return float
+        case "**" if a is b is int:
+            # a negative exponent gives a float
+            return int if isinstance(right, Number) and right.value >= 0 else None
+        case "**" if a is float and b is int:
+            return float
+    return None
+
+
+def _unary_type(op, a):
+    match op:
+        case "+" | "-":
+            return a if a in (int, float) else None
+        case "~":
+            return int if a is int else None
+        case "not" | "!":
+            return bool
+        case "ascii":
+            return int
+        case "char":
+            return str
+    return None
+
+
+def _target(node):
+    return getattr(node, "var_name", None) or getattr(node, "xname", None) or getattr(node, "name", None)
+
+
+def _stored_type(node, known, types):
+    """The type of the value the binding or in-place operation `node` leaves in its name, or None."""
+    match node:
+        case VarBind(_, dtype, val, _):
+            return DTYPES.get(dtype) if dtype is not None else known.get(id(val))
+        case UpdateVar(_, val):
+            return known.get(id(val))
+        case CompoundAssignment(name, op, val):
+            # both engines compute `name op[0] val`
+            return _binary_type(op[0], types.get(name), known.get(id(val)), val)
+    kept = types.get(_target(node))
+    return kept if kept in (list, str, dict) else None
+
+
+def annotate_types(root):
+    """
+    Record what `name_types` proves on the bindings below `root`, for the engines to skip the
+    run-time checks it makes unnecessary:
+
+    - `VarBind.cast` is cleared when the value already has the declared type (or there is
+      none), so neither the evaluator nor the VM casts it;
+    - `vtype` of a `VarBind`, `UpdateVar` or `CompoundAssignment` is the type of the value it
+      stores: the evaluator takes the runtime category from it instead of inspecting the
+      value.
+
+    The operators themselves stay generic: Python's own `+`, `<`, ... already dispatch on the
+    operand types, so a typed instruction would only add a case to the VM's dispatch.
+    """
+    types = name_types(root)
+    known = _types_below(root, types)
+    for node in walk(root):
+        match node:
+            case VarBind(_, dtype, val, _):
+                node.vtype = _stored_type(node, known, types)
+                if dtype == "uinteger":  # the cast also takes the absolute value
+                    node.cast = not (isinstance(val, Number) and type(val.value) is int and val.value >= 0)
+                else:
+                    node.cast = dtype is not None and known.get(id(val)) is not DTYPES.get(dtype)
+            case UpdateVar() | CompoundAssignment():
+                node.vtype = _stored_type(node, known, types)
+    return root
+
+
+def reduce_strength(root):
+    """
+    Replace arithmetic on integers by cheaper operations that give the same result:
+
+    - `floor(a / b)` (or `÷`) becomes `a // b`, one operator instead of a float division and a
+      math call, when `a` is provably below 2**53 in magnitude: the float quotient then never
+      rounds across an integer, while past it `floor(a / b)` and `a // b` part ways;
+    - `x ** 2` and `x ** 3` of a variable become `x * x` and `x * x * x`, skipping the checks
+      of `**`.
+
+    `x % 2**k` and `x * 2**k` stay as they are: both engines dispatch `%` and `*` before the
+    bitwise operators, so a mask or a shift would cost more than it saves.
+    """
+    types = name_types(root)
+
+    def reduce(node):
+        match node:
+            case MathFunction("floor", [BinOp("/" | "÷", left, right)]) if (
+                type_of(left, types) is int and type_of(right, types) is int
+                and _magnitude(left) < 2 ** 53
+            ):
+                return BinOp("//", left, right)
+            case BinOp("**", Variable(name) as base, Number() as exponent) if (
+                types.get(name) is int and type(exponent.value) is int and exponent.value in (2, 3)
+            ):
+                product = base
+                for _ in range(exponent.value - 1):
+                    product = BinOp("*", product, deepcopy(base))
+                return product
+        return node
+
+    return rewrite(root, reduce)
+
+
+def _magnitude(node):
+    """A bound on the absolute value of the integer expression `node`, inf when there is none."""
+    match node:
+        case Number() if type(node.value) is int:
+            return abs(node.value)
+        case UnaryOp("-" | "+", operand):
+            return _magnitude(operand)
+        case BinOp("%", _, Number() as modulus) if type(modulus.value) is int and modulus.value:
+            return abs(modulus.value) - 1
+        case BinOp("+" | "-", left, right):
+            return _magnitude(left) + _magnitude(right)
+        case BinOp("*", left, right):
+            return _magnitude(left) * _magnitude(right)
+    return math.inf
+
+
+def mark_tail_calls(root):
+    """
+    Set `tail` on every call a function makes in tail position: the last statement of its
+    body, the branches of an `if` in tail position, and the value of a `return`. Nothing runs
+    in the function after such a call, so the evaluator hands it back to the call it is in and
+    the VM jumps into it in place (see `FuncCall` in evaluator.py and `I.TAIL_CALL`).
+    """
+    for fn in walk(root):
+        if not isinstance(fn, FuncDef):
+            continue
+        tails = [fn.funcBody]
+        stack = [fn.funcBody]
+        while stack:  # the function's own returns; nested functions get theirs from the outer loop
+            node = stack.pop()
+            if isinstance(node, Return):
+                tails.append(node.value)
+            if not isinstance(node, FuncDef):
+                stack.extend(children(node))
+        while tails:
+            match tails.pop():
+                case FuncCall() as call:
+                    call.tail = True
+                case Statements([*_, last]):
+                    tails.append(last)
+                case If(_, then_body, else_body, _):
+                    tails.extend(body for body in (then_body, else_body) if body is not None)
+    return root
+
+
+def optimize(ast, tS):
+    """Optimize the program `ast`, parsed in global scope `tS`, in place; returns `(ast, tS)`."""
+    ast = inline(fold(ast))
+    writes = written_names(ast)
+    # folding exposes fixed values, propagating them exposes more folding
+    ast = share_accesses(reduce_strength(fold(propagate(ast, {}, writes))), tS)
+    return annotate_types(mark_tail_calls(hoist(ast, tS))), tS
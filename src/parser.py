@@ -1,5 +1,5 @@
-from more_itertools import peekable
 from typing import Optional, Any, List,Tuple
+from dataclasses import field
 from pprint import pprint
 from lexer import *
 from scope import SymbolTable, SymbolCategory, map_type_to_enum
@@ -18,10 +18,11 @@ class AST:
     Abstract Syntax Tree (AST) class.
 
     This class represents the abstract syntax tree used in the compiler.
-    It serves as a base class for all nodes in the AST.
+    It serves as a base class for all nodes in the AST. Nodes are slotted dataclasses: no
+    per-node `__dict__`, so a tree costs a fraction of the memory and attribute access is faster.
     """
 
-    pass
+    __slots__ = ()
 
 class ABT: #unused for the time being
     """
@@ -33,177 +34,201 @@ class ABT: #unused for the time being
     """
     pass
 
-@dataclass
+@dataclass(slots=True)
 class VarBind(AST): # for variable binding
     var_name: str
     dtype: Optional[str]
     val: AST
     category : SymbolCategory
+    # set by optimizer.annotate_types: whether the value still needs casting to `dtype`, and
+    # the type of the value stored, if proven
+    cast: bool = field(default=True, init=False, repr=False, compare=False)
+    vtype: Optional[type] = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class Variable(AST):
     var_name: str
+    # static (depth, slot) address of the variable, filled in by resolver.py
+    depth: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    slot: Optional[int] = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class BinOp(AST):
     op: str
     left: AST
     right: AST
 
-@dataclass
+@dataclass(slots=True)
 class UnaryOp(AST):
     op: str
     val: AST
 
-@dataclass
+@dataclass(slots=True)
 class CallArr(AST):
     xname: str
     index: AST
 
-@dataclass
+@dataclass(slots=True)
 class PushFront(AST):
     xname: str
     val: AST
 
-@dataclass
+@dataclass(slots=True)
 class PushBack(AST):
     xname: str
     val: AST
 
-@dataclass
+@dataclass(slots=True)
 class PopFront(AST):
     xname: str
 
-@dataclass
+@dataclass(slots=True)
 class PopBack(AST):
     xname: str
 
-@dataclass
+@dataclass(slots=True)
 class AssigntoArr(AST):
     xname: str
     index: AST
     val: AST
 
-@dataclass
+@dataclass(slots=True)
 class Array(AST):
     val : List[AST]
 
-@dataclass
+@dataclass(slots=True)
 class Hash(AST):
     val: List[Tuple[AST]]
 
-@dataclass
+@dataclass(slots=True)
 class CallHashVal(AST):
     name: str
     key : AST
 
-@dataclass 
+@dataclass(slots=True)
 class AddHashPair(AST):
     name: str
     key: AST
     val: AST
 
-@dataclass
+@dataclass(slots=True)
 class RemoveHashPair(AST):
     name: str
     key : AST
 
-@dataclass
+@dataclass(slots=True)
 class AssignHashVal(AST):
     name: str
     key : AST
     new_val: AST
 
 
-@dataclass
+@dataclass(slots=True)
 class InsertAt(AST):
     xname: str
     index: AST
     val: AST
 
-@dataclass
+@dataclass(slots=True)
 class RemoveAt(AST):
     xname: str
     index: AST
 
-@dataclass
+@dataclass(slots=True)
 class GetLength(AST):
     xname: str
 
-@dataclass
+@dataclass(slots=True)
 class ClearArray(AST):
     xname: str
 
-@dataclass
+@dataclass(slots=True)
 class Number(AST):
     val: str
+    value: Any = field(init=False, repr=False, compare=False)  # `val` decoded once, at parse time
+
+    def __post_init__(self):
+        self.value = float(self.val) if "." in self.val else int(self.val)
 
-@dataclass
+    @classmethod
+    def of(cls, value):
+        """Literal for an already computed int or float (see optimizer.py)."""
+        node = cls.__new__(cls)
+        node.val = repr(value)
+        node.value = value
+        return node
+
+@dataclass(slots=True)
 class String(AST):
     val: str
 
-@dataclass 
+@dataclass(slots=True)
 class Slice(AST):
     var_name: str
     start : Optional[AST]
     end : Optional[AST]
     step : Optional[AST]
 
-@dataclass
+@dataclass(slots=True)
 class StringIdx(AST):
     var_name: str
     index: AST
  
-@dataclass 
+@dataclass(slots=True)
 class AssignStringVal(AST):
     var_name: str
     index: AST
     value : AST
 
-@dataclass 
+@dataclass(slots=True)
 class Sort(AST):
     var_name: str
     greater: Optional[AST]
 
-@dataclass
+@dataclass(slots=True)
 class Boolean(AST):
     val: bool
 
-@dataclass
+@dataclass(slots=True)
 class Display(AST):
     val: Any
 
-@dataclass
+@dataclass(slots=True)
 class DisplayL(AST):
     val: Any
 
-@dataclass
+@dataclass(slots=True)
 class Break(AST):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class CompoundAssignment(AST):
     var_name: str
     op: str
     val: AST
+    # static (depth, slot) address of the variable, filled in by resolver.py
+    depth: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    slot: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    # type of the value stored, if proven, set by optimizer.annotate_types
+    vtype: Optional[type] = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class WhileLoop(AST):
     condition: AST 
     body: AST
     whileScope: Any
 
-@dataclass
+@dataclass(slots=True)
 class Feed(AST):
     msg: AST
 
-@dataclass
+@dataclass(slots=True)
 class Repeat(AST):
     times : AST
     body: AST
     repeatScope: Any
 
-@dataclass
+@dataclass(slots=True)
 class ForLoop(AST):
     initialization: AST 
     condition: AST
@@ -211,71 +236,113 @@ class ForLoop(AST):
     body: AST
     forScope: Any
 
-@dataclass
+@dataclass(slots=True)
 class BreakOut(AST):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class MoveOn(AST):
     pass
 
-@dataclass
+@dataclass(slots=True)
 class UpdateVar(AST): # through assignment operator
     var_name: str
     val: AST
+    # static (depth, slot) address of the variable, filled in by resolver.py
+    depth: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    slot: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    # type of the value stored, if proven, set by optimizer.annotate_types
+    vtype: Optional[type] = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class If(AST):
     c: AST
     t: Any
     e: Any
     condScope: Any
 
-@dataclass
+@dataclass(slots=True)
 class Statements(AST):
     statements: List[AST]
 
-@dataclass
+@dataclass(slots=True)
 class FuncDef(AST):
     funcName: str
     funcParams: List[Any]  # list of variables
     funcBody: List[AST]         # assumed body is one-liner expression # will use {} for multiline
     funcScope: Any              # static scoping (scope is tied to function definition and not its call)
 
-@dataclass 
+@dataclass(slots=True)
 class FuncCall(AST):
     funcName: str               # function name as a string
     funcArgs: List[AST]         # takes a list of expressions
+    # the caller returns the call's value as it is, set by optimizer.mark_tail_calls
+    tail: bool = field(default=False, init=False, repr=False, compare=False)
 
-@dataclass
+@dataclass(slots=True)
 class FormatString(AST):
     template: str
     variables: List[str]
 
-@dataclass
+@dataclass(slots=True)
 class TypeCast(AST):
     dtype: str
     val: AST
 
-@dataclass
+@dataclass(slots=True)
 class MathFunction(AST):
     funcName: str
     arg: List[AST]
 
-@dataclass
+@dataclass(slots=True)
 class TypeOf(AST):
     value : AST
 
-@dataclass
+@dataclass(slots=True)
 class Return(AST):
     value: AST  # The value to return
 
-@dataclass
+@dataclass(slots=True)
 class PropertyAccess(AST):
     var_name: str
     operation: str
     args: List[AST]
 
+# `x.Op(...)` on a name whose category is known at parse time (see `property_access`).
+# Each runs its operation directly while `x` holds that type, and falls back to the
+# generic PropertyAccess when the name has since been rebound to something else.
+@dataclass(slots=True)
+class ArrayLen(PropertyAccess):
+    pass
+
+@dataclass(slots=True)
+class ArrayAppend(PropertyAccess):  # PushBack
+    pass
+
+@dataclass(slots=True)
+class ArrayPopBack(PropertyAccess):
+    pass
+
+@dataclass(slots=True)
+class ArrayPopFront(PropertyAccess):
+    pass
+
+@dataclass(slots=True)
+class StrLen(PropertyAccess):
+    pass
+
+@dataclass(slots=True)
+class StrSlice(PropertyAccess):
+    pass
+
+@dataclass(slots=True)
+class HashLen(PropertyAccess):
+    pass
+
+@dataclass(slots=True)
+class HashContains(PropertyAccess):
+    pass
+
 # ==========================================================================================
 
 def map_type(value):
@@ -289,14 +356,115 @@ def map_type(value):
         return SymbolCategory.STRING
     else:
         return SymbolCategory.VARIABLE
+
+# (category, operation, number of arguments) -> dedicated node
+SPECIALIZED = {
+    (SymbolCategory.ARRAY, "Length", 0): ArrayLen,
+    (SymbolCategory.ARRAY, "PushBack", 1): ArrayAppend,
+    (SymbolCategory.ARRAY, "PopBack", 0): ArrayPopBack,
+    (SymbolCategory.ARRAY, "PopFront", 0): ArrayPopFront,
+    (SymbolCategory.STRING, "Length", 0): StrLen,
+    (SymbolCategory.STRING, "Slice", 1): StrSlice,
+    (SymbolCategory.STRING, "Slice", 2): StrSlice,
+    (SymbolCategory.STRING, "Slice", 3): StrSlice,
+    (SymbolCategory.HASH, "Length", 0): HashLen,
+    (SymbolCategory.HASH, "Contains", 1): HashContains,
+}
+
+def property_access(var_name, operation, args, tS):
+    """`var_name.operation(args)`, as a dedicated node when the name's category is known here."""
+    try:
+        category = tS.lookup(var_name, cat=True)
+    except NameError:  # not declared yet (e.g. a global used inside an earlier function)
+        return PropertyAccess(var_name, operation, args)
+    node = SPECIALIZED.get((category, operation, len(args)), PropertyAccess)
+    return node(var_name, operation, args)
+
+# ==========================================================================================
+# Expression grammar as a table of binding levels, outermost first.
+#
+# Each level used to be its own function that parsed a left operand by calling the next
+# level and then looped over its own tokens. `parse_expr` keeps that behaviour in a single
+# frame: `cur` is the deepest level whose loop would still be running, and a token is only
+# taken by a level between the expression's entry level and `cur` (deepest first), which is
+# exactly where the old call chain would have seen it.
+
+(_VAR, _ASSIGN, _IF, _LOGIC, _BITWISE, _CMP, _SHIFT, _ADD, _SUB, _MUL, _MOD, _DIV_SLASH,
+ _DIV_DOT, _EXP, _UNARY, _CHAR, _TYPECAST, _COLLECTION, _MATH, _INPUT, _STRING, _BOOLEAN,
+ _FUNC, _BRACKET, _VARTOK, _ATOM) = range(26)
+
+_END_KIND = len(KIND_TOKENS)  # sentinel kind after the last token; starts and continues nothing
+
+_PREFIX = [None] * (_END_KIND + 1)  # kind -> level at which the token starts an operand
+_POSTFIX = [()] * (_END_KIND + 1)   # kind -> ((level, lexeme), ...), deepest level first
+
+_PREFIX_LEVELS = {"if": _IF, "+": _UNARY, "-": _UNARY, "(": _BRACKET,
+                  "break": _ATOM, "breakout": _ATOM, "moveon": _ATOM}
+_POSTFIX_LEVELS = {
+    "var": _VAR, "fixed": _VAR,
+    "and": _LOGIC, "or": _LOGIC, "not": _LOGIC,
+    "&": _BITWISE, "|": _BITWISE, "^": _BITWISE, "~": _BITWISE,
+    "<": _CMP, ">": _CMP, "==": _CMP, "!=": _CMP, "<=": _CMP, ">=": _CMP,
+    "<<": _SHIFT, ">>": _SHIFT,
+    "+": _ADD, "-": _SUB, "*": _MUL, "%": _MOD, "/": _DIV_SLASH, "÷": _DIV_DOT, "**": _EXP,
+    "char": _CHAR, "ascii": _CHAR,
+    "[": _COLLECTION, "{": _COLLECTION,
+    "feed": _INPUT, "typeof": _INPUT,
+    "fn": _FUNC, "(": _FUNC,
+}
+
+for _lexeme, _token in FIXED_TOKENS.items():
+    _kind = FIXED_KINDS[_lexeme]
+    if isinstance(_token, BooleanToken):
+        _PREFIX[_kind] = _BOOLEAN
+    else:
+        _PREFIX[_kind] = _PREFIX_LEVELS.get(_lexeme)
+    _levels = []
+    if _lexeme in _POSTFIX_LEVELS:
+        _levels.append(_POSTFIX_LEVELS[_lexeme])
+    if isinstance(_token, TypeToken):
+        _levels.append(_TYPECAST)
+    elif isinstance(_token, MathToken):
+        _levels.append(_MATH)
+    elif isinstance(_token, OperatorToken):
+        _levels.append(_ASSIGN)  # any operator after an operand assigns to it
+    _POSTFIX[_kind] = tuple((level, _lexeme) for level in sorted(_levels, reverse=True))
+
+_PREFIX[VAR_KIND] = _PREFIX[NUMBER_KIND] = _ATOM
+_PREFIX[STRING_KIND] = _PREFIX[FSTRING_KIND] = _STRING
+_POSTFIX[VAR_KIND] = ((_VARTOK, None),)
+
+_ATOMS = {FIXED_KINDS["break"]: Break, FIXED_KINDS["breakout"]: BreakOut, FIXED_KINDS["moveon"]: MoveOn}
+_BOOLEANS = {FIXED_KINDS["True"]: True, FIXED_KINDS["False"]: False, FIXED_KINDS["None"]: None}
+
+_TOKEN_KINDS = {token: kind for kind, token in enumerate(KIND_TOKENS) if token is not None}
+_SEMICOLON_KIND = FIXED_KINDS[";"]
+_WHILE_KIND = FIXED_KINDS["while"]
+_FOR_KIND = FIXED_KINDS["for"]
+_REPEAT_KIND = FIXED_KINDS["repeat"]
+_RETURN_KIND = FIXED_KINDS["return"]
+_DISPLAY_KIND = FIXED_KINDS["display"]
+_DISPLAYL_KIND = FIXED_KINDS["displayl"]
+_LEFT_PAREN_KIND = FIXED_KINDS["("]
+_RIGHT_PAREN_KIND = FIXED_KINDS[")"]
+_LEFT_SQUARE_KIND = FIXED_KINDS["["]
+_RIGHT_SQUARE_KIND = FIXED_KINDS["]"]
+_RIGHT_BRACE_KIND = FIXED_KINDS["}"]
+_COMMA_KIND = FIXED_KINDS[","]
+_DOT_KIND = FIXED_KINDS["."]
+_EQUALS_KIND = FIXED_KINDS["="]
+
 #==========================================================================================
 def parse(s: str, defS) -> List[AST]:
 
-    t = peekable(lex(s))
+    t = tokenize(s) if isinstance(s, str) else s
+    # Expressions look ahead by kind; the sentinel saves a bounds check at every peek.
+    kinds = t.kinds[:]
+    kinds.append(_END_KIND)
 
     def expect(what: Token):
-        if t.peek(None) == what:
-            next(t)
+        if kinds[t.pos] == _TOKEN_KINDS[what]:
+            t.pos += 1
             return
         raise SyntaxError(f"Expected {what} got {t.peek(None)}")
     
@@ -315,18 +483,17 @@ def parse(s: str, defS) -> List[AST]:
     def parse_program(thisScope):
 
         statements = []
-        while t.peek(None) is not None:
-            if isinstance(t.peek(None), RightBraceToken):  # function body parsing done
+        while (kind := kinds[t.pos]) != _END_KIND:
+            if kind == _RIGHT_BRACE_KIND:  # function body parsing done
                 break
-            match t.peek(None):
-                case KeywordToken("while"):
-                    stmt, thisScope = parse_while(thisScope)
-                case KeywordToken("for"):
-                    stmt, thisScope = parse_for(thisScope)
-                case KeywordToken("repeat"):
-                    stmt, thisScope = parse_repeat(thisScope)
-                case _:
-                    stmt, thisScope = parse_display(thisScope)
+            if kind == _WHILE_KIND:
+                stmt, thisScope = parse_while(thisScope)
+            elif kind == _FOR_KIND:
+                stmt, thisScope = parse_for(thisScope)
+            elif kind == _REPEAT_KIND:
+                stmt, thisScope = parse_repeat(thisScope)
+            else:
+                stmt, thisScope = parse_display(thisScope)
 
             statements.append(stmt)  # collection of parsed statements
 
@@ -341,13 +508,13 @@ def parse(s: str, defS) -> List[AST]:
         match t.peek(None):
             case KeywordToken("while"):
                 next(t)
-                expect(LeftParenToken()) 
+                expect(LEFT_PAREN) 
                 tS_while = SymbolTable(tS)
                 condition = parse_var(tS_while)[0]
-                expect(RightParenToken()) 
-                expect(LeftBraceToken()) 
+                expect(RIGHT_PAREN) 
+                expect(LEFT_BRACE) 
                 body, tS_while = parse_program(tS_while)  
-                expect(RightBraceToken()) 
+                expect(RIGHT_BRACE) 
                 return WhileLoop(condition, body, tS_while), tS
             case _:
                 raise SyntaxError("Invalid syntax for while loop")
@@ -360,17 +527,17 @@ def parse(s: str, defS) -> List[AST]:
         match t.peek(None):
             case KeywordToken("for"):
                 next(t)
-                expect(LeftParenToken())
+                expect(LEFT_PAREN)
                 tS_for = SymbolTable(tS) # new scope for tS
                 initialization, tS_for = parse_var(tS_for)
-                expect(SemicolonToken())
+                expect(SEMICOLON)
                 condition = parse_var(tS_for)[0]
-                expect(SemicolonToken())
+                expect(SEMICOLON)
                 increment, tS_for = parse_var(tS_for)
-                expect(RightParenToken())
-                expect(LeftBraceToken())
+                expect(RIGHT_PAREN)
+                expect(LEFT_BRACE)
                 body, tS_for = parse_program(tS_for)
-                expect(RightBraceToken())
+                expect(RIGHT_BRACE)
                 return ForLoop(initialization, condition, increment, body, tS_for), tS # no change in tS
             case _:
                 raise SyntaxError("Invalid syntax for for loop")
@@ -383,38 +550,275 @@ def parse(s: str, defS) -> List[AST]:
         match t.peek(None):
             case KeywordToken("repeat"):
                 next(t)
-                expect(LeftParenToken())
+                expect(LEFT_PAREN)
                 tS_repeat = SymbolTable(tS)
                 times = parse_var(tS_repeat)[0]  # Parse the number of repetitions
-                expect(RightParenToken())
-                expect(LeftBraceToken())
+                expect(RIGHT_PAREN)
+                expect(LEFT_BRACE)
                 body, tS_repeat = parse_program(tS_repeat)  # Parse the body of the loop
-                expect(RightBraceToken())
+                expect(RIGHT_BRACE)
                 return Repeat(times, body, tS_repeat), tS
             case _:
                 raise SyntaxError("Invalid syntax for repeat loop")
 
     def parse_display(tS):  # display value/output
-        (ast, tS) = parse_var(tS)
+        ast = parse_expr(tS, _VAR)
         while True:
-            match t.peek(None):
-                case KeywordToken("return"):
-                    next(t)
-                    return_value = parse_var(tS)[0]
-                    ast = Return(return_value)
-                case KeywordToken("display"):
-                    next(t)
-                    ast = Display(parse_var(tS)[0])
-                case KeywordToken("displayl"):
-                    next(t)
-                    ast = DisplayL(parse_var(tS)[0])
-                case SemicolonToken():
-                    next(t)
-                    return ast, tS
-                case _:
-                    return ast, tS
-    
-    def parse_var(tS):  # for `var` declaration
+            kind = kinds[t.pos]
+            if kind == _SEMICOLON_KIND:
+                t.pos += 1
+                return ast, tS
+            elif kind == _RETURN_KIND:
+                t.pos += 1
+                return_value = parse_expr(tS, _VAR)
+                ast = Return(return_value)
+            elif kind == _DISPLAY_KIND:
+                t.pos += 1
+                ast = Display(parse_expr(tS, _VAR))
+            elif kind == _DISPLAYL_KIND:
+                t.pos += 1
+                ast = DisplayL(parse_expr(tS, _VAR))
+            else:
+                return ast, tS
+
+    def parse_var(tS):  # a full expression, including `var`/`fixed` declarations
+        return parse_expr(tS, _VAR), tS
+
+    def parse_expr(tS, entry):
+        """
+        Parse one expression starting at binding level `entry`.
+
+        The operand is read first (prefix tokens whose level is at least `entry`), then
+        tokens are folded in while one of their levels lies between `entry` and `cur`.
+        """
+        pos = t.pos
+        kind = kinds[pos]
+        level = _PREFIX[kind]
+        if level is None or level < entry:
+            ast = None
+            cur = _VARTOK
+        elif level == _ATOM:
+            if kind == VAR_KIND:
+                ast = Variable(t.text(pos))  # not consumed: the VarToken loop below takes it
+            else:
+                t.pos = pos + 1
+                ast = Number(t.text(pos)) if kind == NUMBER_KIND else _ATOMS[kind]()
+            cur = _VARTOK
+        elif level == _BRACKET:
+            t.pos = pos + 1
+            ast = parse_display(tS)[0]
+            if kinds[t.pos] != _RIGHT_PAREN_KIND:
+                raise SyntaxError(f"Expected ')' got {t.peek(None)}")
+            t.pos += 1
+            cur = _FUNC
+        elif level == _UNARY:
+            t.pos = pos + 1
+            ast = UnaryOp(KIND_TOKENS[kind].o, parse_expr(tS, _UNARY))
+            cur = _EXP
+        elif level == _STRING:
+            t.pos = pos + 1
+            s = t.text(pos)
+            if kind == STRING_KIND:
+                ast = String(s)
+            else:
+                variables = []
+                for var in s.split("{")[1:]:
+                    var_name = var.split("}")[0]
+                    variables.append(var_name)
+                ast = FormatString(s, variables)
+            cur = _INPUT
+        elif level == _BOOLEAN:
+            t.pos = pos + 1
+            ast = Boolean(_BOOLEANS[kind])
+            cur = _INPUT
+        else:
+            ast = parse_if(tS)
+            cur = _ASSIGN
+
+        funcName = None  # last function defined here; a call on a non-name reuses it
+        while True:
+            pos = t.pos
+            for level, lexeme in _POSTFIX[kinds[pos]]:
+                if level <= cur:
+                    break
+            else:
+                return ast
+            if level < entry:
+                return ast
+
+            if _LOGIC <= level <= _DIV_DOT:
+                t.pos = pos + 1
+                right = parse_expr(tS, level + 1)
+                ast = UnaryOp(lexeme, right) if lexeme in ("not", "~") else BinOp(lexeme, ast, right)
+            elif level == _VARTOK:
+                t.pos = pos + 1
+                v = t.text(pos)
+                if kinds[pos + 1] == _DOT_KIND:
+                    # Handle dot notation uniformly for all variable types
+                    t.pos = pos + 2
+                    token = t.peek(None)
+                    # Keys, Values and Contains are not keywords, so they lex as names
+                    operation = token.var_name if isinstance(token, VarToken) else token.kw_name
+                    next(t)
+                    args = []
+                    if kinds[t.pos] == _LEFT_PAREN_KIND:
+                        t.pos += 1
+                        args = parse_items(tS, _RIGHT_PAREN_KIND)
+                    ast = property_access(v, operation, args, tS)
+                    cur = _FUNC
+                    continue
+                elif kinds[pos + 1] == _LEFT_SQUARE_KIND:
+                    # Handle array/string/hash index access/update
+                    indices = []
+                    while kinds[t.pos] == _LEFT_SQUARE_KIND:
+                        t.pos += 1
+                        indices.append(parse_expr(tS, _VAR))
+                        expect(RIGHT_SQUARE)
+                    if kinds[t.pos] == _EQUALS_KIND:
+                        t.pos += 1
+                        value = parse_expr(tS, _VAR)
+                        ast = AssigntoArr(v, indices, value)
+                    else:
+                        ast = CallArr(v, indices)
+                else:
+                    # Default to variable access
+                    ast = Variable(v)
+            elif level == _ASSIGN:
+                var_name = ast.var_name
+                t.pos = pos + 1
+                value = parse_expr(tS, _VAR)
+                ast = CompoundAssignment(var_name, lexeme, value) if lexeme in compound_assigners else UpdateVar(var_name, value)
+            elif level == _FUNC:
+                if lexeme == "fn":  # function declaration
+                    ast = parse_func_def(tS)
+                    funcName = ast.funcName
+                else:  # `(` after an operand is a function call
+                    if isinstance(ast, Variable):
+                        funcName = ast.var_name
+                    elif isinstance(ast, CallArr):
+                        funcName = ast
+                    elif funcName is None:
+                        raise SyntaxError(f"Expected a function name before '(' got {ast}")
+                    funcArgs = []
+                    t.pos = pos + 1
+                    while True:
+                        k = kinds[t.pos]
+                        if k == _COMMA_KIND:
+                            t.pos += 1
+                        elif k == _RIGHT_PAREN_KIND:
+                            # function call ends
+                            t.pos += 1
+                            break
+                        elif k == _END_KIND:
+                            expect(RIGHT_PAREN)
+                        else:
+                            funcArgs.append(parse_expr(tS, _VAR))
+                    ast = FuncCall(funcName, funcArgs)
+                    cur = _INPUT
+                    continue
+            elif level == _EXP:
+                t.pos = pos + 1
+                ast = BinOp("**", ast, parse_expr(tS, _EXP))
+                cur = _DIV_DOT
+                continue
+            elif level == _COLLECTION:
+                t.pos = pos + 1
+                if lexeme == "[":  # parse list of elements
+                    ast = Array(parse_items(tS, _RIGHT_SQUARE_KIND))
+                else:  # parse list of dictionary
+                    ast = Hash(parse_pairs(tS))
+            elif level == _VAR:
+                ast = parse_var_bind(tS, lexeme == "fixed")
+            elif level == _TYPECAST:
+                t.pos = pos + 1
+                expect(LEFT_PAREN)
+                value = parse_expr(tS, _VAR)
+                expect(RIGHT_PAREN)
+                ast = TypeCast(lexeme, value)
+            elif level == _MATH:
+                t.pos = pos + 1
+                args = []
+                if kinds[t.pos] == _LEFT_PAREN_KIND:
+                    t.pos += 1
+                    args = parse_items(tS, _RIGHT_PAREN_KIND)
+                ast = MathFunction(lexeme, args)
+            elif level == _CHAR:
+                t.pos = pos + 1
+                expect(LEFT_PAREN)
+                value = parse_expr(tS, _IF)
+                expect(RIGHT_PAREN)
+                ast = UnaryOp(lexeme, value)
+            else:  # _INPUT
+                t.pos = pos + 1
+                expect(LEFT_PAREN)
+                if lexeme == "feed":
+                    msg = parse_expr(tS, _STRING)
+                    if (msg is None):
+                        msg = String("FEED:")
+                    ast = Feed(msg)
+                else:
+                    ast = TypeOf(parse_expr(tS, _VAR))
+                expect(RIGHT_PAREN)
+            cur = level
+
+    def parse_items(tS, close_kind):
+        """Comma-separated expressions up to and including the closing token (the opener is consumed)."""
+        items = []
+        while kinds[t.pos] != close_kind:
+            if kinds[t.pos] == _END_KIND:
+                break
+            items.append(parse_expr(tS, _VAR))
+            if kinds[t.pos] == _COMMA_KIND:
+                t.pos += 1
+        expect(KIND_TOKENS[close_kind])
+        return items
+
+    def parse_pairs(tS):
+        """`key: value` pairs of a Hash literal up to and including `}`."""
+        elements = []
+        while kinds[t.pos] != _RIGHT_BRACE_KIND:
+            if kinds[t.pos] == _END_KIND:
+                break
+            key = parse_expr(tS, _VAR)
+            expect(COLON)
+            val = parse_expr(tS, _VAR)
+            elements.append((key, val))
+            if kinds[t.pos] == _COMMA_KIND:
+                t.pos += 1
+        expect(RIGHT_BRACE)
+        return elements
+
+    def parse_if(tS):
+        next(t)  # `if`
+        tS_cond = SymbolTable(tS)
+        cond = parse_expr(tS_cond, _VAR)
+        expect(FIXED_TOKENS["then"])
+
+        if isinstance(t.peek(None), LeftBraceToken):
+            next(t)
+            then_body, tS_cond = parse_program(tS_cond)
+            expect(RIGHT_BRACE)
+        else:
+            then_body = parse_display(tS_cond)[0]
+
+        # Optional else
+        if not (isinstance(t.peek(None), KeywordToken) and t.peek(None).kw_name == "else"):
+            else_body = None
+        else:
+            next(t)
+            if isinstance(t.peek(None), LeftBraceToken):
+                next(t)
+                else_body, tS_cond = parse_program(tS_cond)
+                expect(RIGHT_BRACE)
+            else:
+                else_body = parse_display(tS_cond)[0]
+
+        # `end` is a must
+        expect(FIXED_TOKENS["end"])
+
+        return If(cond, then_body, else_body, tS_cond)
+
+    def parse_var_bind(tS, fixed):  # for `var` / `fixed var` declaration
         def parse_dtype_and_name():
             """Parse the data type and variable name."""
             dtype = None
@@ -429,693 +833,92 @@ def parse(s: str, defS) -> List[AST]:
                 return dtype, name
             else:
                 raise SyntaxError("Expected a variable name.")
-                # print("Syntax Error! Expected a variable name.")
-                # exit()
 
-        def parse_value():
+        def parse_value(name):
             """Parse the value of the variable."""
             if isinstance(t.peek(None), SemicolonToken):
                 return None
-            expect(OperatorToken("="))
+            expect(FIXED_TOKENS["="])
             if isinstance(t.peek(None), SemicolonToken):
                 raise SyntaxError(f"Used `;` after `=` for identifier `{name}`")
-                # print(f"Syntax Error! Used `;` after `=` for identifier `{name}`")
-                # exit()
-            return parse_var(tS)[0]
-
-        ast = parse_update_var(tS)
-        while True:
-            match t.peek(None):
-                case KeywordToken("var"):
-                    next(t)
-                    dtype, name = parse_dtype_and_name()
-                    value = parse_value()
-                    # category=map_type(value)
-                    if dtype is not None:
-                        category=map_type_to_enum(dtype)
-                    else:
-                        category=map_type(value)
-                    ast = VarBind(name, dtype, value,category)
-                    tS.define(name,None,category)
-                case KeywordToken("fixed"):  # Add this case
-                    next(t)
-                    # Check if 'var' follows 'fixed'
-                    if not isinstance(t.peek(None), KeywordToken) or t.peek(None).kw_name != "var":
-                        raise SyntaxError("Expected 'var' after 'fixed'")
-                        # print("Syntax Error! Expected 'var' after 'fixed'")
-                        # exit()
-                    next(t)  # Consume 'var'
-                    dtype, name = parse_dtype_and_name()
-                    value = parse_value()
-                    if value is None:
-                        raise SyntaxError(f"Fixed variable `{name}` must be initialized.")
-                        # print(f"Error! Fixed variable `{name}` must be initialized.")
-                        # exit()
-                    category = SymbolCategory.FIXED  # Use FIXED category
-                    ast = VarBind(name, dtype, value, category)
-                    tS.define(name, None, category)
-                case _:
-                    return ast, tS
-
-                
-    def parse_update_var(tS): # for updating var
-        ast = parse_if(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken(op):
-                    var_name = ast.var_name
-                    next(t)
-                    value = parse_var(tS)[0]
-                    ast = CompoundAssignment(var_name,op,value) if op in compound_assigners else UpdateVar(var_name, value)
-                case _:
-                    return ast
-
-                # case VarToken(var_name):
-                #     next(t)
-                #     if isinstance(t.peek(None),OperatorToken):
-                #         op = t.peek(None).o 
-                #         next(t)
-                #         value = parse_var(tS)[0]
-                #         ast = CompoundAssignment(var_name,op,value) if op in compound_assigners else UpdateVar(var_name, value)
-                #     else:
-                #         return ast #! use?
-                # case _ :
-                #     return ast
-
-    def parse_if(tS):
-        match t.peek(None):
-            case KeywordToken("if"):
-                next(t)
-                tS_cond = SymbolTable(tS)
-                cond = parse_var(tS_cond)[0]
-                expect(KeywordToken("then"))
-                
-                if isinstance(t.peek(None), LeftBraceToken):
-                    next(t)  
-                    then_body, tS_cond = parse_program(tS_cond)
-                    expect(RightBraceToken()) 
-                else:
-                    then_body = parse_display(tS_cond)[0]
-
-                # Optional else
-                if not (isinstance(t.peek(None), KeywordToken) and t.peek(None).kw_name == "else"):
-                    else_body = None
-                else:
-                    next(t)  
-                    if isinstance(t.peek(None), LeftBraceToken):
-                        next(t)  
-                        else_body, tS_cond = parse_program(tS_cond)
-                        expect(RightBraceToken())
-                    else:
-                        else_body = parse_display(tS_cond)[0]
-                
-                # `end` is a must
-                expect(KeywordToken("end"))
-
-                return If(cond, then_body, else_body, tS_cond)
-            case _:
-                return parse_logic(tS)
-
-    def parse_logic(tS):
-        ast = parse_bitwise(tS)
-        while True:
-            match t.peek(None):
-                case KeywordToken("and"):
-                    next(t)
-                    ast = BinOp("and", ast, parse_bitwise(tS))
-                case KeywordToken("or"):
-                    next(t)
-                    ast = BinOp("or", ast, parse_bitwise(tS))
-                case KeywordToken("not"):
-                    next(t)
-                    ast = UnaryOp("not", parse_bitwise(tS))
-                case _:
-                    return ast
-
-    def parse_bitwise(tS):
-        ast = parse_cmp(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("&"):
-                    next(t)
-                    ast = BinOp("&", ast, parse_cmp(tS))
-                case OperatorToken("|"):
-                    next(t)
-                    ast = BinOp("|", ast, parse_cmp(tS))
-                case OperatorToken("^"):
-                    next(t)
-                    ast = BinOp("^", ast, parse_cmp(tS))
-                case OperatorToken("~"):
-                    next(t)
-                    ast = UnaryOp("~", parse_cmp(tS))
-                case _:
-                    return ast
-
-    def parse_cmp(tS):
-        ast = parse_shift(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("<"):
-                    next(t)
-                    ast = BinOp("<", ast, parse_shift(tS))
-                case OperatorToken(">"):
-                    next(t)
-                    ast = BinOp(">", ast, parse_shift(tS))
-                case OperatorToken("=="):
-                    next(t)
-                    ast = BinOp("==", ast, parse_shift(tS))
-                case OperatorToken("!="):
-                    next(t)
-                    ast = BinOp("!=", ast, parse_shift(tS))
-                case OperatorToken("<="):
-                    next(t)
-                    ast = BinOp("<=", ast, parse_shift(tS))
-                case OperatorToken(">="):
-                    next(t)
-                    ast = BinOp(">=", ast, parse_shift(tS))
-                case _:
-                    return ast
-                             
-    def parse_shift(tS):
-        ast = parse_add(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("<<"):
-                    next(t)
-                    ast = BinOp("<<", ast, parse_add(tS))
-                case OperatorToken(">>"):
-                    next(t)
-                    ast = BinOp(">>", ast, parse_add(tS))
-                case _:
-                    return ast
-
-    def parse_add(tS):
-        ast = parse_sub(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("+"):
-                    next(t)
-                    ast = BinOp("+", ast, parse_sub(tS))
-                case _:
-                    return ast
-                
-    def parse_sub(tS):
-        ast = parse_mul(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("-"):
-                    next(t)
-                    ast = BinOp("-", ast, parse_mul(tS))
-                case _:
-                    return ast
-
-
-    def parse_mul(tS):
-        ast = parse_modulo(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("*"):
-                    next(t)
-                    ast = BinOp("*", ast, parse_modulo(tS))
-                case _:
-                    return ast
-    def parse_modulo(tS):
-        ast =parse_div_slash(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("%"):
-                    next(t)
-                    ast=BinOp("%",ast,parse_div_slash(tS))
-                case _:
-                    return ast
-
-    def parse_div_slash(tS):
-        ast = parse_div_dot(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("/"):
-                    next(t)
-                    ast = BinOp("/", ast, parse_div_dot(tS))
-                case _:
-                    return ast
-
-    def parse_div_dot(tS):
-        ast = parse_exp(tS)
-        while True:
-            match t.peek(None):
-                case OperatorToken("÷"):
-                    next(t)
-                    ast = BinOp("÷", ast, parse_exp(tS))
-                case _:
-                    return ast
-                
-    def parse_exp(tS):
-        ast = parse_unary(tS)
-        if isinstance(t.peek(None), OperatorToken) and t.peek(None).o == "**":
+            return parse_expr(tS, _VAR)
+
+        next(t)
+        if fixed:
+            # Check if 'var' follows 'fixed'
+            if not isinstance(t.peek(None), KeywordToken) or t.peek(None).kw_name != "var":
+                raise SyntaxError("Expected 'var' after 'fixed'")
+            next(t)  # Consume 'var'
+        dtype, name = parse_dtype_and_name()
+        value = parse_value(name)
+        if fixed:
+            if value is None:
+                raise SyntaxError(f"Fixed variable `{name}` must be initialized.")
+            category = SymbolCategory.FIXED  # Use FIXED category
+        elif dtype is not None:
+            category = map_type_to_enum(dtype)
+        else:
+            category = map_type(value)
+        tS.define(name, None, category)
+        return VarBind(name, dtype, value, category)
+
+    def parse_func_def(tS):  # fn name(params) { body }
+        next(t)
+        if isinstance(t.peek(None), VarToken):
+            funcName = t.peek(None).var_name
             next(t)
-            right = parse_exp(tS)
-            ast = BinOp("**", ast, right)
-        return ast
+        else:
+            raise SyntaxError("Function name missing.")
 
+        if tS.inScope(funcName):
+            raise RedeclarationError(f"Multiple declaration of function `{funcName}()` in the same scope is not allowed.")
 
-    def parse_unary(tS):
-        # Check for unary operators
-        if isinstance(t.peek(None), OperatorToken) and t.peek(None).o in ["+", "-"]:
-            op = t.peek(None).o
-            next(t)
-            # Parse the operand with higher precedence than binary operators
-            operand = parse_unary(tS)  # Recursive to handle multiple unary ops
-            return UnaryOp(op, operand)
-        else:
-            # If not a unary operator, proceed with normal atom parsing
-            return parse_ascii_char(tS)
+        tS.define(funcName, None, SymbolCategory.FUNCTION) # add to scope
+        tS_f = SymbolTable(tS) # Function Scope (with tS as parent scope)
 
+        # parse parameters
+        expect(LEFT_PAREN)
+        params = []
 
-    def parse_ascii_char(tS):
-        ast = parse_typecast(tS)
-        while True:
-            match t.peek(None):
-                case KeywordToken("char"):
-                    next(t)
-                    expect(LeftParenToken())
-                    value = parse_if(tS)    
-                    expect(RightParenToken())
-                    ast = UnaryOp("char", value)
-                case KeywordToken("ascii"):
-                    next(t)
-                    expect(LeftParenToken())
-                    value = parse_if(tS)
-                    expect(RightParenToken())
-                    ast = UnaryOp("ascii", value)
-                case _:
-                    return ast
-    def parse_typecast(tS):
-        ast = parse_array_dict(tS)
-        while True:
-            match t.peek(None):
-                case TypeToken(dtype):
-                    next(t)
-                    expect(LeftParenToken())
-                    value = parse_var(tS)[0]
-                    expect(RightParenToken())
-                    ast = TypeCast(dtype, value)
-                case _:
-                    return ast
-    def parse_array_dict(tS):
-        ast=parse_math(tS)
-        while True:
-            match t.peek(None):
-                case LeftSquareToken(): # parse list of elements
-                    next(t)
-                    elements = []
-                    while not isinstance(t.peek(None), RightSquareToken):
-                        elements.append(parse_var(tS)[0])
-                        if isinstance(t.peek(None), CommaToken):
-                            next(t)
-                    expect(RightSquareToken())
-
-                    ast = Array(elements)
-                case LeftBraceToken(): # parse list of dictionary
-                    next(t)
-                    elements= []
-                    while not isinstance(t.peek(None), RightBraceToken):
-                        key=parse_var(tS)[0]
-                        expect(ColonToken())
-                        val = parse_var(tS)[0]
-                        elements.append((key,val))
-                        if isinstance(t.peek(None), CommaToken):
-                            next(t)
-                    expect(RightBraceToken())
-
-                    ast=Hash(elements)
-                case _:
-                    return ast
-    def parse_math(tS):
-        ast = parse_input(tS)
-        while True:
-            match t.peek(None):
-                case MathToken(m):
-                    next(t)
-                    if isinstance(t.peek(None), LeftParenToken):
-                        next(t)
-                        args = []
-                        while not isinstance(t.peek(None), RightParenToken):
-                            args.append(parse_var(tS)[0])
-                            if isinstance(t.peek(None), CommaToken):
-                                next(t)
-                        expect(RightParenToken())
-                    else:
-                        args = []
-                    ast = MathFunction(m, args)
-                case _:
-                    return ast
-    def parse_input(tS):
-        ast=parse_string(tS)
-        while True:
-            match t.peek(None):
-                case KeywordToken("feed"):
-                    next(t)
-                    expect(LeftParenToken())
-                    msg=parse_string(tS)
-                    if (msg is None):
-                        msg=String("FEED:")
-                    expect(RightParenToken())
-                    ast = Feed(msg)
-                case KeywordToken("typeof"):
-                    next(t)
-                    expect(LeftParenToken())
-                    value = parse_var(tS)[0]
-                    expect(RightParenToken())
-                    ast = TypeOf(value)
-                case _:
-                    return ast
-                
-    def parse_string(tS): # while True may be included in future
-        match t.peek(None):
-            case StringToken(s):
-                next(t)
-                return String(s)
-            case FstringToken(s):
-                next(t)
-                variables = []
-                for var in s.split("{")[1:]:
-                    var_name = var.split("}")[0]
-                    variables.append(var_name)
-                return FormatString(s, variables)
-            case _:
-                return parse_boolean(tS)
-                            
-    def parse_boolean(tS):
-        match t.peek(None):
-            case BooleanToken(b):
-                next(t)
-                # return Boolean(b=="True")
-                if b == "True":
-                    return Boolean(True)
-                elif b == "False":
-                    return Boolean(False)
-                elif b == "None":
-                    return Boolean(None)
-                else:
-                    raise ValueError(f"Unexpected boolean value: {b}")
-            case _:
-                return parse_func(tS)
-    # def loop_parse(tS):
-        # ast=parse_func(tS)
-        # while True:
-        #     match t.peek(None):
-        #         case KeywordToken("loop"):
-        #             next(t) # loop keyword detected move to next token
-        #             cond=None
-        #             if (t.peek(None) == LeftParenToken()): # loop condition starts
-        #                 next(t)
-        #                 cond=parse_logic(tS)[0]
-        #                 expect(RightParenToken())
-        #             expect (LeftBraceToken()) # loop body starts
-        #             body = parse_var(tS)[0] # temporary 
-        #             ast=Loop(cond,body)
-        #         case _:
-        #             return ast   
-        #     
-    def parse_func(tS): # Function definition and Function call
-        ast = parse_brackets(tS)
-        while True:
-            match t.peek(None):
-                case KeywordToken("fn"): # function declaration
-                    next(t)    
-                    if isinstance(t.peek(None), VarToken):
-                        funcName = t.peek(None).var_name
-                        next(t)
-                    else:
-                        raise SyntaxError("Function name missing.")
-
-                    if tS.inScope(funcName):
-                        raise RedeclarationError(f"Multiple declaration of function `{funcName}()` in the same scope is not allowed.")
-                    
-                    tS.define(funcName, None, SymbolCategory.FUNCTION) # add to scope
-                    tS_f = SymbolTable(tS) # Function Scope (with tS as parent scope)
-
-                    # parse parameters
-                    expect(LeftParenToken())
-                    params = []
-
-                    while isinstance(t.peek(None), VarToken):
-                        param_name = t.peek(None).var_name
-                        next(t)
-                        if isinstance(t.peek(None), LeftBraceToken):
-                            next(t)
-                            expect(RightBraceToken())
-                            tS_f.define(param_name, None, SymbolCategory.HASH)
-                            params.append((param_name, SymbolCategory.ARRAY))
-                        elif isinstance(t.peek(None), LeftSquareToken):
-                            next(t)
-                            expect(RightSquareToken())
-                            tS_f.define(param_name, None, SymbolCategory.ARRAY)
-                            params.append((param_name, SymbolCategory.ARRAY))
-                        else:
-                            tS_f.define(param_name, None, SymbolCategory.VARIABLE)
-                            params.append((param_name, SymbolCategory.VARIABLE))
-
-                        if isinstance(t.peek(None), CommaToken):
-                            next(t)
-                            if not isinstance(t.peek(None), VarToken):
-                                expect(RightParenToken())
-                                break
-                        elif isinstance(t.peek(None), RightParenToken):
-                            # param list end
-                            next(t)
-                            break
-                        else:
-                            raise SyntaxError(f"Invalid synyax for formal parameter list in `{funcName}`.")
-
-                    if len(params)==0:
-                        expect(RightParenToken()) # no parameters in the function declaration
-                    
-                    expect(LeftBraceToken()) # {
-                    # function body begins
-                    (body, tS_f) = parse_program(tS_f) # get updated tS_f
-                    next(t)
-                    ast = FuncDef(funcName, params, body, tS_f)
-                    tS.define(funcName, (params, body, tS_f), SymbolCategory.FUNCTION)
-                
-                # Function call
-                case LeftParenToken(): # denotes the identifier is not a variable but a function call
-                    # extract arguments
-                    if isinstance(ast, Variable):
-                        funcName = ast.var_name
-                    elif isinstance(ast, CallArr):
-                        funcName = ast
-                    funcArgs = []
-                    next(t)
-                    while True: 
-                        match t.peek(None):
-                            case CommaToken():
-                                next(t)
-                            case RightParenToken():
-                                # function call ends
-                                ast = FuncCall(funcName, funcArgs)
-                                next(t)
-                                return ast
-                            case _:
-                                # expect expression
-                                expr = parse_var(tS)[0]
-                                funcArgs.append(expr)
-                
-                case _:
-                    return ast
-                # parse_func() ends here
-   
-
-    def parse_brackets(tS):
-        while True:
-            match t.peek(None):
-                case LeftParenToken():
-                    next(t)
-                    (ast, tS) = parse_display(tS)
-                    match t.peek(None):
-                        case RightParenToken():
-                            next(t)
-                            return ast
-                        case _:
-                            raise SyntaxError(f"Expected ')' got {t.peek(None)}")
-                case _:
-                    return call_vartoks(tS)
-    
-    # def call_vartoks(tS): #handles all calls related to vartokens
-    #     ast = parse_atom(tS)
-    #     while True:
-    #         match t.peek(None):
-    #             case VarToken(v):
-    #                 next(t)
-    #                 if isinstance(t.peek(None), LeftParenToken):
-    #                     # means a function call
-    #                     return ast
-    #                 category = tS.lookup(v, cat = True)
-    #                 match category:
-    #                     case SymbolCategory.VARIABLE:
-    #                         ast = Variable(v)
-    #                     case SymbolCategory.ARRAY:
-    #                         if isinstance(t.peek(None), LeftSquareToken):  # array access
-    #                             indices = []
-    #                             while isinstance(t.peek(None), LeftSquareToken):
-    #                                 next(t)
-    #                                 indices.append(parse_var(tS)[0])
-    #                                 expect(RightSquareToken())
-    #                             if (isinstance(t.peek(None), OperatorToken) 
-    #                                 and t.peek(None).o == "="):  # assigning a new value
-    #                                 next(t)
-    #                                 value = parse_var(tS)[0]
-    #                                 ast = AssigntoArr(v, indices, value)
-    #                             else:  # accessing a given index
-    #                                 ast = CallArr(v, indices)
-    #                         elif isinstance(t.peek(None), DotToken):
-    #                             next(t)
-    #                             operation = t.peek(None).kw_name
-    #                             next(t)
-    #                             args = []
-    #                             if isinstance(t.peek(None), LeftParenToken):
-    #                                 next(t)
-    #                                 while not isinstance(t.peek(None), RightParenToken):
-    #                                     args.append(parse_var(tS)[0])
-    #                                     if isinstance(t.peek(None), CommaToken):
-    #                                         next(t)
-    #                                 expect(RightParenToken())
-    #                             ast = handle_operations(v, tS, operation, *args)
-    #                         else:  # calling the whole array
-    #                             ast = Variable(v)
-    #                     case SymbolCategory.HASH:
-    #                         if isinstance(t.peek(None), LeftSquareToken):
-    #                             keys = []
-    #                             while isinstance(t.peek(None), LeftSquareToken):
-    #                                 next(t)
-    #                                 keys.append(parse_var(tS)[0])
-    #                                 expect(RightSquareToken())
-    #                             if (isinstance(t.peek(None), OperatorToken) 
-    #                                 and t.peek(None).o == "="):  # assigning a new value
-    #                                 next(t)
-    #                                 value = parse_var(tS)[0]
-    #                                 ast = AssignHashVal(v, keys, value)  # Handle nested keys
-    #                             else:
-    #                                 ast = CallHashVal(v, keys)  # Handle nested keys
-    #                         elif isinstance(t.peek(None), DotToken):
-    #                             next(t)
-    #                             match t.peek(None):
-    #                                 case KeywordToken("Add"):
-    #                                     next(t)
-    #                                     expect(LeftParenToken())
-    #                                     key = parse_var(tS)[0]
-    #                                     expect(CommaToken())
-    #                                     val = parse_var(tS)[0]
-    #                                     expect(RightParenToken())
-    #                                     ast = AddHashPair(v, key, val)
-    #                                     return ast
-    #                                 case KeywordToken("Remove"):
-    #                                     next(t)
-    #                                     expect(LeftParenToken())
-    #                                     key = parse_var(tS)[0]
-    #                                     expect(RightParenToken())
-    #                                     ast = RemoveHashPair(v, key)
-    #                                     return ast
-    #                                 case _:
-    #                                     return ast
-    #                         else:
-    #                             ast = Variable(v)
-
-    #                     case SymbolCategory.STRING:
-    #                         if isinstance(t.peek(None), LeftSquareToken):
-    #                             next(t)
-    #                             index= parse_var(tS)[0]
-    #                             expect(RightSquareToken())
-    #                             if (isinstance(t.peek(None), OperatorToken) 
-    #                                 and t.peek(None).o == "="): #assign new value to index
-    #                                 next(t)
-    #                                 value = parse_var(tS)[0]
-    #                                 ast = AssignStringVal(v, index, value)
-    #                             else:
-    #                                 ast = StringIdx(v, index)
-    #                         elif isinstance(t.peek(None), DotToken):
-    #                             while isinstance(t.peek(None), DotToken):
-    #                                 next(t)
-    #                                 operation = t.peek(None).kw_name
-    #                                 next(t)
-    #                                 args = []
-    #                                 if isinstance(t.peek(None), LeftParenToken):
-    #                                     next(t)
-    #                                     while not isinstance(t.peek(None), RightParenToken):
-    #                                         args.append(parse_var(tS)[0])
-    #                                         if isinstance(t.peek(None), CommaToken):
-    #                                             next(t)
-    #                                     expect(RightParenToken())
-    #                                 ast = handle_operations(v, tS, operation, *args)
-    #                         else:
-    #                             ast=Variable(v)
-    #                     case _:
-    #                         ast = Variable(v)
-    #             case _:
-    #                 return ast   
-
-    def call_vartoks(tS):
-        ast = parse_atom(tS)
-        while True:
-            match t.peek(None):
-                case VarToken(v):
-                    next(t)
-                    # Handle dot notation uniformly for all variable types
-                    if isinstance(t.peek(None), DotToken):
-                        next(t)
-                        operation = t.peek(None).kw_name
-                        next(t)
-                        args = []
-                        if isinstance(t.peek(None), LeftParenToken):
-                            next(t)
-                            while not isinstance(t.peek(None), RightParenToken):
-                                args.append(parse_var(tS)[0])
-                                if isinstance(t.peek(None), CommaToken):
-                                    next(t)
-                            expect(RightParenToken())
-                        # Create PropertyAccess node regardless of variable's parse-time category
-                        ast = PropertyAccess(v, operation, args)
-                        return ast
-                    
-                    # Handle array/string/hash index access/update
-                    elif isinstance(t.peek(None), LeftSquareToken):
-                        indices = []
-                        while isinstance(t.peek(None), LeftSquareToken):
-                            next(t)
-                            indices.append(parse_var(tS)[0])
-                            expect(RightSquareToken())
-
-                        if (isinstance(t.peek(None), OperatorToken) and 
-                            t.peek(None).o == "="):
-                            next(t)
-                            value = parse_var(tS)[0]
-                            ast = AssigntoArr(v, indices, value)
-                        else:
-                            ast = CallArr(v, indices)
-                    else:
-                        # Default to variable access
-                        ast = Variable(v)
-                case _:
-                    return ast
-                
-    def parse_atom(tS): #! while True may be included in future
-        match t.peek(None):
-            case NumberToken(n):
+        while isinstance(t.peek(None), VarToken):
+            param_name = t.peek(None).var_name
+            next(t)
+            if isinstance(t.peek(None), LeftBraceToken):
                 next(t)
-                return Number(n)
-            case BreakToken():
+                expect(RIGHT_BRACE)
+                tS_f.define(param_name, None, SymbolCategory.HASH)
+                params.append((param_name, SymbolCategory.ARRAY))
+            elif isinstance(t.peek(None), LeftSquareToken):
                 next(t)
-                return Break()
-            case BreakOutToken():
+                expect(RIGHT_SQUARE)
+                tS_f.define(param_name, None, SymbolCategory.ARRAY)
+                params.append((param_name, SymbolCategory.ARRAY))
+            else:
+                tS_f.define(param_name, None, SymbolCategory.VARIABLE)
+                params.append((param_name, SymbolCategory.VARIABLE))
+
+            if isinstance(t.peek(None), CommaToken):
                 next(t)
-                return BreakOut()
-            case MoveOnToken():
+                if not isinstance(t.peek(None), VarToken):
+                    expect(RIGHT_PAREN)
+                    break
+            elif isinstance(t.peek(None), RightParenToken):
+                # param list end
                 next(t)
-                return MoveOn()
-            case VarToken(v):
-                # next(t)
-                return Variable(v)
-    
+                break
+            else:
+                raise SyntaxError(f"Invalid synyax for formal parameter list in `{funcName}`.")
+
+        if len(params)==0:
+            expect(RIGHT_PAREN) # no parameters in the function declaration
+
+        expect(LEFT_BRACE) # {
+        # function body begins
+        (body, tS_f) = parse_program(tS_f) # get updated tS_f
+        next(t)
+        tS.define(funcName, (params, body, tS_f), SymbolCategory.FUNCTION)
+        return FuncDef(funcName, params, body, tS_f)
+
     return parse_program(defS)
     
     # try:
@@ -0,0 +1,1096 @@
+"""
+Register-based VM: an alternative execution engine to the stack machine of bytecode_eval_new.
+
+`compile_registers` compiles a program (parsed and optimized as for the stack VM) straight
+from its AST into one `Proto` per function, whose instructions name the registers they read
+and write: `("ADD", 3, 1, 2)` is `r3 = r1 + r2`, with no operand stack in between. A call
+runs in a frame of its own, a list of registers:
+
+- r0 holds the frame the function was defined in, so a variable of an enclosing function is
+  `depth` links up (LOAD_UP/STORE_UP); names are resolved lexically, at compile time;
+- the parameters come next, then each variable of the function, block-scoped variables in
+  registers of their own; temporaries are reused from one statement to the next;
+- constants are registers too, filled in from the function's template as its frame is made,
+  so no instruction needs a constant form.
+
+Conditions compile to compare-and-branch instructions (`("JUMP_UNLESS", "LT", a, b, target)`)
+and short-circuit, as `and`/`or` do in the tree walker; loops test their condition at the
+bottom. `RegisterVM` runs the code threaded, as `thread_code` does the stack VM's: one bound
+handler per instruction, returning the index of the next. A call hands its frame to the
+run loop rather than recursing, so recursion is limited by memory only, and a tail call
+reuses the caller's place.
+
+The built-in functions are the stack VM's (`BUILTINS`), and so are the property operations and
+casts, which run through `BytecodeVM.property_access` and `perform_typecast`. Where the stack
+VM differs from the tree walker, this VM follows the tree walker: variables are lexically
+scoped (a block's `var` shadows rather than overwrites), and `and`/`or` short-circuit. A name
+read before the scope's own declaration of it runs also means what it does there: None for
+an untyped `var` (any name declared at the top level), the enclosing variable for any other
+until its declaration has run, in that iteration of a loop or an earlier one (`prebind`).
+
+`run_program(prog, engine="registers")` runs a program this way; benchmarks/register_vm_bench.py
+compares both VMs on the Project Euler programs.
+"""
+import math
+import operator
+from parser import *
+from optimizer import walk, written_names
+from resolver import children
+import optimizer
+from scope import SymbolTable
+from bytecode_eval_new import BUILTINS, COMPARE, BytecodeVM
+
+# BinOp operators -> instruction; comparisons also name the branches of `RegisterCompiler.branch`
+BINARY_OPS = {
+    "+": "ADD", "-": "SUB", "*": "MUL", "/": "DIV", "÷": "DIV", "//": "FLOORDIV", "%": "MODULO",
+    "**": "POW", "<": "LT", ">": "GT", "==": "EQ", "!=": "NE", "<=": "LE", ">=": "GE",
+    "&": "BITAND", "|": "BITOR", "^": "BITXOR", "<<": "LSHIFT", ">>": "RSHIFT",
+}
+COMPARISONS = {"<": "LT", ">": "GT", "==": "EQ", "!=": "NE", "<=": "LE", ">=": "GE"}
+UNARY_OPS = {"+": "UPLUS", "-": "UMINUS", "~": "BITNOT", "not": "NOT", "!": "NOT"}
+
+# as in the stack VM's handlers
+OPERATORS = {
+    "ADD": operator.add, "SUB": operator.sub, "MUL": operator.mul, "DIV": operator.truediv,
+    "FLOORDIV": operator.floordiv, "MODULO": operator.mod, "POW": operator.pow,
+    "BITAND": operator.and_, "BITOR": operator.or_, "BITXOR": operator.xor,
+    "LSHIFT": operator.lshift, "RSHIFT": operator.rshift,
+    "UPLUS": operator.pos, "UMINUS": operator.neg, "BITNOT": operator.invert, "NOT": operator.not_,
+    **COMPARE,
+}
+
+# property operations storing the changed receiver back into its variable, as in codegen
+STORED_BACK = {"PopFront", "PopBack", "PushBack", "PushFront", "Clear", "Insert", "Remove", "Add"}
+
+CALL, RETURN = -1, -2  # what a handler returns to leave its frame, instead of an index
+
+
+class Unbound:
+    """The value of a variable whose declaration has not run yet (see `FunctionCompiler.prebind`)."""
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "UNBOUND"  # a cached program unpickles to this very instance
+
+    def __repr__(self):
+        return "UNBOUND"
+
+
+UNBOUND = Unbound()
+
+
+class Label:
+    __slots__ = ("target",)
+
+    def __init__(self):
+        self.target = -1
+
+
+class Proto:
+    """One compiled function (the main program is `protos[0]`)."""
+    __slots__ = ("name", "nparams", "nregs", "consts", "code")
+
+    def __init__(self, name, nparams):
+        self.name = name
+        self.nparams = nparams
+        self.nregs = 1 + nparams  # r0: the defining frame
+        self.consts = {}  # register -> constant it holds
+        self.code = []  # instructions: (name, operands...)
+
+
+class RegisterCode:
+    """The compiled program: its functions, main program first."""
+    __slots__ = ("protos",)
+
+    def __init__(self, protos):
+        self.protos = protos
+
+    def print_bytecode(self):
+        for index, proto in enumerate(self.protos):
+            consts = ", ".join(f"r{reg}={value!r}" for reg, value in proto.consts.items())
+            print(f"function {index} {proto.name} ({proto.nparams} params, {proto.nregs} registers; {consts})")
+            for i, (name, *operands) in enumerate(proto.code):
+                print(f"{i:=4} {name:<15} {', '.join(map(repr, operands))}")
+
+
+def compile_registers(source_code, optimize=True):
+    """`(RegisterCode, symbol table)` of a program, as `compile_program` for the stack VM."""
+    ast, symbol_table = parse(source_code, SymbolTable())
+    if optimize:
+        ast, symbol_table = optimizer.optimize(ast, symbol_table)
+    return RegisterCompiler().compile(ast), symbol_table
+
+
+class RegisterCompiler:
+    """
+    Compiles a program into `Proto`s. Each function body is compiled after the function it is
+    declared in, so that every name of the enclosing scopes (globals declared after a function
+    included) is known by then.
+    """
+
+    def __init__(self):
+        self.protos = []
+        self.pending = []  # (compiler of the function's Proto, its body) left to compile
+
+    def compile(self, tree):
+        main = FunctionCompiler(self, Proto("main", 0), [], tree, [], 0)
+        self.protos.append(main.proto)
+        for stmt in statements_of(tree):  # the global scope declares all its names up front
+            if isinstance(stmt, VarBind):
+                main.bind(stmt.var_name)
+        result = main.temp()
+        main.into(tree, result)
+        main.emit("RETURN", result)
+        main.finish()
+        while self.pending:
+            function, body = self.pending.pop()
+            function.prebind([statements_of(body)])
+            result = function.temp()
+            function.into(body, result)
+            function.emit("RETURN", result)
+            function.finish()
+        return RegisterCode(self.protos)
+
+    def declare(self, name, params, body, scopes, level):
+        """The index of the `Proto` of a function, compiled later."""
+        function = FunctionCompiler(self, Proto(name, len(params)), params, body, scopes, level)
+        self.protos.append(function.proto)
+        self.pending.append((function, body))
+        return len(self.protos) - 1
+
+
+class FunctionCompiler:
+    """The code of one function; `into` compiles a node to leave its value in a register."""
+
+    def __init__(self, compiler, proto, params, body, scopes, level):
+        self.compiler = compiler
+        self.proto = proto
+        self.level = level  # how many functions it is nested in
+        self.code = proto.code
+        self.consts = {}  # (type, value) -> register
+        self.temps, self.free = [], []  # temporaries in use, and free for reuse
+        self.loops = []  # (continue label, break label) of the enclosing loops
+        self.labels = []
+        self.placed = -1  # where the last label was placed
+        names = {}
+        for i, param in enumerate(params, 1):
+            names[param[0]] = i
+        # (level, {name: register}, {name: register of a declaration yet to run}), innermost last
+        self.scopes = scopes + [(level, names, {})]
+        # names the functions declared in this one may assign: a call may change those
+        self.nested_writes = set()
+        for node in walk(body):
+            if isinstance(node, FuncDef):
+                self.nested_writes.update(written_names(node.funcBody))
+
+    # registers
+
+    def register(self):
+        reg = self.proto.nregs
+        self.proto.nregs += 1
+        return reg
+
+    def const(self, value):
+        # keeps 1, 1.0 and True apart, and 0.0 and -0.0
+        key = (type(value), value, math.copysign(1.0, value) if isinstance(value, float) else None)
+        reg = self.consts.get(key)
+        if reg is None:
+            reg = self.consts[key] = self.register()
+            self.proto.consts[reg] = value
+        return reg
+
+    def temp(self):
+        reg = self.free.pop() if self.free else self.register()
+        self.temps.append(reg)
+        return reg
+
+    def release(self, mark):
+        while len(self.temps) > mark:
+            self.free.append(self.temps.pop())
+
+    def resolve(self, name):
+        """`(depth, register)` of the variable `name`, or None when none is in scope."""
+        for level, names, _ in reversed(self.scopes):
+            if name in names:
+                return self.level - level, names[name]
+        return None
+
+    def unbound(self, name):
+        """The register of a declaration of `name` in this function that may not have run yet,
+        and would then hide the variable `resolve` finds; or None."""
+        for level, names, unbound in reversed(self.scopes):
+            if name in names or level != self.level:
+                return None
+            if name in unbound:
+                return unbound[name]
+        return None
+
+    def bind(self, name):
+        """The register of `name` declared in the innermost scope."""
+        names = self.scopes[-1][1]
+        if name not in names:
+            names[name] = self.register()
+        return names[name]
+
+    # code
+
+    def emit(self, *insn):
+        self.code.append(insn)
+
+    def label(self):
+        label = Label()
+        self.labels.append(label)
+        return label
+
+    def place(self, label):
+        label.target = self.placed = len(self.code)
+
+    def jump(self, label):
+        # none needed after a jump or return nothing else jumps past
+        if not (self.code and self.placed != len(self.code)
+                and self.code[-1][0] in ("JUMP", "RETURN", "TAIL_CALL")):
+            self.emit("JUMP", label)
+
+    def finish(self):
+        # labels -> instruction indexes
+        for i, insn in enumerate(self.code):
+            if any(isinstance(operand, Label) for operand in insn):
+                self.code[i] = tuple(op.target if isinstance(op, Label) else op for op in insn)
+
+    def block(self):
+        self.scopes.append((self.level, {}, {}))
+
+    def prebind(self, runs):
+        """
+        Bind the names the scope just opened declares and refers to before the declaration, as
+        the tree walker's scopes do: an untyped `var` holds None from the start of the scope;
+        any other is unbound until its declaration runs, the name meaning the enclosing
+        variable until then. `runs` are the scope's nodes in the order they run.
+        """
+        _, names, unbound = self.scopes[-1]
+        for name, category in early_declarations(runs).items():
+            if name in names:
+                continue
+            reg = self.register()
+            if category == SymbolCategory.VARIABLE:
+                names[name] = reg
+                self.emit("MOVE", reg, self.const(None))
+            else:
+                unbound[name] = reg
+                self.emit("MOVE", reg, self.const(UNBOUND))
+
+    def pick(self, name, reg, dst):
+        # `dst` = the declaration in `reg` if it has run, else the enclosing variable `name`
+        outer, end = self.label(), self.label()
+        self.emit("JUMP_IF_UNBOUND", reg, outer)
+        self.emit("MOVE", dst, reg)
+        self.emit("JUMP", end)
+        self.place(outer)
+        found = self.resolve(name)
+        if found is None:
+            self.emit("ERROR", f"Variable '{name}' not defined")
+        elif found[0] == 0:
+            self.emit("MOVE", dst, found[1])
+        else:
+            self.emit("LOAD_UP", dst, *found)
+        self.place(end)
+
+    def put(self, name, reg, value):
+        # the declaration in `reg` = `value` if it has run, else the enclosing variable `name`
+        outer, end = self.label(), self.label()
+        self.emit("JUMP_IF_UNBOUND", reg, outer)
+        self.emit("MOVE", reg, value)
+        self.emit("JUMP", end)
+        self.place(outer)
+        found = self.resolve(name)
+        if found is None:
+            self.emit("ERROR", f"Variable '{name}' not defined")
+        elif found[0] == 0:
+            self.emit("MOVE", found[1], value)
+        else:
+            self.store(found, value)
+        self.place(end)
+
+    def end_block(self):
+        self.scopes.pop()
+
+    # nodes
+
+    def expr(self, node):
+        """A register holding the value of `node`; don't write to it."""
+        match node:
+            case Number():
+                return self.const(node.value)
+            case String() | Boolean():
+                return self.const(node.val)
+            case Variable(name):
+                found = self.resolve(name)
+                if found is not None and found[0] == 0 and self.unbound(name) is None:
+                    return found[1]
+        reg = self.temp()
+        self.into(node, reg)
+        return reg
+
+    def operands(self, nodes):
+        """The registers of `nodes`, evaluated in order: a variable read before a later node
+        that may assign it is copied first."""
+        regs = []
+        for i, node in enumerate(nodes):
+            reg = self.expr(node)
+            if (isinstance(node, Variable) and reg not in self.temps
+                    and any(self.may_change(node.var_name, later) for later in nodes[i + 1:])):
+                self.emit("MOVE", copy := self.temp(), reg)
+                reg = copy
+            regs.append(reg)
+        return regs
+
+    def may_change(self, name, node):
+        if not isinstance(node, AST):
+            return False
+        if name in written_names(node):
+            return True
+        return name in self.nested_writes and any(isinstance(n, FuncCall) for n in walk(node))
+
+    def variable(self, name):
+        """A register holding the variable `name`, and where to store it back if not local:
+        its `(depth, register)`, or `(None, register, name)` for a declaration yet to run."""
+        unbound = self.unbound(name)
+        if unbound is not None:
+            temp = self.temp()
+            self.pick(name, unbound, temp)
+            return temp, (None, unbound, name)
+        found = self.resolve(name)
+        if found is None:
+            if name in BUILTINS:  # as LOAD in the stack VM
+                return self.const(BUILTINS[name]), None
+            self.emit("ERROR", f"Variable '{name}' not defined")
+            return self.const(None), None
+        depth, reg = found
+        if depth == 0:
+            return reg, None
+        temp = self.temp()
+        self.emit("LOAD_UP", temp, depth, reg)
+        return temp, found
+
+    def store(self, found, reg):
+        # the value of a variable not in a register of its own, loaded by `variable`, back in place
+        if found is None:
+            return
+        if found[0] is None:
+            self.put(found[2], found[1], reg)
+        else:
+            self.emit("STORE_UP", found[0], found[1], reg)
+
+    def statement(self, node):
+        mark = len(self.temps)
+        self.into(node, None)
+        self.release(mark)
+
+    def target(self, dst):
+        return self.temp() if dst is None else dst
+
+    def into(self, node, dst):
+        """Compile `node`, leaving its value in register `dst` (unless None: value unused)."""
+        match node:
+            case Number() | String() | Boolean():
+                if dst is not None:
+                    self.emit("MOVE", dst, self.expr(node))
+
+            case Variable(name):
+                found = self.resolve(name)
+                if self.unbound(name) is not None:
+                    self.pick(name, self.unbound(name), self.target(dst))
+                elif found is not None and found[0] > 0:
+                    self.emit("LOAD_UP", self.target(dst), *found)
+                else:
+                    reg = self.variable(name)[0]
+                    if dst is not None:
+                        self.emit("MOVE", dst, reg)
+
+            # OPERATORS
+            case BinOp("and" | "or" as op, left, right):
+                dst = self.target(dst)
+                short, end = self.label(), self.label()
+                value = self.expr(left)
+                self.emit("JUMP_IF_FALSE" if op == "and" else "JUMP_IF_TRUE", value, short)
+                self.into(right, dst)
+                if value != dst:
+                    self.jump(end)
+                    self.place(short)
+                    self.emit("MOVE", dst, value)
+                else:
+                    self.place(short)
+                self.place(end)
+
+            case BinOp("not" | "~" as op, left, _):  # unary operators
+                self.emit(UNARY_OPS[op], self.target(dst), self.expr(left))
+
+            case BinOp():
+                # a left-leaning chain `a + b - c ...` goes innermost first, without recursing down it
+                chain = [node]
+                while isinstance(chain[-1].left, BinOp) and chain[-1].left.op in BINARY_OPS:
+                    chain.append(chain[-1].left)
+                value = None  # the temporary holding the chain so far
+                for link in reversed(chain):
+                    if link.op not in BINARY_OPS:
+                        raise NotImplementedError(f"The register VM has no operator '{link.op}'")
+                    if value is None:
+                        a, b = self.operands([link.left, link.right])
+                    else:
+                        a, b = value, self.expr(link.right)
+                    if link is node:
+                        value = self.target(dst)
+                    elif value is None:
+                        value = self.temp()
+                    self.emit(BINARY_OPS[link.op], value, a, b)
+
+            case UnaryOp("ascii" | "char" as op, val):
+                self.emit("CALL_BUILTIN", self.target(dst), op, (self.expr(val),))
+
+            case UnaryOp(op, val):
+                self.emit(UNARY_OPS[op], self.target(dst), self.expr(val))
+
+            # VARIABLES
+            case VarBind(name, dtype, val, _):
+                _, names, unbound = self.scopes[-1]
+                reg = names[name] if name in names else unbound[name] if name in unbound else self.register()
+                self.into(val, reg)  # before binding: the value may read an outer `name`
+                if dtype and node.cast:
+                    self.emit("CAST", reg, reg, dtype)
+                unbound.pop(name, None)
+                names[name] = reg
+                if dst is not None:
+                    self.emit("MOVE", dst, reg)
+
+            case UpdateVar(name, val):
+                found = self.resolve(name)
+                if self.unbound(name) is not None:
+                    reg = self.expr(val)
+                    self.put(name, self.unbound(name), reg)
+                elif found is None or found[0] == 0:
+                    reg = self.bind(name) if found is None else found[1]  # as STORE in the stack VM
+                    self.into(val, reg)
+                else:
+                    reg = self.expr(val)
+                    self.store(found, reg)
+                if dst is not None and dst != reg:
+                    self.emit("MOVE", dst, reg)
+
+            case CompoundAssignment(name, op, val):
+                found = self.resolve(name)
+                if self.unbound(name) is not None:
+                    reg, found = self.variable(name)  # a temporary, stored back below
+                    self.emit(BINARY_OPS[op[0]], reg, reg, self.expr(val))
+                    self.store(found, reg)
+                    if dst is not None:
+                        self.emit("MOVE", dst, reg)
+                    return
+                if found is None:
+                    self.emit("ERROR", f"Variable '{name}' not defined")
+                    return self.into(None, dst)
+                if found[0] == 0:
+                    reg = found[1]
+                    a, b = self.operands([Variable(name), val])  # the value before `val` runs
+                else:
+                    reg = a = self.variable(name)[0]
+                    b = self.expr(val)
+                self.emit(BINARY_OPS[op[0]], reg, a, b)
+                if found[0] > 0:
+                    self.store(found, reg)
+                if dst is not None:
+                    self.emit("MOVE", dst, reg)
+
+            # PROPERTIES
+            case ArrayLen() | StrLen() | HashLen():
+                self.emit("LEN", self.target(dst), self.variable(node.var_name)[0])
+
+            case StrSlice(name, _, args):
+                reg = self.variable(name)[0]
+                self.emit("SLICE", self.target(dst), reg, tuple(self.operands(args)))
+
+            case ArrayAppend(name, _, [arg]):
+                reg, found = self.variable(name)
+                self.emit("APPEND", reg, self.expr(arg))
+                self.store(found, reg)
+                if dst is not None:
+                    self.emit("MOVE", dst, reg)
+
+            case PropertyAccess(name, operation, args):
+                reg, found = self.variable(name)
+                args = self.operands(list(reversed(args)))  # in stack order, as codegen pushes them
+                stored = operation in STORED_BACK
+                self.emit("PROPERTY", self.target(dst), reg, operation, tuple(args), stored)
+                if stored:
+                    self.store(found, reg)
+
+            # ARRAYS AND HASHES
+            case Array(elements):
+                self.emit("NEW_ARRAY", self.target(dst), tuple(self.operands(elements)))
+
+            case Hash(pairs):
+                regs = self.operands([item for pair in pairs for item in pair])
+                self.emit("NEW_HASH", self.target(dst), tuple(regs))
+
+            case CallArr(name, indices) | CallHashVal(name, indices):
+                container = self.variable(name)[0]
+                indices = self.operands(indices)
+                if len(indices) == 2:
+                    self.emit("GET2", self.target(dst), container, *indices)
+                    return
+                for index in indices[:-1]:
+                    self.emit("GET", temp := self.temp(), container, index)
+                    container = temp
+                self.emit("GET", self.target(dst), container, indices[-1])
+
+            case AssigntoArr(name, indices, val) | AssignHashVal(name, indices, val):
+                reg, found = self.variable(name)
+                *indices, value = self.operands([*indices, val])
+                container = reg
+                for index in indices[:-1]:
+                    self.emit("GET", temp := self.temp(), container, index)
+                    container = temp
+                self.emit("SET", container, indices[-1], value)
+                if container == reg:  # a string is replaced rather than changed
+                    self.store(found, reg)
+                if dst is not None:
+                    self.emit("MOVE", dst, value)
+
+            # CONTROL FLOW
+            case If(cond, then_body, else_body, _):
+                other, end = self.label(), self.label()
+                self.block()
+                self.prebind([[cond, *statements_of(then_body)], [cond, *statements_of(else_body)]])
+                self.branch(cond, other, False)
+                self.into(then_body, dst)
+                if else_body is not None or dst is not None:
+                    self.jump(end)
+                self.place(other)
+                if else_body is not None:
+                    self.into(else_body, dst)
+                elif dst is not None:
+                    self.emit("MOVE", dst, self.const(None))
+                self.place(end)
+                self.end_block()
+
+            case WhileLoop(cond, body, _):
+                body_start, test, end = self.label(), self.label(), self.label()
+                self.block()
+                self.prebind([[cond, *statements_of(body)]])
+                self.emit("JUMP", test)
+                self.place(body_start)
+                self.loop(body, test, end)
+                self.place(test)
+                self.branch(cond, body_start, True)
+                self.place(end)
+                self.end_block()
+                self.into(None, dst)
+
+            case ForLoop(init, cond, incr, body, _):
+                body_start, step, test, end = self.label(), self.label(), self.label(), self.label()
+                self.block()
+                self.prebind([[init, cond, *statements_of(body), incr]])
+                self.statement(init)
+                self.emit("JUMP", test)
+                self.place(body_start)
+                self.loop(body, step, end)
+                self.place(step)
+                self.statement(incr)
+                self.place(test)
+                self.branch(cond, body_start, True)
+                self.place(end)
+                self.end_block()
+                self.into(None, dst)
+
+            case Repeat(times, body, _):
+                body_start, step, test, end = self.label(), self.label(), self.label(), self.label()
+                self.block()
+                self.prebind([[times, *statements_of(body)]])
+                limit, counter = self.register(), self.register()
+                self.into(times, limit)
+                self.emit("MOVE", counter, self.const(0))
+                self.emit("JUMP", test)
+                self.place(body_start)
+                self.loop(body, step, end)
+                self.place(step)
+                self.emit("ADD", counter, counter, self.const(1))
+                self.place(test)
+                self.emit("JUMP_IF", "LT", counter, limit, body_start)
+                self.place(end)
+                self.end_block()
+                self.into(None, dst)
+
+            case BreakOut() | MoveOn():
+                if not self.loops:
+                    raise ValueError(f"{type(node).__name__} statement outside of loop")
+                self.emit("JUMP", self.loops[-1][isinstance(node, BreakOut)])
+
+            case Return(value):
+                self.emit("RETURN", self.expr(value))
+
+            case Break():
+                self.emit("RETURN", self.const(None))
+
+            case Statements(statements):
+                if not statements:
+                    self.into(None, dst)
+                for stmt in statements[:-1]:
+                    self.statement(stmt)
+                if statements:
+                    self.into(statements[-1], dst)
+
+            # FUNCTIONS
+            case FuncDef(name, params, body, _):
+                reg = self.bind(name)  # before the body is compiled: it may call itself
+                index = self.compiler.declare(name, params, body, list(self.scopes), self.level + 1)
+                self.emit("CLOSURE", reg, index)
+                if dst is not None:
+                    self.emit("MOVE", dst, reg)
+
+            case FuncCall(name, args):
+                if isinstance(name, CallArr):
+                    fn = self.expr(name)
+                else:
+                    fn = None if self.resolve(name) is None else self.variable(name)[0]
+                args = tuple(self.operands(args))
+                if fn is None:
+                    if name in BUILTINS:
+                        self.emit("CALL_BUILTIN", self.target(dst), name, args)
+                    else:
+                        self.emit("ERROR", f"Function '{name}' not defined")
+                        self.into(None, dst)
+                elif node.tail and self.level > 0:
+                    self.emit("TAIL_CALL", fn, args, str(name))
+                else:
+                    self.emit("CALL", self.target(dst), fn, args, str(name))
+
+            # FEATURES
+            case Display(val):
+                self.emit("PRINT", self.expr(val))
+                self.into(None, dst)
+
+            case DisplayL(val):
+                self.emit("PRINTLN", self.expr(val))
+                self.into(None, dst)
+
+            case TypeCast(dtype, val):
+                self.emit("CAST", self.target(dst), self.expr(val), dtype)
+
+            case TypeOf(val):
+                self.emit("CALL_BUILTIN", self.target(dst), "typeof", (self.expr(val),))
+
+            case MathFunction(name, args):
+                builtin = f"math_{name.lower()}"
+                args = tuple(self.operands(args))
+                if builtin not in BUILTINS:
+                    self.emit("ERROR", f"Function '{builtin}' not defined")
+                    self.into(None, dst)
+                else:
+                    self.emit("CALL_BUILTIN", self.target(dst), builtin, args)
+
+            case FormatString(template, names):
+                regs = [self.variable(name)[0] for name in names]
+                self.emit("FORMAT", self.target(dst), template, tuple(names), tuple(regs))
+
+            case Feed(msg):
+                self.emit("INPUT", self.target(dst), self.expr(msg))
+
+            case None:
+                if dst is not None:
+                    self.emit("MOVE", dst, self.const(None))
+
+            case AST():
+                raise NotImplementedError(f"The register VM cannot compile {type(node).__name__}")
+
+    def loop(self, body, next_label, end_label):
+        self.loops.append((next_label, end_label))
+        self.statement(body)
+        self.loops.pop()
+
+    def branch(self, cond, label, when):
+        """Jump to `label` if the truth of `cond` is `when`; else fall through."""
+        match cond:
+            case BinOp(op, left, right) if op in COMPARISONS:
+                a, b = self.operands([left, right])
+                self.emit("JUMP_IF" if when else "JUMP_UNLESS", COMPARISONS[op], a, b, label)
+            case BinOp("and" | "or" as op, left, right):
+                if (op == "and") == when:  # both sides needed to take the jump
+                    skip = self.label()
+                    self.branch(left, skip, not when)
+                    self.branch(right, label, when)
+                    self.place(skip)
+                else:  # either side takes it
+                    self.branch(left, label, when)
+                    self.branch(right, label, when)
+            case UnaryOp("not" | "!", val):
+                self.branch(val, label, not when)
+            case Number() | String() | Boolean():
+                if bool(self.proto.consts[self.expr(cond)]) == when:
+                    self.emit("JUMP", label)
+            case _:
+                self.emit("JUMP_IF_TRUE" if when else "JUMP_IF_FALSE", self.expr(cond), label)
+
+
+def statements_of(body):
+    """The statements of a block, `if` branch or function body."""
+    if body is None:
+        return []
+    return body.statements if isinstance(body, Statements) else [body]
+
+
+def early_declarations(runs):
+    """{name: category} of the `var`s directly in `runs` (lists of nodes, in the order they run)
+    whose name is referred to before them."""
+    early = {}
+    for run in runs:
+        seen = set()
+        for node in run:
+            if isinstance(node, VarBind):
+                seen |= referenced(node.val)
+                if node.var_name in seen:
+                    early[node.var_name] = node.category
+            else:
+                seen |= referenced(node)
+    return early
+
+
+def referenced(root):
+    """The variable names the nodes below `root` read or write, outside function bodies."""
+    names, stack = set(), [root]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, AST) or isinstance(node, FuncDef):
+            continue
+        for attr in ("var_name", "xname", "name", "funcName"):
+            name = getattr(node, attr, None)
+            if isinstance(name, str) and not isinstance(node, VarBind):
+                names.add(name)
+        if isinstance(node, FormatString):
+            names.update(node.variables)
+        stack.extend(children(node))
+    return names
+
+
+class Function:
+    """A function value: its handlers, the template of its frames, and the frame it was defined in."""
+    __slots__ = ("name", "nparams", "handlers", "template", "env")
+
+    def __init__(self, proto, handlers, template, env):
+        self.name = proto.name
+        self.nparams = proto.nparams
+        self.handlers = handlers
+        self.template = template
+        self.env = env
+
+    def __repr__(self):
+        return f"<function {self.name}>"
+
+
+class RegisterVM:
+    """Runs a `RegisterCode`."""
+    # the stack VM's, on the operand stack below
+    push, pop = BytecodeVM.push, BytecodeVM.pop
+    property_access = BytecodeVM.property_access
+    perform_typecast = BytecodeVM.perform_typecast
+
+    def __init__(self, program):
+        self.program = program
+        self.stack = []  # operands of `property_access`
+        self.builtins = BUILTINS
+        self.calls = []  # (handlers, registers, return index, result register) of each caller
+        self.entering = None  # (handlers, registers) of the frame a call enters
+        self.result = None  # value being returned
+        self.templates = []
+        for proto in program.protos:
+            template = [None] * proto.nregs
+            for reg, value in proto.consts.items():
+                template[reg] = value
+            self.templates.append(template)
+        self.handlers = []  # of each function, by `thread_registers`
+
+    def run(self):
+        """Run the program; returns the value of its last statement."""
+        self.handlers = [thread_registers(self, proto) for proto in self.program.protos]
+        calls = self.calls
+        code, regs = self.handlers[0], self.templates[0].copy()
+        pc = 0
+        while True:
+            while pc >= 0:
+                pc = code[pc](regs)
+            if pc == CALL:
+                code, regs = self.entering
+                pc = 0
+            elif calls:
+                code, regs, pc, dst = calls.pop()
+                regs[dst] = self.result
+            else:
+                return self.result
+
+    def property(self, operation, obj, args):
+        """`(value, receiver after)` of `obj.operation(args)`, by `property_access`."""
+        stack = self.stack
+        stack.append(obj)
+        stack.extend(args)
+        self.property_access(operation)
+        obj = stack.pop() if operation in STORED_BACK and stack else obj
+        value = stack.pop() if stack else obj if operation in STORED_BACK else None
+        stack.clear()
+        return value, obj
+
+
+def thread_registers(vm, proto):
+    """The handler of each instruction of `proto`, for `RegisterVM.run`: each takes the frame's
+    registers and returns the index of the next instruction (or CALL or RETURN)."""
+    handlers = []
+    calls = vm.calls
+
+    def enter(fn, frame, args, regs):
+        # the arguments bound to the parameters, as many as there are of either
+        for i, reg in enumerate(args[:fn.nparams], 1):
+            frame[i] = regs[reg]
+        frame[0] = fn.env
+        vm.entering = fn.handlers, frame
+        return CALL
+
+    def handler(i, insn):
+        nxt = i + 1
+        match insn:
+            case ("MOVE", d, s):
+                def move(regs):
+                    regs[d] = regs[s]
+                    return nxt
+                return move
+            case ("LOAD_UP", d, depth, s):
+                if depth == 1:
+                    def load_up(regs):
+                        regs[d] = regs[0][s]
+                        return nxt
+                    return load_up
+                def load_up_far(regs):
+                    frame = regs[0]
+                    for _ in range(depth - 1):
+                        frame = frame[0]
+                    regs[d] = frame[s]
+                    return nxt
+                return load_up_far
+            case ("STORE_UP", depth, d, s):
+                def store_up(regs):
+                    frame = regs[0]
+                    for _ in range(depth - 1):
+                        frame = frame[0]
+                    frame[d] = regs[s]
+                    return nxt
+                return store_up
+
+            case ("ADD", d, a, b):
+                def add(regs):
+                    regs[d] = regs[a] + regs[b]
+                    return nxt
+                return add
+            case ("SUB", d, a, b):
+                def sub(regs):
+                    regs[d] = regs[a] - regs[b]
+                    return nxt
+                return sub
+            case ("MUL", d, a, b):
+                def mul(regs):
+                    regs[d] = regs[a] * regs[b]
+                    return nxt
+                return mul
+            case ("MODULO", d, a, b):
+                def modulo(regs):
+                    regs[d] = regs[a] % regs[b]
+                    return nxt
+                return modulo
+            case (op, d, a, b) if op in OPERATORS:
+                fn = OPERATORS[op]
+                def binary(regs):
+                    regs[d] = fn(regs[a], regs[b])
+                    return nxt
+                return binary
+            case (op, d, a) if op in OPERATORS:
+                fn = OPERATORS[op]
+                def unary(regs):
+                    regs[d] = fn(regs[a])
+                    return nxt
+                return unary
+
+            case ("JUMP", target):
+                return lambda regs: target
+            case ("JUMP_IF_TRUE", r, target):
+                return lambda regs: target if regs[r] else nxt
+            case ("JUMP_IF_FALSE", r, target):
+                return lambda regs: nxt if regs[r] else target
+            case ("JUMP_IF_UNBOUND", r, target):
+                return lambda regs: target if regs[r] is UNBOUND else nxt
+            case ("JUMP_IF", op, a, b, target):
+                return compare_branch(op, a, b, target, nxt)
+            case ("JUMP_UNLESS", op, a, b, target):
+                return compare_branch(op, a, b, nxt, target)
+
+            case ("GET", d, o, k):
+                def get(regs):
+                    regs[d] = regs[o][regs[k]]
+                    return nxt
+                return get
+            case ("GET2", d, o, k, k2):
+                def get2(regs):
+                    regs[d] = regs[o][regs[k]][regs[k2]]
+                    return nxt
+                return get2
+            case ("SET", o, k, v):
+                def set_item(regs):
+                    obj = regs[o]
+                    if type(obj) is str:
+                        index = regs[k]
+                        regs[o] = obj[:index] + regs[v] + obj[index + 1:]
+                    else:
+                        obj[regs[k]] = regs[v]
+                    return nxt
+                return set_item
+            case ("NEW_ARRAY", d, items):
+                def new_array(regs):
+                    regs[d] = [regs[r] for r in items]
+                    return nxt
+                return new_array
+            case ("NEW_HASH", d, items):
+                keys, values = items[::2], items[1::2]
+                def new_hash(regs):
+                    regs[d] = {regs[k]: regs[v] for k, v in zip(keys, values)}
+                    return nxt
+                return new_hash
+            case ("LEN", d, o):
+                def length(regs):
+                    obj = regs[o]
+                    regs[d] = len(obj) if type(obj) in (list, str, dict) else vm.property("Length", obj, ())[0]
+                    return nxt
+                return length
+            case ("APPEND", o, v):
+                def append(regs):
+                    obj = regs[o]
+                    if type(obj) is list:
+                        obj.append(regs[v])
+                    else:
+                        regs[o] = vm.property("PushBack", obj, (regs[v],))[1]
+                    return nxt
+                return append
+            case ("SLICE", d, o, args):
+                def slice_(regs):
+                    obj = regs[o]
+                    bounds = [regs[r] for r in args]
+                    if type(obj) is str:
+                        regs[d] = obj[slice(*bounds)] if len(bounds) > 1 else obj[bounds[0]:]
+                    else:  # the stack VM's generic Slice, arguments in stack order
+                        regs[d] = vm.property("Slice", obj, bounds[::-1])[0]
+                    return nxt
+                return slice_
+            case ("PROPERTY", d, o, operation, args, stored):
+                def property_(regs):
+                    value, obj = vm.property(operation, regs[o], [regs[r] for r in args])
+                    if stored:
+                        regs[o] = obj
+                    regs[d] = value
+                    return nxt
+                return property_
+
+            case ("CALL", d, f, args, name):
+                own = handlers
+                if len(args) == 1:
+                    a, = args
+                    def call1(regs):
+                        fn = regs[f]
+                        if type(fn) is not Function:
+                            raise RuntimeError(f"Function '{name}' not defined")
+                        frame = fn.template.copy()
+                        frame[0] = fn.env
+                        if fn.nparams:
+                            frame[1] = regs[a]
+                        calls.append((own, regs, nxt, d))
+                        vm.entering = fn.handlers, frame
+                        return CALL
+                    return call1
+                def call(regs):
+                    fn = regs[f]
+                    if type(fn) is not Function:
+                        raise RuntimeError(f"Function '{name}' not defined")
+                    calls.append((own, regs, nxt, d))
+                    return enter(fn, fn.template.copy(), args, regs)
+                return call
+            case ("TAIL_CALL", f, args, name):
+                def tail_call(regs):
+                    fn = regs[f]
+                    if type(fn) is not Function:
+                        raise RuntimeError(f"Function '{name}' not defined")
+                    return enter(fn, fn.template.copy(), args, regs)
+                return tail_call
+            case ("RETURN", r):
+                def return_(regs):
+                    vm.result = regs[r]
+                    return RETURN
+                return return_
+            case ("CLOSURE", d, index):
+                callee = vm.program.protos[index]
+                template = vm.templates[index]
+                def closure(regs):
+                    regs[d] = Function(callee, vm.handlers[index], template, regs)
+                    return nxt
+                return closure
+            case ("CALL_BUILTIN", d, name, args):
+                fn = BUILTINS[name][0]
+                if len(args) == 1:
+                    a, = args
+                    def call_builtin1(regs):
+                        regs[d] = fn(regs[a])
+                        return nxt
+                    return call_builtin1
+                def call_builtin(regs):
+                    regs[d] = fn(*[regs[r] for r in args])
+                    return nxt
+                return call_builtin
+
+            case ("PRINT", r):
+                def print_value(regs):
+                    print(regs[r], end="")
+                    return nxt
+                return print_value
+            case ("PRINTLN", r):
+                def print_line(regs):
+                    print(regs[r])
+                    return nxt
+                return print_line
+            case ("CAST", d, s, dtype):
+                def cast(regs):
+                    regs[d] = vm.perform_typecast(regs[s], dtype)
+                    return nxt
+                return cast
+            case ("FORMAT", d, template, names, regs_):
+                fields = ["{" + name + "}" for name in names]
+                def format_string(regs):
+                    text = template
+                    for field, r in zip(fields, regs_):
+                        text = text.replace(field, str(regs[r]))
+                    regs[d] = text
+                    return nxt
+                return format_string
+            case ("INPUT", d, r):
+                def read(regs):
+                    regs[d] = input(regs[r])
+                    return nxt
+                return read
+            case ("ERROR", message):
+                def error(regs):
+                    raise RuntimeError(message)
+                return error
+        raise RuntimeError(f"Unknown instruction: {insn[0]}")
+
+    def compare_branch(op, a, b, taken, not_taken):
+        # to `taken` if `regs[a] <op> regs[b]`, else to `not_taken`
+        match op:
+            case "LT": return lambda regs: taken if regs[a] < regs[b] else not_taken
+            case "LE": return lambda regs: taken if regs[a] <= regs[b] else not_taken
+            case "GT": return lambda regs: taken if regs[a] > regs[b] else not_taken
+            case "GE": return lambda regs: taken if regs[a] >= regs[b] else not_taken
+            case "EQ": return lambda regs: taken if regs[a] == regs[b] else not_taken
+            case "NE": return lambda regs: taken if regs[a] != regs[b] else not_taken
+
+    handlers.extend(handler(i, insn) for i, insn in enumerate(proto.code))
+    return handlers
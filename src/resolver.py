@@ -0,0 +1,54 @@
+"""
+Name resolution for the tree-walking evaluator.
+
+`resolve` runs once over a parsed program and gives every `Variable`, `UpdateVar` and
+`CompoundAssignment` the static address of the variable it names: `depth`, the number of
+scopes to walk out from the one the node is evaluated in, and `slot`, the index of the name
+in that scope's layout. The scopes are the parse-time `SymbolTable`s the parser hangs on
+`If`, `WhileLoop`, `ForLoop`, `Repeat` and `FuncDef`; the runtime tables the evaluator makes
+for them share their layout, so the address stays valid at run time. A scope that declares
+nothing gets no runtime table (see `SymbolTable.instantiate`) and is not counted in `depth`.
+
+Names the parser never declared are left unresolved and are looked up by name.
+"""
+from dataclasses import fields
+from parser import AST, Variable, UpdateVar, CompoundAssignment, If, WhileLoop, ForLoop, Repeat, FuncDef
+
+
+def address_of(name, tS):
+    """(depth, slot) of the nearest declaration of `name` seen from `tS`, or (None, None)."""
+    depth = 0
+    while tS is not None:
+        if tS.inScope(name):
+            return depth, tS.layout.slots[name]
+        if tS.layout.names:  # a scope declaring nothing gets no runtime table
+            depth += 1
+        tS = tS.parent
+    return None, None
+
+
+def children(node):
+    """AST nodes directly below `node` (through lists and tuples, never into scopes)."""
+    pending = [getattr(node, f.name) for f in fields(node)]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, AST):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+
+
+def resolve(ast, tS):
+    """Annotate the program `ast`, parsed in global scope `tS`, in place; returns `(ast, tS)`."""
+    stack = [(ast, tS)]  # explicit stack: expression chains can nest far deeper than Python recursion
+    while stack:
+        node, scope = stack.pop()
+        match node:
+            case Variable(name) | UpdateVar(name, _) | CompoundAssignment(name, _, _):
+                node.depth, node.slot = address_of(name, scope)
+            case If(_, _, _, inner) | WhileLoop(_, _, inner) | ForLoop(_, _, _, _, inner) | Repeat(_, _, inner):
+                scope = inner  # condition and body are evaluated in the block's scope
+            case FuncDef(_, _, _, inner):
+                scope = inner
+        stack.extend((child, scope) for child in children(node))
+    return ast, tS
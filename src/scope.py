@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 from enum import Enum
 from pprint import pprint
-from copy import copy
+from copy import copy, deepcopy
 
 class SymbolCategory(Enum):
     VARIABLE = "variable"
@@ -26,69 +26,163 @@ def map_type_to_enum(type_str: str) -> SymbolCategory:
     }
     return type_mapping.get(type_str, None)
 
+class ScopeLayout:
+    """
+    Slot assignment for the names of one static scope.
+
+    A parse-time `SymbolTable` and every runtime table the evaluator creates for the same
+    block or function share one layout, so a name has the same slot in all of them and the
+    resolver can address it statically (see resolver.py).
+    """
+    __slots__ = ("slots", "names")
+
+    def __init__(self):
+        self.slots = {}  # Format: {iden: slot}
+        self.names = []  # slot -> iden
+
+    def slot_of(self, iden):
+        slot = self.slots.get(iden)
+        if slot is None:
+            slot = self.slots[iden] = len(self.names)
+            self.names.append(iden)
+        return slot
+
+_NO_FIXED = frozenset()  # `fixed` of a table without fixed variables, shared until one is defined
+
 @dataclass
 class SymbolTable:
-    def __init__(self, parent=None):
-        self.table = {}  # Format: {iden: (value, category)}
+    """
+    The names of one scope, stored by slot (see `ScopeLayout`).
+
+    Values and categories are kept in two lists, so an assignment overwrites the value in
+    place, and the slots of fixed variables in the set `fixed`. A slot whose category is
+    None is not defined in this table.
+    """
+    __slots__ = ("layout", "values", "categories", "fixed", "parent", "template")
+
+    def __init__(self, parent=None, layout=None, values=None, categories=None):
+        self.layout = layout if layout is not None else ScopeLayout()
+        size = len(self.layout.names)
+        self.values = values if values is not None else [None] * size  # slot -> value
+        self.categories = categories if categories is not None else [None] * size  # slot -> category
+        self.fixed = _NO_FIXED  # slots of fixed variables
         self.parent = parent  # enclosing scope
+        self.template = None  # (values, categories) of a fresh instance (see `instantiate`), made on first use
+
+    @property
+    def table(self):
+        """The defined names as {iden: (value, category)}."""
+        names = self.layout.names
+        return {names[slot]: (self.values[slot], category)
+                for slot, category in enumerate(self.categories) if category is not None}
+
+    def _slot(self, iden):
+        # slot of `iden` if it is defined in this table, else None
+        slot = self.layout.slots.get(iden)
+        if slot is not None and slot < len(self.categories) and self.categories[slot] is not None:
+            return slot
+        return None
+
+    def find(self, iden, depth=None, slot=None):
+        """
+        Return `(scope, slot)` of the nearest definition of `iden`.
+
+        `depth`/`slot` are the static address the resolver gave the reference; when the entry
+        there is defined it is used directly, otherwise the chain is searched by name.
+        """
+        if slot is not None:
+            scope = self
+            for _ in range(depth):
+                scope = scope.parent
+                if scope is None:
+                    break
+            else:
+                categories = scope.categories
+                if slot < len(categories) and categories[slot] is not None and scope.layout.names[slot] == iden:
+                    return scope, slot
+        scope = self
+        while scope is not None:
+            found = scope._slot(iden)
+            if found is not None:
+                return scope, found
+            scope = scope.parent
+        raise NameError(f"Variable '{iden}' not found!")
 
     def define(self, iden, value, category: SymbolCategory):
-        self.table[iden] = (value, category)
+        self.template = None
+        slot = self.layout.slot_of(iden)
+        values, categories = self.values, self.categories
+        if slot >= len(categories):
+            values.extend([None] * (slot + 1 - len(values)))
+            categories.extend([None] * (slot + 1 - len(categories)))
+        values[slot] = value
+        categories[slot] = category
+        if category == SymbolCategory.FIXED:
+            if self.fixed is _NO_FIXED:
+                self.fixed = set()
+            self.fixed.add(slot)
+        elif slot in self.fixed:
+            self.fixed.discard(slot)
 
     def lookup(self, iden, cat=False, giveParent=False):
-        if iden in self.table:
-            if not giveParent:
-                return self.table[iden][1] if cat else self.table[iden][0]  # returns category if cat=True, else value
-            else:
-                return (self.table[iden][1], self) if cat else (self.table[iden][0], self)
-        
-        elif self.parent:
-            return self.parent.lookup(iden, cat, giveParent)
-        
-        else:
-            raise NameError(f"Variable '{iden}' not found!")
-        
-    def lookup_fun(self, iden):
-        if iden in self.table:
-            value = self.table[iden]
-            return (value[0], self)
-        elif self.parent:
-            return self.parent.lookup_fun(iden)
-        else:
-            raise NameError(f"Function '{iden}' not found!")
+        scope, slot = self.find(iden)
+        found = scope.categories[slot] if cat else scope.values[slot]  # category if cat=True, else value
+        return (found, scope) if giveParent else found
 
+    def lookup_fun(self, iden):
+        try:
+            scope, slot = self.find(iden)
+        except NameError:
+            raise NameError(f"Function '{iden}' not found!") from None
+        return (scope.values[slot], scope)
 
     def inScope(self, iden):
-        return iden in self.table
+        return self._slot(iden) is not None
+
+    def instantiate(self, parent):
+        """
+        Fresh runtime table for this parse-time scope, under `parent`.
+
+        Declared variables start out as `None`; functions share their declaration
+        `(params, body, scope)`, which nothing changes at run time. Other categories are
+        bound when their declaration runs. The initial entries are worked out once, into
+        `template`, and copied in bulk. A scope that declares nothing needs no table of its
+        own: its code runs in `parent` (the resolver leaves such scopes out of its addresses).
+        """
+        if not self.layout.names:
+            return parent
+        template = self.template
+        if template is None:
+            values, categories = [None] * len(self.categories), [None] * len(self.categories)
+            for slot, category in enumerate(self.categories):
+                if category == SymbolCategory.VARIABLE:
+                    categories[slot] = category
+                elif category == SymbolCategory.FUNCTION:
+                    values[slot], categories[slot] = self.values[slot], category
+            template = self.template = (values, categories)
+        return SymbolTable(parent, self.layout, template[0].copy(), template[1].copy())
 
     def find_and_update_arr(self, iden, index, val):
-        if iden in self.table:
-            category = self.table[iden][1]
-            if category == SymbolCategory.FIXED:
-                raise ValueError(f"Error: Cannot modify elements of fixed array '{iden}'")
-            
-            if category == SymbolCategory.ARRAY:
-                array = self.table[iden][0]
-                array[index] = val
-                self.table[iden] = (array, SymbolCategory.ARRAY)
-        elif self.parent:
-            self.parent.find_and_update_arr(iden, index, val)
-        else:
-            raise NameError(f"Variable '{iden}' not found!")
-        
-    def find_and_update(self, iden, val, new_category=None):
-        if iden in self.table:
-            category = self.table[iden][1]
-            if category == SymbolCategory.FIXED:
-                raise ValueError(f"Error: Cannot reassign to a fixed variable '{iden}'")
-            category_to_use = new_category if new_category is not None else category
-            self.table[iden] = (val, category_to_use)
-        elif self.parent:
-            self.parent.find_and_update(iden, val)
-        else:
-            raise NameError(f"Variable '{iden}' not found!")
+        scope, slot = self.find(iden)
+        if slot in scope.fixed:
+            raise ValueError(f"Error: Cannot modify elements of fixed array '{iden}'")
+
+        if scope.categories[slot] == SymbolCategory.ARRAY:
+            scope.values[slot][index] = val
+
+    def find_and_update(self, iden, val, new_category=None, depth=None, slot=None):
+        scope, slot = self.find(iden, depth, slot)
+        if slot in scope.fixed:
+            raise ValueError(f"Error: Cannot reassign to a fixed variable '{iden}'")
+        scope.values[slot] = val
+        # only a variable of this very scope takes the new category; outer ones keep theirs
+        if new_category is not None and scope is self:
+            scope.categories[slot] = new_category
 
     def copy_scope(self):
-        new_scope = SymbolTable(parent=self.parent)
-        new_scope.table = self.table.copy()
-        return new_scope
\ No newline at end of file
+        new_scope = SymbolTable(self.parent, self.layout, self.values.copy(), self.categories.copy())
+        if self.fixed:
+            new_scope.fixed = set(self.fixed)
+        return new_scope
+
+
@@ -0,0 +1,308 @@
+"""
+Tree-walk evaluation on an explicit stack.
+
+`e` evaluates a child node by calling itself, so a Nexus program nested or recursing deeper
+than the Python stack allows ends in a `RecursionError` (or worse, a crash of the interpreter
+when the limit raised in evaluator.py lets the C stack run out). `run` evaluates the same
+tree with the same semantics without recursing: `STEPS[type(node)](node, tS)` is a generator
+following the case of `e` for the node line for line, but *yielding* `(child, scope)` wherever
+`e` would call `e(child, scope)`, and receiving the child's value back. `run` keeps the
+suspended generators on a list; literals and variables are evaluated in its loop, without a
+generator of their own.
+
+Nexus recursion is then limited by memory only: `run` raises `RecursionError` once the pending
+evaluations would take more than `heap_budget` bytes (`HEAP_BUDGET` by default), counting
+`ENTRY_BYTES` for each. Measured with benchmarks/stack_eval_bench.py on CPython 3.11, a
+suspended generator takes 216 to 328 bytes, and one level of a recursive Nexus function
+`n + sum(n - 1)` about 1.1 KB all told: three pending evaluations (the call, its `if` and the
+`+`) and the scope of the call. The default budget of 256 MiB thus allows a recursion about
+230,000 calls deep.
+
+The nodes `STEPS` has no generator for (built-in calls, property and string operations, `Feed`,
+`FormatString`, ...) are evaluated by `e` itself; only a user function called from inside one
+of those still takes Python stack.
+
+`execute(prog, explicit_stack=True)` runs a program this way.
+"""
+from parser import *
+from scope import SymbolCategory
+from optimizer import BINARY, UNARY, MATH, BUILTIN_CALLS
+from evaluator import e, Closure, TailCall, CATEGORY_OF_TYPE, perform_typecast, find_function
+
+HEAP_BUDGET = 256 * 2**20  # bytes the pending evaluations of `run` may take
+ENTRY_BYTES = 384  # memory of one pending evaluation: its generator and its share of the scopes held
+
+PARAMETER_CATEGORIES = (SymbolCategory.VARIABLE, SymbolCategory.ARRAY, SymbolCategory.HASH)
+
+
+def run(tree, tS, heap_budget=None):
+    """`e(tree, tS)`, evaluated without Python recursion."""
+    limit = (HEAP_BUDGET if heap_budget is None else heap_budget) // ENTRY_BYTES
+    stack = [_evaluate(tree, tS)]
+    value = None
+    while True:
+        try:
+            node, scope = stack[-1].send(value)
+        except StopIteration as done:
+            stack.pop()
+            if not stack:
+                return done.value
+            value = done.value
+            continue
+
+        kind = type(node)
+        steps = STEPS.get(kind)
+        if steps is not None:
+            if len(stack) >= limit:
+                raise RecursionError(
+                    f"Nexus evaluation nested too deeply: over {len(stack)} pending evaluations, "
+                    f"the heap budget of {limit * ENTRY_BYTES} bytes"
+                )
+            stack.append(steps(node, scope))
+            value = None
+        # leaves, and the nodes left to `e`: no generator needed
+        elif kind is Number:
+            value = node.value
+        elif kind is String or kind is Boolean:
+            value = node.val
+        elif kind is Variable:
+            found, slot = scope.find(node.var_name, node.depth, node.slot)
+            value = found.values[slot]
+            if found.categories[slot] == SymbolCategory.FUNCTION:
+                value = Closure(value, found)
+        else:
+            value = e(node, scope)
+
+
+def _evaluate(tree, tS):
+    # the bottom of the stack
+    return (yield tree, tS)
+
+
+# One generator per case of `e` below, rather than one `match` for all: a suspended generator
+# keeps the locals of its whole function, and those of every case together would triple it.
+
+# OPERATORS
+
+def _binop(tree, tS):
+    op = tree.op
+    if op == "and":
+        return (yield tree.left, tS) and (yield tree.right, tS)
+    if op == "or":
+        return (yield tree.left, tS) or (yield tree.right, tS)
+    if op == "not":  # Unary logical operator
+        return not (yield tree.left, tS)
+    if op == "~":  # Unary bitwise operator
+        return ~(yield tree.left, tS)
+    if op not in BINARY:
+        return e(tree, tS)
+    left = yield tree.left, tS
+    return BINARY[op](left, (yield tree.right, tS))
+
+
+def _unary_op(tree, tS):
+    if tree.op not in UNARY:
+        return e(tree, tS)
+    return UNARY[tree.op]((yield tree.val, tS))
+
+
+# VARIABLE DECLARATION & UPDATE
+
+def _var_bind(tree, tS):
+    var_val = yield tree.val, tS
+    if tree.cast:
+        var_val = perform_typecast(var_val, tree.dtype, tree.var_name)
+    category = tree.category
+    if category != SymbolCategory.FIXED:
+        category = CATEGORY_OF_TYPE.get(tree.vtype or type(var_val), SymbolCategory.VARIABLE)
+    tS.define(tree.var_name, var_val, category)
+    return var_val
+
+
+def _update_var(tree, tS):
+    val_to_assign = yield tree.val, tS
+    scope, slot = tS.find(tree.var_name, tree.depth, tree.slot)
+    if slot in scope.fixed:
+        raise ValueError(f"Error: Cannot reassign to a fixed variable '{tree.var_name}'")
+    scope.values[slot] = val_to_assign
+    if scope is tS:
+        scope.categories[slot] = CATEGORY_OF_TYPE.get(tree.vtype or type(val_to_assign), SymbolCategory.VARIABLE)
+    return val_to_assign
+
+
+def _compound_assignment(tree, tS):
+    scope, slot = tS.find(tree.var_name, tree.depth, tree.slot)
+    if slot in scope.fixed:
+        raise ValueError(f"Error: Cannot modify fixed variable '{tree.var_name}'")
+    new_val = BINARY[tree.op[0]](scope.values[slot], (yield tree.val, tS))
+    scope.values[slot] = new_val
+    if scope is tS:
+        scope.categories[slot] = CATEGORY_OF_TYPE.get(tree.vtype or type(new_val), SymbolCategory.VARIABLE)
+    return new_val
+
+
+# FUNCTIONS
+
+def _func_call(tree, tS):
+    fn_name = tree.funcName
+    if type(fn_name) is str and fn_name in BUILTIN_CALLS:
+        return e(tree, tS)
+    # bind_call, with the arguments evaluated on the stack
+    if isinstance(fn_name, CallArr):
+        closure = yield fn_name, tS
+        (params, body, parsed_scope), parent = closure.code, closure.env
+    else:
+        (params, body, parsed_scope), parent = find_function(fn_name, tS)
+    scope = parsed_scope.instantiate(parent)
+    for param, arg in zip(params, tree.funcArgs):
+        if param[1] in PARAMETER_CATEGORIES:
+            scope.define(param[0], (yield arg, tS), param[1])
+    if tree.tail:
+        return TailCall(body, scope)
+    while True:
+        ans = None
+        for stmt in body.statements:
+            ans = yield stmt, scope
+        if not isinstance(ans, TailCall):
+            return ans
+        body, scope = ans.body, ans.scope
+
+
+# CONDITIONALS AND LOOPS
+
+def _if(tree, tS):
+    scope = tree.condScope.instantiate(parent=tS)
+    if (yield tree.c, scope):
+        return (yield tree.t, scope)
+    elif tree.e is not None:
+        return (yield tree.e, scope)
+    return None
+
+
+def _loop_body(body, scope):
+    # whether the loop breaks out
+    for stmt in body.statements:
+        result = yield stmt, scope
+        if isinstance(result, BreakOut):
+            return True
+        elif isinstance(result, MoveOn):
+            break
+    return False
+
+
+def _while_loop(tree, tS):
+    scope = tree.whileScope.instantiate(parent=tS)
+    while (yield tree.condition, scope):
+        if (yield from _loop_body(tree.body, scope)):
+            break
+
+
+def _for_loop(tree, tS):
+    scope = tree.forScope.instantiate(parent=tS)
+    yield tree.initialization, scope
+    while (yield tree.condition, scope):
+        if (yield from _loop_body(tree.body, scope)):
+            break
+        yield tree.increment, scope
+
+
+def _repeat(tree, tS):
+    scope = tree.repeatScope.instantiate(parent=tS)
+    repetitions = yield tree.times, scope
+    if not isinstance(repetitions, int) or repetitions < 0:
+        raise ValueError(
+            "Repeat loop requires a non-negative integer for the number of repetitions."
+        )
+    for _ in range(repetitions):
+        if (yield from _loop_body(tree.body, scope)):
+            break
+
+
+def _statements(tree, tS):
+    result = None
+    for stmt in tree.statements:
+        result = yield stmt, tS
+    return result
+
+
+# ARRAYS AND HASHES
+
+def _array(tree, tS):
+    values = []
+    for item in tree.val:
+        values.append((yield item, tS))
+    return values
+
+
+def _hash(tree, tS):
+    table = {}
+    for k, v in tree.val:
+        key = yield k, tS
+        table[key] = yield v, tS
+    return table
+
+
+def _subscript(tree, tS):
+    # CallArr and CallHashVal
+    name, indices = (tree.xname, tree.index) if type(tree) is CallArr else (tree.name, tree.key)
+    value = tS.lookup(name)
+    for index in indices:
+        value = value[(yield index, tS)]
+    return value
+
+
+def _assign_subscript(tree, tS):
+    # AssigntoArr (but for a character of a string, left to `e`) and AssignHashVal
+    if type(tree) is AssigntoArr:
+        name, indices, value = tree.xname, tree.index, tree.val
+        if type(tS.lookup(name)) is str:
+            return e(tree, tS)
+    else:
+        name, indices, value = tree.name, tree.key, tree.new_val
+    keys = []
+    for index in indices:
+        keys.append((yield index, tS))
+    container = tS.lookup(name)
+    *outer_keys, last_key = keys
+    for key in outer_keys:
+        container = container[key]
+    container[last_key] = yield value, tS
+    tS.find_and_update(name, tS.lookup(name))
+    return container[last_key]
+
+
+# FEATURES
+
+def _display(tree, tS):
+    return print((yield tree.val, tS), end="")
+
+
+def _display_line(tree, tS):
+    return print((yield tree.val, tS))
+
+
+def _type_cast(tree, tS):
+    return perform_typecast((yield tree.val, tS), tree.dtype)
+
+
+def _math_function(tree, tS):
+    name = tree.funcName
+    if name not in MATH and name not in ("min", "max"):
+        return e(tree, tS)
+    arg_values = []
+    for arg in tree.arg:
+        arg_values.append((yield arg, tS))
+    if name in MATH:
+        return MATH[name](*arg_values)
+    return (min if name == "min" else max)(arg_values[0])
+
+
+STEPS = {  # node type -> generator evaluating it; any other node is evaluated by `e`
+    BinOp: _binop, UnaryOp: _unary_op,
+    VarBind: _var_bind, UpdateVar: _update_var, CompoundAssignment: _compound_assignment,
+    FuncCall: _func_call,
+    If: _if, WhileLoop: _while_loop, ForLoop: _for_loop, Repeat: _repeat, Statements: _statements,
+    Array: _array, Hash: _hash, CallArr: _subscript, CallHashVal: _subscript,
+    AssigntoArr: _assign_subscript, AssignHashVal: _assign_subscript,
+    Display: _display, DisplayL: _display_line, TypeCast: _type_cast, MathFunction: _math_function,
+}
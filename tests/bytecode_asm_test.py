@@ -0,0 +1,100 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+from bytecode_gen_new import compile_program, I
+from bytecode_asm import assemble, Op, OPCODES
+from bytecode_eval_new import execute_bytecode
+
+
+def test_opcodes_operands_and_constant_pool():
+    code, _ = compile_program("""
+    var total = 0;
+    for (var i = 0; i < 10; i += 1) {
+        if i % 2 == 0 then { total += i; } end;
+    };
+    displayl total;
+    displayl total;
+    """)
+    flat = assemble(code)
+    assert len(flat) == len(code.insns)
+    assert [OPCODES[opcode] for opcode in flat.ops] == [type(insn) for insn in code.insns]
+    for insn, opcode, arg in zip(code.insns, flat.ops, flat.args):
+        if hasattr(insn, "label"):
+            assert opcode in (Op.JMP, Op.JMP_IF_TRUE, Op.JMP_IF_FALSE) and arg == insn.label.target
+        elif isinstance(insn, I.PUSH):
+            assert flat.consts[arg] == insn.value and type(flat.consts[arg]) is type(insn.value)
+        elif isinstance(insn, I.LOAD):
+            assert flat.consts[arg] == (insn.name, insn.slot)
+        elif isinstance(insn, I.STORE):
+            assert arg == insn.slot
+    # each constant once
+    assert len(flat.consts) == len({(type(c), c) for c in flat.consts})
+
+
+def test_pool_keeps_equal_constants_of_different_types():
+    code, _ = compile_program("displayl 1; displayl 1.0; displayl True;")
+    assert [type(c) for c in assemble(code).consts if not isinstance(c, tuple)] == [int, float, bool]
+
+
+def test_pool_keeps_signed_zeros_apart(capfd):
+    code, _ = compile_program("displayl 0.0; displayl -0.0;")
+    execute_bytecode(code)
+    assert capfd.readouterr().out.split() == ["0.0", "-0.0"]
+
+
+@pytest.mark.parametrize("prog", [
+    """
+    fn fib(n) {
+        if n < 2 then { n; } else { fib(n - 1) + fib(n - 2); } end;
+    };
+    fn count(n, acc) {
+        if n == 0 then acc else count(n - 1, acc + n) end;
+    };
+    displayl fib(15);
+    displayl count(500, 0);
+    """,
+    """
+    var array a = [3, 1, 2];
+    var h = {"k": 1};
+    a.PushBack(4);
+    a[0] = a.PopFront + a.Length;
+    h["n"] = h.Contains("k");
+    displayl a;
+    displayl h;
+    var s = "nexus";
+    displayl s.Slice(1, 3);
+    displayl s.Length;
+    """,
+])
+def test_flat_matches_object_form(capfd, prog):
+    code, _ = compile_program(prog)
+    execute_bytecode(code, flat=False)
+    expected = capfd.readouterr().out
+    execute_bytecode(code, threaded=False)
+    assert capfd.readouterr().out == expected
+    execute_bytecode(code)  # threaded code
+    assert capfd.readouterr().out == expected
+
+
+@pytest.mark.parametrize("prog", ["displayl();", "displayl(limit = 4;);", "fn f(){}; displayl f();"])
+@pytest.mark.parametrize("form", [{}, {"threaded": False}, {"flat": False}])
+def test_stack_underflow_reported(prog, form):
+    with pytest.raises(RuntimeError, match="Stack underflow"):
+        execute_bytecode(compile_program(prog)[0], **form)
+
+
+@pytest.mark.parametrize("prog", ["var a = [1]; displayl a[5];", "var m = [[1]]; var i = 0; displayl m[i][3];"])
+@pytest.mark.parametrize("form", [{}, {"threaded": False}, {"flat": False}])
+def test_index_errors_are_not_underflows(prog, form):
+    with pytest.raises(IndexError):
+        execute_bytecode(compile_program(prog)[0], **form)
+
+
+@pytest.mark.parametrize("form", [{}, {"threaded": False}, {"flat": False}])
+def test_length_of_other_types_not_supported(form):
+    code, _ = compile_program("var a = [1, 2]; a = 12345; displayl a.Length;")
+    with pytest.raises(TypeError, match="Operation 'Length' not supported for type <class 'int'>"):
+        execute_bytecode(code, **form)
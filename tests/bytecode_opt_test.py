@@ -0,0 +1,174 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+from bytecode_gen_new import compile_program, codegen, parse, optimize, I, ByteCode, Label
+from bytecode_opt import eliminate_dead_code, peephole, fuse_superinstructions, ALL_FUSIONS
+from bytecode_asm import assemble
+from bytecode_eval_new import run_program, BytecodeVM
+from scope import SymbolTable
+
+
+def kinds(code):
+    return [type(insn).__name__ for insn in code.insns]
+
+
+def test_constant_branch_removed():
+    code, _ = compile_program("""
+    if 1 > 2 then { displayl "never"; } else { displayl "always"; } end;
+    """)
+    assert "never" not in [getattr(insn, "value", None) for insn in code.insns]
+    assert "JMP_IF_FALSE" not in kinds(code)
+    assert code.eliminated["constant branches"] == 1
+
+
+def test_unused_functions_removed():
+    code, _ = compile_program("""
+    fn helper(x) { x * 2; };
+    fn unused(x) { helper(x); };
+    fn used(x) { displayl x; x + 1; };
+    displayl used(1);
+    """)
+    names = {insn.name for insn in code.insns if isinstance(insn, I.PUSHFN)}
+    assert names == {"used"}
+    assert code.eliminated["unused functions"] > 0
+
+
+def test_dead_store_removed():
+    code, _ = compile_program("""
+    var unread = 5;
+    var read = 6;
+    displayl read;
+    """)
+    stores = [insn.name for insn in code.insns if isinstance(insn, I.STORE)]
+    assert stores == ["read"]
+    assert code.eliminated["dead stores"] == 2
+
+
+def test_function_bodies_hoisted_after_halt():
+    code, _ = compile_program("""
+    fn f(x) { displayl x; x + 1; };
+    displayl f(2);
+    """)
+    halt = kinds(code).index("HALT")
+    assert "JMP" not in kinds(code)[:halt]
+    assert "RETURN" in kinds(code)[halt:]
+    assert code.eliminated["function jumps"] == 1
+
+
+def test_output_unchanged(capfd):
+    prog = """
+    var unused = 0;
+    fn fib(n) {
+        if n < 2 then { n; } else { fib(n - 1) + fib(n - 2); } end;
+    };
+    fn never() { displayl "never"; };
+    if 0 then { displayl "dead"; } end;
+    while (False) { displayl "dead"; };
+    for (var i = 0; i < 5; i += 1) {
+        displayl fib(i + 5);
+    };
+    """
+    run_program(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["5", "8", "13", "21", "34"]
+
+
+def test_superinstructions_fused():
+    code, _ = compile_program("""
+    var total = 0;
+    var n = 10;
+    for (var i = 0; i < n; i += 1) {
+        total += i;
+    };
+    displayl total;
+    """)
+    assert kinds(code).count("INC_VAR") == 1  # i += 1; total += i adds a variable
+    assert kinds(code).count("CMP_JUMP") == 1
+    assert "JMP_IF_FALSE" not in kinds(code)
+    assert code.fused == {"INC_VAR": 1, "CMP_JUMP": 1}
+
+
+@pytest.mark.parametrize("flat, threaded", [(False, False), (True, False), (True, True)])
+def test_all_fusions_output_unchanged(capfd, flat, threaded):
+    prog = """
+    var m = [[1, 2, 3], [4, 5, 6]];
+    var limit = 3;
+    fn row_sum(r) {
+        var s = 0;
+        var j = 0;
+        while (j < limit) {
+            s += m[r][j];
+            j += 1;
+        };
+        s;
+    };
+    var total = 0;
+    for (var i = 0; i < 2; i += 1) {
+        if i == 1 then { total += 100; } end;
+        total += row_sum(i);
+    };
+    displayl total;
+    var x = 1.5;
+    x += 1;
+    displayl x;
+    """
+    plain = eliminate_dead_code(codegen(optimize(*parse(prog, SymbolTable()))[0]))
+    fused = fuse_superinstructions(eliminate_dead_code(codegen(optimize(*parse(prog, SymbolTable()))[0])),
+                                   ALL_FUSIONS)
+    assert all(fused.fused.values())  # each superinstruction is exercised
+    BytecodeVM(assemble(plain)).run()
+    expected = capfd.readouterr().out
+    assert expected.split() == ["121", "2.5"]
+    BytecodeVM(assemble(fused) if flat else fused, threaded).run()
+    assert capfd.readouterr().out == expected
+
+
+def test_peephole_threads_jumps():
+    code, _ = compile_program("""
+    var i = 0;
+    while (i < 10) {
+        i += 1;
+        if i % 3 == 0 then { displayl i; } end;
+        if i % 2 == 0 then { displayl i; } else { display ""; } end;
+    };
+    displayl "done";
+    """)
+    insns = code.insns
+    for index, insn in enumerate(insns):
+        if hasattr(insn, "label") and not isinstance(insn, I.PUSHFN):
+            assert insn.label.target != index + 1
+            assert not isinstance(insns[insn.label.target], I.JMP)
+    assert code.peephole["removed"]["jumps to next"] == 1  # the JMP over the missing else
+    assert code.peephole["rewritten"]["jump threading"] == 1  # out of the then branch, to the loop's JMP
+
+
+def test_peephole_rules():
+    code = ByteCode()
+    end = Label()
+    for insn in [I.PUSH(None), I.POP(), I.PUSH(1), I.STORE("x"), I.LOAD("x"), I.PRINTLN(),
+                 I.JMP(end), I.PUSH("unreachable"), I.PRINTLN()]:
+        code.emit(insn)
+    code.emit_label(end)
+    code.emit(I.HALT())
+    peephole(code)
+    assert kinds(code) == ["PUSH", "DUP", "STORE", "PRINTLN", "HALT"]
+    assert code.peephole == {
+        "removed": {"jumps to next": 0, "push/pop pairs": 2, "unreachable": 3},
+        "rewritten": {"jump threading": 0, "jumps to exits": 1, "conditional jumps to next": 0,
+                      "store/load pairs": 1},
+    }
+
+
+def test_peephole_keeps_instruction_after_array_set(capfd):
+    # ARRAY_SET on an array skips the instruction after it, which must stay in place
+    run_program("""
+    var array a = [1, 2, 3];
+    var x = 0;
+    a[1] = 5;
+    x = a[1];
+    displayl x;
+    displayl a;
+    """)
+    assert capfd.readouterr().out.split("\n")[:2] == ["5", "[1, 5, 3]"]
@@ -0,0 +1,31 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+from evaluator import *
+from closure_eval import Compiler, compile_tree
+
+
+pytestmark = pytest.mark.one_engine
+
+
+def test_function_bodies_compiled_once(capfd):
+    ast, tS = parse("fn sq(x) { x * x; }; var total = 0; repeat (3) { total += sq(total + 1); } displayl total;",
+                    SymbolTable())
+    compiler = Compiler()
+    program = compiler.compile(ast)
+    assert len(compiler.bodies) == 1  # from the declaration, before any call
+    program(tS)
+    assert len(compiler.bodies) == 1
+    assert capfd.readouterr().out.strip() == "41"
+
+
+def test_deep_expressions_compile():
+    """Compiling takes no Python stack per level of nesting."""
+    tree = Number("1")
+    for _ in range(20000):
+        tree = UnaryOp("-", tree)
+    assert callable(compile_tree(tree))
+    assert compile_tree(BinOp("+", Number("1"), Number("2")))(SymbolTable()) == 3
@@ -0,0 +1,73 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import pytest
+import compile_cache
+from compile_cache import load_or_compile, cache_path_for, CACHE_DIR_NAME
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+PROGRAM = """
+fn square(n) { n * n; };
+var total = 0;
+for (var i = 1; i <= 4; i += 1) { total += i; };
+displayl total + square(3);
+"""
+
+
+def test_cache_disabled_without_location(tmp_path):
+    calls = []
+    assert load_or_compile("bytecode", "x", lambda: calls.append(1) or "built") == "built"
+    assert load_or_compile("bytecode", "x", lambda: calls.append(1) or "built") == "built"
+    assert len(calls) == 2
+
+
+def test_cache_hit_and_invalidation(tmp_path):
+    calls = []
+    def build(value):
+        return lambda: calls.append(value) or value
+
+    assert load_or_compile("ast", "var x = 1;", build("a"), cache_dir=tmp_path) == "a"
+    assert load_or_compile("ast", "var x = 1;", build("b"), cache_dir=tmp_path) == "a"  # reused
+    assert load_or_compile("ast", "var x = 2;", build("c"), cache_dir=tmp_path) == "c"  # new source
+    assert calls == ["a", "c"]
+
+
+def test_compiler_change_invalidates(tmp_path, monkeypatch):
+    load_or_compile("ast", "var x = 1;", lambda: "old", cache_dir=tmp_path)
+    monkeypatch.setattr(compile_cache, "_compiler_fingerprint", "another compiler")
+    assert load_or_compile("ast", "var x = 1;", lambda: "new", cache_dir=tmp_path) == "new"
+
+
+def test_unoptimized_compiles_cached_apart(tmp_path):
+    assert load_or_compile("ast", "var x = 1;", lambda: "optimized", cache_dir=tmp_path) == "optimized"
+    assert load_or_compile("ast", "var x = 1;", lambda: "plain", cache_dir=tmp_path, optimize=False) == "plain"
+    assert load_or_compile("ast", "var x = 1;", lambda: "new", cache_dir=tmp_path) == "optimized"
+    assert sorted(name.split(".")[1] for name in os.listdir(tmp_path)) == ["ast", "ast-noopt"]
+
+
+def test_corrupt_entry_is_rebuilt(tmp_path):
+    path = cache_path_for("bytecode", "var x = 1;", cache_dir=str(tmp_path))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"not a pickle")
+    assert load_or_compile("bytecode", "var x = 1;", lambda: "fresh", cache_dir=str(tmp_path)) == "fresh"
+    assert load_or_compile("bytecode", "var x = 1;", lambda: "stale", cache_dir=str(tmp_path)) == "fresh"
+
+
+def test_cache_next_to_source_file(tmp_path):
+    source_path = tmp_path / "prog.nx"
+    source_path.write_text(PROGRAM)
+    expected = tmp_path / CACHE_DIR_NAME / "prog.bytecode.nxc"
+    assert cache_path_for("bytecode", PROGRAM, source_path=str(source_path)) == str(expected)
+
+
+@pytest.mark.parametrize("runner", [execute, run_program])
+def test_cached_runs_match_uncached(runner, tmp_path, capfd):
+    runner(PROGRAM)
+    expected = capfd.readouterr().out
+    source_path = str(tmp_path / "prog.nx")
+    for _ in range(2):  # first run writes the entry, second one loads it
+        runner(PROGRAM, source_path=source_path)
+        assert capfd.readouterr().out == expected
+    assert len(os.listdir(tmp_path / CACHE_DIR_NAME)) == 1
@@ -1,6 +1,47 @@
+import functools
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
 import pytest
+import evaluator
+import bytecode_eval_new
+
 # def pytest_ignore_collect(path):
 #     return str(path).endswith(('basic_test.py', 'operation_test.py', 'project_euler_codes.py'))
 def pytest_ignore_collect(collection_path):
     return collection_path.name in ('basic_test.py', 'operation_test.py', 'project_euler_codes.py','euler_test.py')
-    # return collection_path.name in ('basic_test.py', 'operation_test.py', 'project_euler_codes.py')
\ No newline at end of file
+    # return collection_path.name in ('basic_test.py', 'operation_test.py', 'project_euler_codes.py')[project]
+
+
+# Engines every test calling `execute` or `run_program` runs under: "default" is the tree
+# walker and the stack VM; the others swap one of them for an alternative engine.
+ENGINES = {
+    "default": (evaluator.execute, bytecode_eval_new.run_program),
+    "closures": (functools.partial(evaluator.execute, compiled=True), bytecode_eval_new.run_program),
+    "explicit_stack": (functools.partial(evaluator.execute, explicit_stack=True), bytecode_eval_new.run_program),
+    "registers": (evaluator.execute, functools.partial(bytecode_eval_new.run_program, engine="registers")),
+}
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "one_engine: the test is about one engine, run it as it is")
+
+
+def pytest_generate_tests(metafunc):
+    runs_programs = {"execute", "run_program"} & set(metafunc.function.__code__.co_names)
+    if runs_programs and not metafunc.definition.get_closest_marker("one_engine"):
+        metafunc.parametrize("engine", list(ENGINES), indirect=True)
+
+
+@pytest.fixture(autouse=True)
+def engine(request, monkeypatch):
+    """Runs the test's `execute` and `run_program` calls under the engine it is parametrized with."""
+    if not hasattr(request, "param"):
+        return None
+    execute, run_program = ENGINES[request.param]
+    for name, fn in (("execute", execute), ("run_program", run_program)):
+        if name in vars(request.module):
+            monkeypatch.setattr(request.module, name, fn)
+    return request.param
@@ -324,6 +324,38 @@ def test_string_operations(code, expected_output, capfd):
     captured = capfd.readouterr()
     assert captured.out.strip() == expected_output
 
+def test_specialized_operations_fall_back_when_rebound(capfd):
+    # `a` and `s` are parsed as an array and a string, then rebound to other types
+    code = """
+    var a = [3, 4];
+    a.PushBack(5);
+    displayl a.PopFront;
+    displayl a.Length;
+    var s = "nexus";
+    displayl s.Slice(1, 3);
+    displayl s.Slice(2);
+    var h = {"k": 1};
+    displayl h.Contains("k");
+    a = "xy";
+    a.PushBack("z");
+    displayl a;
+    displayl a.PopBack;
+    s = [1, 2, 3, 4];
+    displayl s.Slice(1, 3);
+    """
+    expected = "3\n2\nex\nxus\nTrue\nxyz\nz\n[2, 3]"
+    execute(code)
+    assert capfd.readouterr().out.strip() == expected
+    run_program(code)
+    assert capfd.readouterr().out.strip() == expected
+
+def test_length_of_rebound_name_not_supported():
+    code = "var a = [1, 2]; a = 12345; displayl a.Length;"
+    with pytest.raises(TypeError, match="Operation 'Length' not supported for type <class 'int'>"):
+        execute(code)
+    with pytest.raises(TypeError, match="Operation 'Length' not supported for type <class 'int'>"):
+        run_program(code)
+
 if __name__ == "__main__":
     
     prog= """
@@ -5,6 +5,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
 
 import pytest
 from evaluator import *
+from bytecode_eval_new import run_program, BytecodeVM
 
 
 def test_basic_function_sum(capfd):
@@ -459,6 +460,81 @@ def test_man_or_boy(capfd):
     assert output[4] == "1"  # k=4
 
 
+
+@pytest.mark.one_engine  # counts the stack VM's frames
+def test_deep_tail_recursion(capfd, monkeypatch):
+    """Tail calls run in constant stack: far deeper than the recursion limit allows otherwise."""
+    prog = """
+    fn count(n, acc) {
+        if n == 0 then acc else count(n - 1, acc + n) end;
+    };
+    fn even(n) { if n == 0 then True else odd(n - 1) end; };
+    fn odd(n) { if n == 0 then False else even(n - 1) end; };
+    displayl count(50000, 0);
+    displayl even(20001);
+    """
+    execute(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["1250025000", "False"]
+
+    frames = []
+    push_frame = BytecodeVM.push_frame
+    monkeypatch.setattr(BytecodeVM, "push_frame", lambda vm, *args: (frames.append(1), push_frame(vm, *args)))
+    run_program(prog.replace("even(20001)", "even(21)"))
+    assert capfd.readouterr().out.strip().split("\n") == ["1250025000", "False"]
+    # one frame for `count`, the VM only reuses the frame of a function calling itself
+    assert len(frames) == 1 + 22
+
+
+def test_function_values_are_closures(capfd):
+    """A function used as a value closes over its scope without copying its declaration."""
+    prog = """
+    fn make(k) {
+        fn add(n) {
+            n + k;
+        };
+    };
+    fn apply(g, x) {
+        g(x);
+    };
+    var add5 = make(5);
+    var total = 0;
+    for (var i = 0; i < 100; i += 1) {
+        if i % 2 == 0 then {
+            total += apply(add5, i);
+        } end;
+    };
+    displayl total;
+    """
+    execute(prog)
+    assert capfd.readouterr().out.strip() == str(sum(range(0, 100, 2)) + 5 * 50)
+
+    tS = SymbolTable()
+    ast, tS = parse("fn f(x) { x; }; var g = f; var h = f;", tS)
+    for stmt in ast.statements:
+        e(stmt, tS)
+    g, h = tS.lookup("g"), tS.lookup("h")
+    assert isinstance(g, Closure) and g.code is h.code is tS.lookup("f")
+
+
+
+def test_block_declaration_read_before_it_runs(capfd):
+    """Until a block's `var` runs, the name means the enclosing variable; the loop's scope lasts
+    from one iteration to the next."""
+    prog = """
+    var arr = [1, 2];
+    var n = 0;
+    while (n < 2) {
+        n += 1;
+        displayl arr;
+        var arr = [n];
+        displayl arr;
+    };
+    """
+    execute(prog)
+    assert capfd.readouterr().out.splitlines() == ["[1, 2]", "[1]", "[1]", "[2]"]
+    run_program(prog)
+    assert capfd.readouterr().out.splitlines() == ["[1, 2]", "[1]", "[1]", "[2]"]
+
 if __name__ == "__main__":
     # Simple test case for direct execution
     prog = """
@@ -0,0 +1,77 @@
+import sys
+import os
+import glob
+import re
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import pytest
+from lexer import *
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+NX_FILES = sorted(glob.glob(os.path.join(ROOT, '**', '*.nx'), recursive=True))
+
+
+@pytest.mark.parametrize("path", NX_FILES, ids=lambda p: os.path.relpath(p, ROOT))
+def test_lex_matches_charwise_on_programs(path):
+    with open(path) as f:
+        code = f.read()
+    assert list(lex(code)) == list(lex_charwise(code))
+
+
+@pytest.mark.parametrize("code", [
+    "var x = 10; x += 2 ** 3;",
+    "a<<=b >>c <= d == e != f",
+    "1.2.3 + 4. - .5",
+    "display 'single' + \"double\" + `fmt {x}`;",
+    "/> line comment\nx /~ block ~/ y /~ unterminated",
+    "x/y /= z ÷= 2 ÷ 1",
+    "fn f(a[], b{}) { return a[0] & ~b | 1 ^ 2; };",
+    "if True then breakout else moveon end; break;",
+    "sqrt(PI) + E; integer(\"5\"); typeof(feed());",
+    "   \n\t  ",
+    "",
+])
+def test_lex_matches_charwise_on_snippets(code):
+    assert list(lex(code)) == list(lex_charwise(code))
+
+
+@pytest.mark.parametrize("code, message", [
+    ("x ++ 1", "Invalid operator '++'"),
+    ("'unterminated", "Expected '"),
+    ("`unterminated", "Expected `"),
+    ("x @ y", "Unexpected character: @"),
+])
+def test_lex_errors(code, message):
+    with pytest.raises(SyntaxError, match=re.escape(message)):
+        list(lex(code))
+    with pytest.raises(SyntaxError, match=re.escape(message)):
+        list(lex_charwise(code))
+
+
+def test_lex_token_classification():
+    assert list(lex("while foo Length True integer sqrt breakout moveon 12 1.5")) == [
+        KeywordToken("while"), VarToken("foo"), KeywordToken("Length"),
+        BooleanToken("True"), TypeToken("integer"), MathToken("sqrt"),
+        BreakOutToken(), MoveOnToken(), NumberToken("12"), NumberToken("1.5"),
+    ]
+
+
+def test_token_stream_shares_token_objects():
+    stream = tokenize("var x = x + 1; x = x + 1;")
+    tokens = list(stream)
+    assert tokens[1] is tokens[3] is tokens[7] is tokens[9]  # interned VarToken("x")
+    assert tokens[4] is tokens[10] is FIXED_TOKENS["+"]
+    assert tokens[5] is tokens[11]
+    assert tokens[-1] is SEMICOLON
+    assert stream.text(1) == "x"
+
+
+def test_token_stream_cursor():
+    stream = tokenize("display 'hi';")
+    assert len(stream) == 3
+    assert stream.peek() == KeywordToken("display")
+    assert next(stream) == KeywordToken("display")
+    assert stream.peek() == StringToken("hi")
+    assert stream.text(1) == "hi"
+    assert list(stream) == [StringToken("hi"), SEMICOLON]
+    assert stream.peek() is None
+    assert stream.peek("eof") == "eof"
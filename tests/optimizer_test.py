@@ -0,0 +1,391 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+from evaluator import *
+from bytecode_eval_new import run_program
+from optimizer import optimize
+from bytecode_gen_new import compile_program
+
+
+def optimized(prog):
+    return optimize(*parse(prog, SymbolTable()))[0].statements
+
+
+@pytest.mark.parametrize("prog, expected", [
+    ("displayl 2 * 3 + 1;", DisplayL(Number("7"))),
+    ("displayl 7 / 2;", DisplayL(Number("3.5"))),
+    ("displayl 1 < 2 and 3 > 4;", DisplayL(Boolean(False))),
+    ("displayl \"ab\" + \"c\";", DisplayL(String("abc"))),
+    ("displayl -(2 ** 3);", DisplayL(Number("-8"))),
+    ("displayl char(65);", DisplayL(String("A"))),
+    ("displayl sqrt(16) + floor(2.5);", DisplayL(Number("6.0"))),
+    ("displayl x + 2 * 3;", DisplayL(BinOp("+", Variable("x"), Number("6")))),
+])
+def test_constant_folding(prog, expected):
+    assert optimized(prog)[0] == expected
+
+
+@pytest.mark.parametrize("prog", ["displayl 1 / 0;", "displayl 0 ** -1;", "displayl -8 ** 0.5;", "displayl ascii(5);"])
+def test_failing_constants_are_left_for_run_time(prog):
+    stmt = optimized(prog)[0]
+    assert not isinstance(stmt.val, (Number, String, Boolean))
+
+
+def test_math_errors_still_raised_when_reached(capfd):
+    prog = """
+    displayl "before";
+    displayl 0 ** -1;
+    """
+    with pytest.raises(ValueError, match="Zero cannot be raised"):
+        execute(prog)
+    assert capfd.readouterr().out.strip() == "before"
+
+
+def test_negative_base_integer_power(capfd):
+    execute("var b = -2; displayl b ** 3; displayl -2 ** 2;")
+    assert capfd.readouterr().out.strip().split("\n") == ["-8", "4"]
+
+
+def test_fixed_variable_propagation():
+    stmts = optimized("""
+    fixed var N = 10;
+    displayl N * 2 + 1;
+    if N > 5 then { displayl N; } end;
+    """)
+    assert stmts[1] == DisplayL(Number("21"))
+    assert stmts[2].c == Boolean(True)
+    assert stmts[2].t.statements[0] == DisplayL(Number("10"))
+
+
+def test_fixed_variable_not_propagated_when_unsafe():
+    stmts = optimized("""
+    displayl M;
+    fixed var M = 1;
+    fixed var K = 2;
+    K = 3;
+    fn f() { M; };
+    """)
+    assert stmts[0] == DisplayL(Variable("M"))  # read before the binding runs
+    assert stmts[4].funcBody.statements[0] == Variable("M")  # function may run before it
+    assert stmts[3] == UpdateVar("K", Number("3"))
+
+
+def test_optimizer_can_be_turned_off(capfd):
+    prog = "var n = 0; while (n < 3) { n += 2 * 3; }; displayl n;"
+    execute(prog, optimize=False)
+    run_program(prog, optimize=False)
+    assert capfd.readouterr().out.split() == ["6", "6"]
+    assert len(compile_program(prog, optimize=False)[0].insns) > len(compile_program(prog)[0].insns)
+
+
+def test_optimized_program_output(capfd):
+    prog = """
+    fixed var LIMIT = 2 * 5;
+    var total = 0;
+    for (var i = 0; i < LIMIT; i += 1) {
+        if i % (1 + 2) == 0 then { total += i * (PI > 3); } end;
+    };
+    displayl total;
+    """
+    execute(prog)
+    run_program(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["18", "18"]
+
+
+def test_small_functions_inlined():
+    stmts = optimized("""
+    fn square(x) { x * x; };
+    fn hyp(a, b) { sqrt(square(a) + square(b)); };
+    var n = 3;
+    displayl hyp(n, 4);
+    displayl square(n + 1);
+    """)
+    assert stmts[3] == DisplayL(MathFunction("sqrt", [BinOp("+", BinOp("*", Variable("n"), Variable("n")), Number("16"))]))
+    assert stmts[4] == DisplayL(FuncCall("square", [BinOp("+", Variable("n"), Number("1"))]))  # would run twice
+
+
+@pytest.mark.parametrize("prog", [
+    "fn f(n) { if n < 2 then n else f(n - 1) end; }; displayl f(3);",  # recursive
+    "fn f(x) { displayl x; x; }; displayl f(3);",                       # more than an expression
+    "var k = 2; fn f(x) { x * k; }; displayl f(3);",                    # reads a global
+    "fn f(x) { x; }; var g = f; displayl f(3);",                        # escapes
+    "fn f(x, y) { x; }; displayl f(1, 2);",                             # drops an argument
+])
+def test_functions_not_inlined(prog):
+    assert isinstance(optimized(prog)[-1].val, FuncCall)
+
+
+def test_inlined_program_output(capfd):
+    prog = """
+    fn idx(r, c, cols) { r * cols + c; };
+    fn at(m, r, c) { m[idx(r, c, 3)]; };
+    fn between(x, lo, hi) { x >= lo and x <= hi; };
+    var grid = [1, 2, 3, 4, 5, 6];
+    var total = 0;
+    for (var r = 0; r < 2; r += 1) {
+        for (var c = 0; c < 3; c += 1) {
+            if between(at(grid, r, c), 2, 5) then { total += at(grid, r, c); } end;
+        };
+    };
+    displayl total;
+    """
+    execute(prog)
+    run_program(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["14", "14"]
+
+
+def test_loop_invariants_hoisted():
+    stmts = optimized("""
+    var items = [1, 2, 3];
+    var cols = 4;
+    var total = 0;
+    for (var i = 0; i < items.Length; i += 1) {
+        total += i * cols + cols * cols;
+    };
+    """)
+    length, square, loop = stmts[3:6]
+    assert length.val == ArrayLen("items", "Length", [])
+    assert loop.condition == BinOp("<", Variable("i"), Variable(length.var_name))
+    # the body only runs if the condition holds for the first `i`
+    assert square.val.c == BinOp("<", Number("0"), ArrayLen("items", "Length", []))
+    assert square.val.t == BinOp("*", Variable("cols"), Variable("cols"))
+    assert loop.body.statements[0].val.right == Variable(square.var_name)
+
+
+@pytest.mark.parametrize("loop", [
+    "while (n < 10) { n += n * step; };",                             # `n` is assigned
+    "while (n < 10) { n += 1; step = step + 1; };",                 # `step` is assigned
+    "while (n < 10) { n += f(step * 2); };",                        # `f` may assign `step`
+    "while (n < 10) { n += 1; if n > 5 then { break; } end; displayl step * 2; };",
+])
+def test_loop_variants_stay(loop):
+    stmts = optimized("fn f(x) { displayl x; x; }; var n = 0; var step = 1;" + loop)
+    assert not any(isinstance(stmt, VarBind) and stmt.var_name.startswith("$") for stmt in stmts)
+
+
+def test_loop_invariant_not_evaluated_when_loop_never_runs(capfd):
+    prog = """
+    var text = "abc";
+    var n = 0;
+    while (n > 0) {
+        displayl text - 1;
+        n -= 1;
+    };
+    displayl "done";
+    """
+    execute(prog)
+    run_program(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["done", "done"]
+
+
+@pytest.mark.parametrize("loop", [
+    "while (i < 3) { displayl \"hi\"; var q = 10 / z; i = i + 1; };",
+    "for (var j = 0; j < 3; j += 1) { displayl \"hi\"; var q = 10 / z; };",
+])
+def test_loop_invariant_fails_after_earlier_statements(capfd, loop):
+    prog = "var z = 0; var i = 0;" + loop
+    for run in (execute, run_program):
+        with pytest.raises(ZeroDivisionError):
+            run(prog)
+        assert capfd.readouterr().out == "hi\n"
+
+
+def test_hoisted_program_output(capfd):
+    prog = """
+    var rows = 3;
+    var cols = 4;
+    var grid = [];
+    repeat (rows * cols) { grid.PushBack(grid.Length * 2); };
+    var total = 0;
+    for (var r = 0; r < rows; r += 1) {
+        for (var c = 0; c < cols; c += 1) {
+            total += grid[r * cols + c] + rows * cols;
+        };
+    };
+    displayl total;
+    """
+    execute(prog)
+    run_program(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["276", "276"]
+
+
+def test_strength_reduction_on_integers():
+    stmts = optimized("""
+    var integer n = 100;
+    var uinteger d = 7;
+    displayl floor((n % 1000) / d) + n ** 2;
+    displayl floor(n / 2.0) + (n + 1) ** 2;
+    """)
+    assert stmts[2].val == BinOp("+", BinOp("//", BinOp("%", Variable("n"), Number("1000")), Variable("d")),
+                                 BinOp("*", Variable("n"), Variable("n")))
+    assert stmts[3].val.left == MathFunction("floor", [BinOp("/", Variable("n"), Number("2.0"))])
+    assert stmts[3].val.right.op == "**"  # the base is not a variable
+
+
+@pytest.mark.parametrize("prog", [
+    "var n = num(\"100\"); displayl floor(n / 3);",                 # type not known
+    "var integer n = 100; n /= 2; displayl floor(n / 3);",          # becomes a decimal
+    "var integer n = 100; fn f(n) { n; }; displayl floor(n / 3);",  # a parameter of that name
+    "var integer n = 100; displayl floor(n / 3);",                  # could be past 2**53
+])
+def test_strength_reduction_needs_integers(prog):
+    assert optimized(prog)[-1].val.funcName == "floor"
+
+
+def test_strength_reduced_program_output(capfd):
+    prog = """
+    var integer total = 0;
+    for (var integer i = -5; i < 20; i += 1) {
+        total += floor(1000 / (i * 2 + 1)) + i ** 3;
+    };
+    displayl total;
+    """
+    execute(prog)
+    run_program(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["36557", "36557"]
+
+
+def test_floor_division_of_large_integers(capfd):
+    prog = "var integer a = 10000000000000001; var integer b = 1; displayl floor(a / b);"
+    for optimize in (True, False):
+        execute(prog, optimize=optimize)
+        run_program(prog, optimize=optimize)
+    assert capfd.readouterr().out.split() == ["10000000000000000"] * 4
+
+
+def test_repeated_accesses_shared():
+    stmts = optimized("""
+    var m = [[1, 2], [3, 4]];
+    var i = 1;
+    displayl m[i][0] + m[i][1] + m.Length;
+    displayl m.Length;
+    """)
+    row, length, first, second = stmts[2:6]
+    assert row.val == CallArr("m", [Variable("i")])
+    assert length.val == ArrayLen("m", "Length", [])
+    assert first.val.left == BinOp("+", CallArr(row.var_name, [Number("0")]), CallArr(row.var_name, [Number("1")]))
+    assert second.val == Variable(length.var_name)
+
+
+@pytest.mark.parametrize("between", [
+    "i = 0;",            # the index changes
+    "m = [[5]];",        # the array is rebound
+    "other[0] = 5;",     # may be the same array
+    "other.PushBack(1);",
+])
+def test_accesses_not_shared_across_writes(between):
+    stmts = optimized(f"""
+    var m = [[1, 2], [3, 4]];
+    var other = m;
+    var i = 1;
+    displayl m[i];
+    {between}
+    displayl m[i];
+    """)
+    assert not any(isinstance(stmt, VarBind) and stmt.var_name.startswith("$") for stmt in stmts)
+
+
+def test_shared_accesses_program_output(capfd):
+    prog = """
+    var items = [{"priority": 3, "cost": 2}, {"priority": 1, "cost": 5}];
+    var alias = items;
+    var total = 0;
+    for (var i = 0; i < items.Length; i += 1) {
+        total += items[i]["priority"] * items[i]["cost"];
+        alias[i]["cost"] = 0;
+        total += items[i]["cost"];
+    };
+    displayl total;
+    """
+    execute(prog)
+    run_program(prog)
+    assert capfd.readouterr().out.strip().split("\n") == ["11", "11"]
+
+
+def test_tail_calls_marked():
+    fn = optimized("""
+    fn f(n) {
+        if n > 10 then { return f(n - 1); } end;
+        displayl f(n);
+        if n == 0 then f(1) + 1 else { g(n); f(n - 1); } end;
+    };
+    """)[0]
+    first, middle, last = fn.funcBody.statements
+    assert first.t.statements[0].value.tail
+    assert not middle.val.tail
+    assert not last.t.left.tail
+    assert [call.tail for call in last.e.statements] == [False, True]
+
+
+def test_name_types_from_declarations():
+    from optimizer import name_types
+    ast, _ = parse("""
+    var integer n = 10;
+    var total = 0;
+    for (var integer i = 0; i < n; i += 1) { total += i * 2; };
+    var decimal d = 1;
+    var string s = "a";
+    s += char(66);
+    var mixed = 1;
+    mixed = "x";
+    var halved = n;
+    halved /= 2;
+    var items = [1, 2];
+    items.PushBack(n);
+    fn f(k) { k; };
+    """, SymbolTable())
+    assert name_types(ast) == {"n": int, "total": int, "i": int, "d": float, "s": str, "items": list}
+
+
+def test_proven_casts_skipped():
+    prog = """
+    var integer a = 1 + 2;
+    var decimal d = 1;
+    var uinteger u = -1;
+    var uinteger v = 3;
+    var string s = a;
+    var boolean b = a > 0;
+    displayl a + d + u + v;
+    displayl s + "!";
+    displayl b;
+    """
+    assert [stmt.cast for stmt in optimized(prog)[:6]] == [False, True, True, False, True, False]
+    from bytecode_gen_new import compile_program
+    casts = [insn.dtype for insn in compile_program(prog)[0].insns if type(insn).__name__ == "TYPECAST"]
+    assert casts == ["decimal", "uinteger", "string"]
+
+
+def test_typed_compound_assignment_output(capfd):
+    prog = """
+    var string s = "a";
+    var decimal x = 0.5;
+    var integer n = 7;
+    for (var integer i = 0; i < 3; i += 1) {
+        s += "b";
+        x *= 0.001;
+        n %= 4;
+    };
+    displayl s;
+    displayl x;
+    displayl n;
+    """
+    for optimize in (True, False):
+        execute(prog, optimize=optimize)
+        run_program(prog, optimize=optimize)
+    assert capfd.readouterr().out.strip().split("\n") == ["abbb", "5e-10", "3"] * 4
+
+
+def test_untyped_compound_assignment_output(capfd):
+    prog = """
+    fn shout(s) { s += "!"; s; };
+    fn scale(x) { x *= 0.001; x; };
+    displayl shout("hi");
+    displayl scale(0.5);
+    """
+    for optimize in (True, False):
+        execute(prog, optimize=optimize)
+        run_program(prog, optimize=optimize)
+    assert capfd.readouterr().out.strip().split("\n") == ["hi!", "0.0005"] * 4
@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+import pytest
+from parser import *
+from evaluator import execute
+from bytecode_eval_new import run_program
+
+
+def parse_expr(code):
+    return parse(code, SymbolTable())[0].statements[0]
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("1 + 2 * 3", BinOp("+", Number("1"), BinOp("*", Number("2"), Number("3")))),
+    ("1 - 2 - 3", BinOp("-", BinOp("-", Number("1"), Number("2")), Number("3"))),
+    ("2 ** 3 ** 2", BinOp("**", Number("2"), BinOp("**", Number("3"), Number("2")))),
+    ("-2 ** 2", BinOp("**", UnaryOp("-", Number("2")), Number("2"))),
+    ("a < b and c", BinOp("and", BinOp("<", Variable("a"), Variable("b")), Variable("c"))),
+    ("1 & 2 == 2", BinOp("&", Number("1"), BinOp("==", Number("2"), Number("2")))),
+    ("x = y += 1", UpdateVar("x", CompoundAssignment("y", "+=", Number("1")))),
+    ("arr[i][j] = 2 * k", AssigntoArr("arr", [Variable("i"), Variable("j")], BinOp("*", Number("2"), Variable("k")))),
+    ("f(a, b + 1)", FuncCall("f", [Variable("a"), BinOp("+", Variable("b"), Number("1"))])),
+    ("s.Slice(1, 2) + 1", BinOp("+", PropertyAccess("s", "Slice", [Number("1"), Number("2")]), Number("1"))),
+    ("'a' + 'b'", BinOp("+", String("a"), String("b"))),
+    ("sqrt(4) + integer('5')", BinOp("+", MathFunction("sqrt", [Number("4")]), TypeCast("integer", String("5")))),
+    ("char(65) + ascii('A')", BinOp("+", UnaryOp("char", Number("65")), UnaryOp("ascii", String("A")))),
+    ("not a or b", BinOp("or", UnaryOp("not", Variable("a")), Variable("b"))),
+])
+def test_expression_precedence(code, expected):
+    assert parse_expr(code) == expected
+
+
+def test_if_expression_binds_outside_operators():
+    ast = parse_expr("if x then 1 else 2 end")
+    assert isinstance(ast, If)
+    assert (ast.c, ast.t, ast.e) == (Variable("x"), Number("1"), Number("2"))
+
+
+def test_deeply_nested_expressions(capfd):
+    # each nesting level costs a couple of Python frames, not one per precedence level
+    depth = 200
+    prog = f"displayl({'(' * depth}1{' + 1)' * depth});"
+    assert parse_expr("(" * depth + "1" + ")" * depth) == Number("1")
+    execute(prog)
+    assert capfd.readouterr().out.strip() == str(depth + 1)
+
+
+def test_long_operator_chains(capfd):
+    prog = "displayl(" + " + ".join(["1"] * 5000) + ");"
+    execute(prog)
+    assert capfd.readouterr().out.strip() == "5000"
+    run_program(prog)
+    assert capfd.readouterr().out.strip() == "5000"
+
+
+def test_call_needs_a_function_name():
+    with pytest.raises(SyntaxError):
+        parse("5(1);", SymbolTable())
+
+
+def test_property_access_specialized_by_category():
+    stmts = parse("""
+    var a = [1];
+    var s = "abc";
+    var h = {1: 2};
+    a.Length; a.PushBack(2); a.PopFront; s.Slice(1, 2); h.Contains(1); h.Keys; x.Length;
+    """, SymbolTable())[0].statements
+    assert [type(stmt) for stmt in stmts[3:]] == [ArrayLen, ArrayAppend, ArrayPopFront, StrSlice, HashContains,
+                                                  PropertyAccess, PropertyAccess]
+    assert stmts[4] == ArrayAppend("a", "PushBack", [Number("2")])
@@ -0,0 +1,104 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+from bytecode_eval_new import run_program
+from register_vm import compile_registers, RegisterVM
+
+
+pytestmark = pytest.mark.one_engine
+
+
+def test_instructions_name_registers():
+    code, _ = compile_registers("""
+    var total = 0;
+    for (var i = 0; i < 10; i += 1) {
+        total += i;
+    };
+    displayl total;
+    """)
+    main = code.protos[0]
+    zero, one, ten = (reg for reg, value in main.consts.items() if value in (0, 1, 10))
+    total, i = (insn[1] for insn in main.code if insn[0] == "MOVE" and insn[2] == zero)
+    assert ("ADD", total, total, i) in main.code  # no loads or stores around it
+    assert ("ADD", i, i, one) in main.code
+    assert ("JUMP_IF", "LT", i, ten) in [insn[:4] for insn in main.code]  # tested at the bottom
+    assert ("PRINTLN", total) in main.code
+
+
+def test_signed_zeros_kept_apart(capfd):
+    run_program("displayl 0.0; displayl -0.0;", engine="registers")
+    assert capfd.readouterr().out.split() == ["0.0", "-0.0"]
+
+
+@pytest.mark.parametrize("prog, expected", [
+    # a block's `var` shadows the enclosing variable rather than overwriting it
+    ("var x = [1]; if True then { var x = [2]; displayl x; } end; displayl x;", ["[2]", "[1]"]),
+    # an untyped `var` holds None from the start of its block
+    ("var x = 1; var y = 1; if x == 1 then { var x = 2; y = x; } end; displayl x; displayl y;", ["1", "1"]),
+    # any other means the enclosing variable until its declaration runs, in every iteration after
+    ("var a = [1]; var n = 0; while (n < 2) { n += 1; a.PushBack(7); displayl a; var a = [n]; }; displayl a;",
+     ["[1, 7]", "[1, 7]", "[1, 7]"]),
+    ("var s = \"ab\"; repeat (2) { s += \"c\"; displayl s; var s = \"x\"; }; displayl s;", ["abc", "xc", "abc"]),
+    ("fn f() { return later * 2; }; var later = 21; displayl f();", ["42"]),
+    ("displayl early; var early = [1];", ["None"]),
+])
+def test_declarations_bind_as_in_the_tree_walker(capfd, prog, expected):
+    run_program(prog, engine="registers")
+    assert capfd.readouterr().out.splitlines() == expected
+
+
+def test_and_or_short_circuit(capfd):
+    prog = """
+    var array a = [5];
+    var i = 1;
+    if i < a.Length and a[i] > 0 then { displayl "found"; } else { displayl "none"; } end;
+    displayl i >= a.Length or a[i];
+    """
+    run_program(prog, engine="registers")
+    assert capfd.readouterr().out.split() == ["none", "True"]
+
+
+def test_deep_recursion(capfd):
+    """Calls do not recurse in Python: tail calls take no frames, others only memory."""
+    prog = """
+    fn count(n, acc) {
+        if n == 0 then acc else count(n - 1, acc + n) end;
+    };
+    fn sum(n) {
+        if n == 0 then 0 else n + sum(n - 1) end;
+    };
+    displayl count(100000, 0);
+    displayl sum(20000);
+    """
+    vm = RegisterVM(compile_registers(prog)[0])
+    vm.run()
+    assert capfd.readouterr().out.split() == ["5000050000", "200010000"]
+    assert vm.calls == []
+
+
+def test_long_operator_chains(capfd):
+    """A chain `x + y * 2 + x ...` too long to fold compiles without recursing down it."""
+    prog = "var x = 1; var y = 2; displayl(" + " + ".join(["x", "y * 2"] * 2500) + ");"
+    run_program(prog, engine="registers")
+    assert capfd.readouterr().out.strip() == "12500"
+
+
+def test_undefined_names_fail_at_run_time(capfd):
+    with pytest.raises(RuntimeError, match="Function 'nope' not defined"):
+        run_program('displayl "before"; nope(1);', engine="registers")
+    assert capfd.readouterr().out == "before\n"
+    with pytest.raises(RuntimeError, match="Variable 'missing' not defined"):
+        run_program("displayl missing;", engine="registers")
+    with pytest.raises(ValueError):
+        run_program("displayl 1;", engine="tree")
+
+
+def test_cached_compile(tmp_path, capfd):
+    prog = "fn sq(x) { x * x; }; displayl sq(12);"
+    for _ in range(2):
+        run_program(prog, cache_dir=str(tmp_path), engine="registers")
+        assert capfd.readouterr().out == "144\n"
+    assert [path.name.split(".")[1] for path in tmp_path.iterdir()] == ["registers"]
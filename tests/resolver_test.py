@@ -0,0 +1,129 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+from dataclasses import fields
+from evaluator import *
+from bytecode_eval_new import run_program
+from resolver import resolve
+
+
+def find_nodes(node, cls):
+    """All nodes of type `cls` in `node`, in source order."""
+    found = []
+    if isinstance(node, cls):
+        found.append(node)
+    if isinstance(node, AST):
+        for f in fields(node):
+            found.extend(find_nodes(getattr(node, f.name), cls))
+    elif isinstance(node, (list, tuple)):
+        for child in node:
+            found.extend(find_nodes(child, cls))
+    return found
+
+
+def test_resolver_assigns_depth_and_slot():
+    prog = """
+    var a = 1;
+    var b = 2;
+    fn f(x) {
+        while (x > 0) {
+            x = x - b;
+        };
+        x + a;
+    };
+    """
+    ast, tS = resolve(*parse(prog, SymbolTable()))
+    addresses = [(v.var_name, v.depth, v.slot) for v in find_nodes(ast, Variable)]
+    # `f`'s scope is [x]; the while scope is empty, so it gets no runtime table and the
+    # condition and `x - b` run in the function scope; globals are [a, b, f]
+    assert [address for address in addresses if address[0] == "x"] == [("x", 0, 0)] * 3
+    assert ("b", 1, 1) in addresses
+    assert ("a", 1, 0) in addresses
+    update = find_nodes(ast, UpdateVar)[0]
+    assert (update.depth, update.slot) == (0, 0)
+
+
+def test_scopes_declaring_nothing_are_skipped(capfd):
+    prog = """
+    fn f(n) {
+        var t = 0;
+        repeat(3) {
+            t = t + n;
+        };
+        if t > 0 then {
+            var half = t / 2;
+            while (half > 2) {
+                half -= 1;
+            };
+            t = half;
+        } end;
+        t;
+    };
+    displayl f(2);
+    """
+    ast, tS = resolve(*parse(prog, SymbolTable()))
+    # the repeat and while scopes declare nothing; the if scope declares `half`
+    addresses = {(v.var_name, v.depth) for v in find_nodes(ast, Variable)}
+    assert addresses == {("t", 0), ("n", 0), ("half", 0), ("t", 1)}
+    execute(prog)
+    assert capfd.readouterr().out.strip() == "2.0"
+
+
+def test_assignments_update_values_in_place():
+    ast, tS = resolve(*parse("fixed var limit = 3; var x = 1; x = [1]; x = 'a';", SymbolTable()))
+    for stmt in ast.statements:
+        e(stmt, tS)
+    x = tS.layout.slots["x"]
+    assert (tS.values[x], tS.categories[x]) == ("a", SymbolCategory.STRING)
+    assert tS.fixed == {tS.layout.slots["limit"]}
+    for update in ("limit = 4;", "limit += 1;"):
+        with pytest.raises(ValueError, match="fixed variable 'limit'"):
+            execute("fixed var limit = 3; " + update)
+
+
+def test_resolver_leaves_undeclared_names_unresolved():
+    ast, _ = resolve(*parse("displayl y;", SymbolTable()))
+    variable = find_nodes(ast, Variable)[0]
+    assert (variable.depth, variable.slot) == (None, None)
+
+
+def test_block_variable_shadows_outer_before_declaration(capfd):
+    """The address of a shadowing local is used only once it is bound at run time."""
+    prog = """
+    var arr = [1, 2];
+    var n = 0;
+    while (n < 2) {
+        n += 1;
+        displayl arr;
+        var arr = [n];
+        displayl arr;
+    };
+    """
+    execute(prog)
+    output = capfd.readouterr().out.strip().split("\n")
+    assert output == ["[1, 2]", "[1]", "[1]", "[2]"]
+
+
+def test_vm_frames_read_outer_variables_by_name(capfd):
+    """Each call gets its own slots; names it has not stored are read from the caller's frames."""
+    prog = """
+    var offset = 100;
+    fn fact(n) {
+        var result = 1;
+        if n > 1 then {
+            result = n * fact(n - 1);
+        } end;
+        result;
+    };
+    fn shifted(n) {
+        n + offset;
+    };
+    displayl fact(5);
+    displayl shifted(fact(3));
+    """
+    run_program(prog)
+    output = capfd.readouterr().out.strip().split("\n")
+    assert output == ["120", "106"]
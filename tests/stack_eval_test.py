@@ -0,0 +1,33 @@
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import pytest
+from evaluator import *
+import stack_eval
+
+
+pytestmark = pytest.mark.one_engine
+
+
+def test_deep_recursion_beyond_python_stack(capfd):
+    """Recursion too deep for `e` (and the Python stack) runs on the explicit stack."""
+    prog = """
+    fn sum(n) {
+        if n == 0 then 0 else n + sum(n - 1) end;
+    };
+    displayl sum(50000);
+    """
+    with pytest.raises(RecursionError):
+        execute(prog)
+    capfd.readouterr()
+    execute(prog, explicit_stack=True)
+    assert capfd.readouterr().out.strip() == str(50000 * 50001 // 2)
+
+
+def test_heap_budget_limits_depth(monkeypatch):
+    prog = "fn down(n) { if n == 0 then 0 else 1 + down(n - 1) end; }; displayl down(1000);"
+    monkeypatch.setattr(stack_eval, "HEAP_BUDGET", 100 * stack_eval.ENTRY_BYTES)
+    with pytest.raises(RecursionError, match="heap budget"):
+        execute(prog, explicit_stack=True)